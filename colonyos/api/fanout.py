@@ -0,0 +1,241 @@
+"""Shared event fan-out for streaming API clients."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional
+
+from colonyos.core.event_bus import EventBus
+from colonyos.core.types import Event
+
+logger = logging.getLogger(__name__)
+
+FrameSender = Callable[[str], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class EventFilter:
+    """Server-side filter negotiated when a streaming client connects."""
+
+    event_types: Optional[FrozenSet[str]] = None
+    task_id: Optional[str] = None
+    worker_id: Optional[str] = None
+
+    @classmethod
+    def from_params(
+        cls,
+        event_types: Optional[str] = None,
+        task_id: Optional[str] = None,
+        worker_id: Optional[str] = None,
+    ) -> "EventFilter":
+        """Build a filter from query parameters (``event_types`` is comma separated)."""
+
+        types = frozenset(name.strip() for name in event_types.split(",") if name.strip()) if event_types else None
+        return cls(event_types=types or None, task_id=task_id or None, worker_id=worker_id or None)
+
+    def matches(self, event: Event) -> bool:
+        if self.event_types is not None and event.event_type not in self.event_types:
+            return False
+        if self.task_id is not None and event.data.get("task_id") != self.task_id:
+            return False
+        if self.worker_id is not None and event.data.get("worker_id") != self.worker_id:
+            return False
+        return True
+
+
+class EncodedEvent:
+    """An event together with its JSON frame, encoded once for every client."""
+
+    __slots__ = ("event", "frame", "_sse_frame")
+
+    def __init__(self, event: Event, frame: str) -> None:
+        self.event = event
+        self.frame = frame
+        self._sse_frame: Optional[str] = None
+
+    @property
+    def sequence(self) -> int:
+        return self.event.sequence
+
+    @property
+    def sse_frame(self) -> str:
+        """The Server-Sent Events rendering, built on first use and shared."""
+
+        if self._sse_frame is None:
+            self._sse_frame = format_sse(self.frame, self.event.event_type, self.sequence)
+        return self._sse_frame
+
+
+def encode_event(event: Event) -> EncodedEvent:
+    return EncodedEvent(event, json.dumps(event.to_wire_format(), separators=(",", ":"), default=str))
+
+
+def format_sse(frame: str, event_type: str, sequence: int) -> str:
+    """Wrap a JSON frame as a Server-Sent Events message."""
+
+    return f"id: {sequence}\nevent: {event_type}\ndata: {frame}\n\n"
+
+
+def encode_control(message_type: str, data: Dict[str, Any], sequence: int) -> str:
+    """Encode a hub control message (``resync`` and friends) as a frame."""
+
+    message = {
+        "type": message_type,
+        "data": data,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "source": "api",
+        "sequence": sequence,
+    }
+    return json.dumps(message, separators=(",", ":"))
+
+
+class FanoutClient:
+    """A registered consumer with its own bounded queue of pre-encoded frames."""
+
+    def __init__(self, event_filter: EventFilter, max_pending: int) -> None:
+        self.filter = event_filter
+        self.queue: asyncio.Queue[EncodedEvent] = asyncio.Queue(maxsize=max_pending)
+        self.lagged = False
+
+    def offer(self, encoded: EncodedEvent) -> None:
+        """Queue a frame; a client that falls too far behind is flagged for resync."""
+
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait(encoded)
+        except asyncio.QueueFull:
+            self.lagged = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+
+    async def next(self) -> Optional[EncodedEvent]:
+        """Return the next frame, or ``None`` once when the client has lagged."""
+
+        if self.lagged:
+            self.lagged = False
+            return None
+        encoded = await self.queue.get()
+        if self.lagged:
+            self.lagged = False
+            return None
+        return encoded
+
+
+class EventFanoutHub:
+    """Single bus subscription that encodes each event once and fans it out.
+
+    Every streaming connection registers a :class:`FanoutClient`; the hub holds
+    the only ``"*"`` subscription on the event bus, serializes each event to a
+    JSON frame exactly once and enqueues that frame for every matching client.
+    """
+
+    def __init__(self, event_bus: EventBus, max_pending: int = 1000) -> None:
+        self.event_bus = event_bus
+        self.max_pending = max_pending
+        self._clients: List[FanoutClient] = []
+        self._subscription_id: Optional[str] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    async def register(self, event_filter: Optional[EventFilter] = None) -> FanoutClient:
+        client = FanoutClient(event_filter or EventFilter(), self.max_pending)
+        async with self._lock:
+            if self._subscription_id is None:
+                self._subscription_id = await self.event_bus.subscribe("*", self._dispatch)
+            self._clients.append(client)
+        return client
+
+    async def unregister(self, client: FanoutClient) -> None:
+        async with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+            if not self._clients and self._subscription_id is not None:
+                await self.event_bus.unsubscribe(self._subscription_id)
+                self._subscription_id = None
+
+    async def _dispatch(self, event: Event) -> None:
+        encoded: Optional[EncodedEvent] = None
+        for client in self._clients:
+            if not client.filter.matches(event):
+                continue
+            if encoded is None:
+                encoded = encode_event(event)
+            client.offer(encoded)
+
+    async def stream(
+        self,
+        client: FanoutClient,
+        send: FrameSender,
+        since: Optional[int] = None,
+        sse: bool = False,
+    ) -> None:
+        """Deliver frames to ``send``: replay after ``since`` first, then live events.
+
+        The client must already be registered so that nothing published during the
+        replay is missed; live frames at or below the replay cursor are skipped.
+        When the cursor was evicted, or the client fell behind its queue, a single
+        ``resync`` frame tells it to reload full state before continuing. With
+        ``sse`` set, frames are rendered as Server-Sent Events messages.
+        """
+
+        def control(data: Dict[str, Any], sequence: int) -> str:
+            frame = encode_control("resync", data, sequence)
+            return format_sse(frame, "resync", sequence) if sse else frame
+
+        cursor = await self._replay(client.filter, send, since, control, sse) if since is not None else None
+        while True:
+            encoded = await client.next()
+            if encoded is None:
+                await send(control({"reason": "lagged"}, cursor or 0))
+                continue
+            if cursor is not None and encoded.sequence <= cursor:
+                continue
+            await send(encoded.sse_frame if sse else encoded.frame)
+            cursor = encoded.sequence
+
+    async def _replay(
+        self,
+        event_filter: EventFilter,
+        send: FrameSender,
+        since: int,
+        control: Callable[[Dict[str, Any], int], str],
+        sse: bool,
+    ) -> int:
+        cursor = since
+        while True:
+            replay = await self.event_bus.replay(cursor)
+            if replay.gap:
+                data = {
+                    "reason": "gap",
+                    "first_sequence": replay.first_sequence,
+                    "last_sequence": replay.last_sequence,
+                }
+                await send(control(data, replay.last_sequence))
+                return replay.last_sequence
+            for event in replay.events:
+                if event_filter.matches(event):
+                    encoded = encode_event(event)
+                    await send(encoded.sse_frame if sse else encoded.frame)
+                cursor = event.sequence
+            if replay.complete:
+                return cursor
+
+
+__all__ = [
+    "EncodedEvent",
+    "EventFanoutHub",
+    "EventFilter",
+    "FanoutClient",
+    "FrameSender",
+    "encode_control",
+    "encode_event",
+    "format_sse",
+]
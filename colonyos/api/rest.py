@@ -3,17 +3,20 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import logging
 import time
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
 from uuid import uuid4
 
-from fastapi import Depends, FastAPI, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 
+from colonyos.api.fanout import EventFanoutHub, EventFilter, FanoutClient
 from colonyos.core.types import Identity
 from colonyos.core.types import Task as ColonyTask
 from colonyos.core.types import TaskStatus, WorkerCapability
@@ -30,6 +33,9 @@ class TaskCreateRequest(BaseModel):
     tags: List[str] = Field(default_factory=list)
 
 
+BatchItem = Tuple[int, Union[Dict[str, Any], str]]
+
+
 class TaskResponse(BaseModel):
     id: str
     description: str
@@ -128,6 +134,9 @@ class ColonyAPI:
             allow_headers=["*"],
         )
         self.active_connections: List[WebSocket] = []
+        self.hub = EventFanoutHub(colony_os.event_bus)
+        self.sse_keepalive_seconds = 15.0
+        self.batch_chunk_size = 500
         self._setup_routes()
 
     def _setup_routes(self) -> None:
@@ -164,6 +173,25 @@ class ColonyAPI:
 
             return self._task_to_response(task)
 
+        @self.app.post("/tasks:batch")
+        async def create_tasks_batch(request: Request, identity: Identity = Depends(get_current_identity)):
+            content_type = request.headers.get("content-type", "")
+            if "ndjson" in content_type or "jsonlines" in content_type:
+                items = self._iter_ndjson(request)
+            else:
+                try:
+                    payload = json.loads(await request.body())
+                except ValueError:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be a JSON array or NDJSON")
+                if not isinstance(payload, list):
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be a JSON array or NDJSON")
+                items = self._iter_items(payload)
+            # The body is consumed chunk by chunk before responding: streaming the
+            # response while still reading the request would race Starlette's
+            # disconnect listener for ASGI receive messages.
+            lines = [line async for line in self._submit_batch(items, identity)]
+            return Response(content="".join(lines), media_type="application/x-ndjson")
+
         @self.app.get("/tasks/{task_id}", response_model=TaskResponse)
         async def get_task(task_id: str, identity: Identity = Depends(get_current_identity)):
             task = self.colony.body.get_task(task_id)
@@ -171,6 +199,17 @@ class ColonyAPI:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Task {task_id} not found")
             return self._task_to_response(task)
 
+        @self.app.get("/tasks/{task_id}/wait", response_model=TaskResponse)
+        async def wait_for_task(
+            task_id: str,
+            timeout: float = Query(default=30.0, ge=0.0, le=300.0),
+            identity: Identity = Depends(get_current_identity),
+        ):
+            task = await self.colony.body.wait_for_task(task_id, timeout=timeout)
+            if not task:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Task {task_id} not found")
+            return self._task_to_response(task)
+
         @self.app.get("/tasks", response_model=List[TaskResponse])
         async def list_tasks(status: Optional[str] = None, limit: int = 100, identity: Identity = Depends(get_current_identity)):
             tasks = list(self.colony.body.tasks.values())
@@ -248,41 +287,72 @@ class ColonyAPI:
 
         @self.app.get("/system/audit")
         async def get_audit_log(event_type: Optional[str] = None, limit: int = 100, identity: Identity = Depends(get_current_identity)):
-            return {"entries": self.colony.guardian.get_audit_trail(event_type=event_type, limit=limit)}
+            return {"entries": await self.colony.guardian.aget_audit_trail(event_type=event_type, limit=limit)}
 
         @self.app.post("/system/checkpoint")
         async def create_checkpoint(identity: Identity = Depends(get_current_identity)):
-            state = {
-                "tasks": {tid: task.to_wire_format() for tid, task in self.colony.body.tasks.items()},
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-            }
-            checkpoint_id = self.colony.guardian.create_checkpoint(state)
+            checkpoint_id = await self.colony.guardian.acreate_task_checkpoint(self.colony.body)
             return {"checkpoint_id": checkpoint_id, "timestamp": datetime.now(timezone.utc).isoformat()}
 
         @self.app.post("/system/rollback/{checkpoint_id}")
         async def rollback_system(checkpoint_id: str, identity: Identity = Depends(get_current_identity)):
-            state = await self.colony.guardian.rollback_to_checkpoint(checkpoint_id)
+            state = await self.colony.guardian.rollback_to_checkpoint(checkpoint_id, self.colony.body)
             return {"status": "rolled_back", "checkpoint_id": checkpoint_id, "state": state}
 
+        @self.app.get("/events")
+        async def get_events(
+            since: Optional[int] = None,
+            event_type: Optional[str] = None,
+            limit: int = 100,
+            identity: Identity = Depends(get_current_identity),
+        ):
+            if since is None:
+                events = await self.colony.event_bus.get_history(event_type=event_type, limit=limit)
+                return {"events": [event.to_wire_format() for event in events], "gap": False, "next": events[-1].sequence if events else None}
+            replay = await self.colony.event_bus.replay(since, limit=limit)
+            events = replay.events
+            cursor = events[-1].sequence if events else (replay.last_sequence if replay.gap else since)
+            if event_type:
+                events = [event for event in events if event.event_type == event_type]
+            return {
+                "events": [event.to_wire_format() for event in events],
+                "gap": replay.gap,
+                "next": cursor,
+                "first_sequence": replay.first_sequence,
+                "last_sequence": replay.last_sequence,
+            }
+
+        @self.app.get("/events/stream")
+        async def stream_events(
+            request: Request,
+            since: Optional[int] = None,
+            event_types: Optional[str] = None,
+            task_id: Optional[str] = None,
+            worker_id: Optional[str] = None,
+            identity: Identity = Depends(get_current_identity),
+        ):
+            last_event_id = request.headers.get("last-event-id", "")
+            if since is None and last_event_id.isdigit():
+                since = int(last_event_id)
+            client = await self.hub.register(EventFilter.from_params(event_types, task_id, worker_id))
+            return StreamingResponse(
+                self._sse_frames(client, since),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
         @self.app.websocket("/ws/events")
-        async def websocket_events(websocket: WebSocket) -> None:
+        async def websocket_events(
+            websocket: WebSocket,
+            since: Optional[int] = None,
+            event_types: Optional[str] = None,
+            task_id: Optional[str] = None,
+            worker_id: Optional[str] = None,
+        ) -> None:
             await websocket.accept()
             self.active_connections.append(websocket)
-
-            async def event_handler(event) -> None:
-                try:
-                    await websocket.send_json(
-                        {
-                            "type": event.event_type,
-                            "data": event.data,
-                            "timestamp": event.timestamp.isoformat(),
-                            "source": event.source,
-                        }
-                    )
-                except Exception as exc:  # pragma: no cover - websocket errors
-                    logger.error("Failed to send WebSocket event: %s", exc)
-
-            subscription_id = await self.colony.event_bus.subscribe("*", event_handler)
+            client = await self.hub.register(EventFilter.from_params(event_types, task_id, worker_id))
+            sender = asyncio.create_task(self._stream_to_websocket(websocket, client, since))
 
             try:
                 while True:
@@ -293,8 +363,126 @@ class ColonyAPI:
                     except WebSocketDisconnect:
                         break
             finally:
+                sender.cancel()
                 self.active_connections.remove(websocket)
-                await self.colony.event_bus.unsubscribe(subscription_id)
+                await self.hub.unregister(client)
+
+    async def _stream_to_websocket(self, websocket: WebSocket, client: FanoutClient, since: Optional[int]) -> None:
+        try:
+            await self.hub.stream(client, websocket.send_text, since)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # pragma: no cover - websocket errors
+            logger.error("Failed to send WebSocket event: %s", exc)
+
+    @staticmethod
+    async def _iter_items(payload: List[Any]) -> AsyncIterator[BatchItem]:
+        for index, item in enumerate(payload):
+            yield index, item
+
+    @staticmethod
+    async def _iter_ndjson(request: Request) -> AsyncIterator[BatchItem]:
+        """Parse an NDJSON request body incrementally as it streams in."""
+
+        index = 0
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield index, ColonyAPI._parse_line(line)
+                    index += 1
+        if buffer.strip():
+            yield index, ColonyAPI._parse_line(buffer)
+
+    @staticmethod
+    def _parse_line(line: bytes) -> Union[Dict[str, Any], str]:
+        try:
+            return json.loads(line)
+        except ValueError as exc:
+            return f"Invalid JSON: {exc}"
+
+    async def _submit_batch(self, items: AsyncIterator[BatchItem], identity: Identity) -> AsyncIterator[str]:
+        """Validate, route and submit items in chunks, streaming one NDJSON result per item."""
+
+        chunk: List[BatchItem] = []
+        async for item in items:
+            chunk.append(item)
+            if len(chunk) >= self.batch_chunk_size:
+                for line in await self._submit_chunk(chunk, identity):
+                    yield line
+                chunk = []
+        if chunk:
+            for line in await self._submit_chunk(chunk, identity):
+                yield line
+
+    async def _submit_chunk(self, chunk: List[BatchItem], identity: Identity) -> List[str]:
+        results: Dict[int, Dict[str, Any]] = {}
+        pending: List[Tuple[int, ColonyTask]] = []
+        for index, item in chunk:
+            if isinstance(item, str):
+                results[index] = {"index": index, "error": item}
+                continue
+            try:
+                spec = TaskCreateRequest(**item)
+            except (TypeError, ValidationError) as exc:
+                results[index] = {"index": index, "error": _describe_validation_error(exc)}
+                continue
+            task = ColonyTask.create(
+                description=spec.description,
+                created_by=identity.id,
+                requirements=spec.requirements,
+                constraints=spec.constraints,
+                priority=spec.priority,
+                timeout_seconds=spec.timeout_seconds,
+                tags=spec.tags,
+            )
+            pending.append((index, task))
+
+        approved: List[Tuple[int, ColonyTask]] = []
+        verdicts = await self.colony.guardian.validate_tasks([task for _, task in pending])
+        for (index, task), (ok, violations) in zip(pending, verdicts):
+            if ok:
+                approved.append((index, task))
+            else:
+                results[index] = {
+                    "index": index,
+                    "error": "Task rejected by safety checks",
+                    "violations": [v.message for v in violations],
+                }
+
+        if approved:
+            tasks = [task for _, task in approved]
+            try:
+                routings = self.colony.mind.route_tasks(tasks)
+            except RuntimeError as exc:
+                for index, _ in approved:
+                    results[index] = {"index": index, "error": str(exc)}
+            else:
+                for task, routing in zip(tasks, routings):
+                    task.metadata["preferred_worker"] = routing.worker_id
+                self.colony.body.submit_tasks(tasks)
+                for index, task in approved:
+                    results[index] = {"index": index, "id": task.id, "status": task.status.value}
+
+        return [json.dumps(results[index]) + "\n" for index, _ in chunk]
+
+    async def _sse_frames(self, client: FanoutClient, since: Optional[int]) -> AsyncIterator[str]:
+        """Yield Server-Sent Events frames, with keep-alive comments while idle."""
+
+        # A single-slot queue keeps backpressure on the hub client's bounded queue.
+        frames: asyncio.Queue[str] = asyncio.Queue(maxsize=1)
+        pump = asyncio.create_task(self.hub.stream(client, frames.put, since, sse=True))
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(frames.get(), timeout=self.sse_keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            pump.cancel()
+            await self.hub.unregister(client)
 
     def _task_to_response(self, task: ColonyTask) -> TaskResponse:
         return TaskResponse(
@@ -320,6 +508,12 @@ class ColonyAPI:
         )
 
 
+def _describe_validation_error(exc: Exception) -> str:
+    if isinstance(exc, ValidationError):
+        return "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors())
+    return "Batch items must be JSON objects"
+
+
 def create_api_server(colony_os, host: str = "0.0.0.0", port: int = 8000):
     api = ColonyAPI(colony_os)
     auth_manager.set_identity_manager(colony_os.identity_manager)
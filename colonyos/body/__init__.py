@@ -1,10 +1,11 @@
 """ColonyOS body layer exports."""
 
-from colonyos.body.kernel import ColonyKernel
+from colonyos.body.kernel import CheckpointSnapshot, ColonyKernel
 from colonyos.body.queue import PriorityTaskQueue, QueueStats, TaskScheduler
 from colonyos.body.workers import WorkerExecutor, WorkerPool
 
 __all__ = [
+    "CheckpointSnapshot",
     "ColonyKernel",
     "PriorityTaskQueue",
     "QueueStats",
@@ -6,8 +6,9 @@ import asyncio
 import logging
 import threading
 from collections import defaultdict
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
 
 from colonyos.body.queue import PriorityTaskQueue, TaskScheduler
 from colonyos.body.workers import WorkerExecutor, WorkerPool
@@ -17,6 +18,19 @@ from colonyos.core.models import ColonyConfig, Task, TaskStatus, Worker
 logger = logging.getLogger(__name__)
 
 
+def _decode_tasks(payloads: Mapping[str, Dict[str, Any]]) -> List[Task]:
+    return [Task.from_wire_format(payload) for payload in payloads.values()]
+
+
+@dataclass
+class CheckpointSnapshot:
+    """Point-in-time view of the task table taken by :meth:`ColonyKernel.snapshot_checkpoint`."""
+
+    changed: List[Task]
+    clean: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    full: bool = False
+
+
 class ColonyKernel:
     """Main execution engine coordinating queue, scheduler, and workers."""
 
@@ -41,6 +55,14 @@ class ColonyKernel:
 
         self.tasks: Dict[str, Task] = {}
         self._lock = threading.RLock()
+        # Tasks changed since the last checkpoint; see collect_checkpoint().
+        self._dirty: Set[str] = set()
+        self._full_checkpoint_required = True
+        # Last serialised record of every task; entries of dirty tasks are stale.
+        self._wire: Dict[str, Dict[str, Any]] = {}
+        self._waiters: Dict[str, List[asyncio.Future[Optional[Task]]]] = {}
+        # Tasks with an execution callback registered for their waiters.
+        self._callbacks: Set[str] = set()
         self._execution_tasks: List[asyncio.Task[Any]] = []
         self._running = False
 
@@ -81,6 +103,7 @@ class ColonyKernel:
 
         with self._lock:
             self.tasks[task.id] = task
+            self._dirty.add(task.id)
 
             deadline: Optional[datetime] = None
             if task.timeout_seconds:
@@ -96,6 +119,28 @@ class ColonyKernel:
             logger.info("Submitted task %s to queue", task.id)
             return task.id
 
+    def submit_tasks(self, tasks: List[Task]) -> List[str]:
+        """Submit a batch of tasks under a single lock and queue rebuild."""
+
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            entries = []
+            for task in tasks:
+                self.tasks[task.id] = task
+                self._dirty.add(task.id)
+                deadline = now + timedelta(seconds=task.timeout_seconds) if task.timeout_seconds else None
+                entries.append((task, task.priority, deadline))
+
+            accepted = self.task_queue.enqueue_many(entries)
+            for task, ok in zip(tasks, accepted):
+                if ok:
+                    task.status = TaskStatus.QUEUED
+                else:
+                    task.status = TaskStatus.REJECTED
+                    task.error = "Queue full"
+            logger.info("Submitted batch of %s tasks (%s queued)", len(tasks), sum(accepted))
+            return [task.id for task in tasks]
+
     def get_task(self, task_id: str) -> Optional[Task]:
         """Retrieve a task by id."""
 
@@ -120,10 +165,199 @@ class ColonyKernel:
                 removed = self.task_queue.remove(task_id)
                 if removed:
                     task.status = TaskStatus.CANCELLED
+                    self._dirty.add(task_id)
                     logger.info("Cancelled task %s", task_id)
+                    self._notify_waiters(task)
                     return True
             return False
 
+    async def wait_for_task(self, task_id: str, timeout: Optional[float] = None) -> Optional[Task]:
+        """Wait until a task reaches a terminal state or ``timeout`` elapses.
+
+        Returns the task (which may still be running if the wait timed out), or
+        ``None`` if the task is unknown.
+        """
+
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task is None or task.is_terminal:
+                return task
+            future: asyncio.Future[Optional[Task]] = asyncio.get_running_loop().create_future()
+            if task_id not in self._callbacks:
+                self._callbacks.add(task_id)
+                self.executor.add_execution_callback(task_id, self._on_executed)
+            self._waiters.setdefault(task_id, []).append(future)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(task_id)
+                if waiters and future in waiters:
+                    waiters.remove(future)
+                    if not waiters:
+                        del self._waiters[task_id]
+        if future.done() and not future.cancelled():
+            return future.result()
+        with self._lock:
+            return self.tasks.get(task_id)
+
+    def _on_executed(self, task: Task) -> None:
+        with self._lock:
+            current = self.tasks.get(task.id)
+            if current is not task and current is not None and task.id in self._waiters:
+                # A run of an object replaced by restore_tasks consumed the
+                # callback; re-arm it for the restored task's own run.
+                self.executor.add_execution_callback(task.id, self._on_executed)
+                return
+            self._callbacks.discard(task.id)
+        self._notify_waiters(task)
+
+    def _notify_waiters(self, task: Task) -> None:
+        """Resolve completion futures once a task becomes terminal.
+
+        Objects replaced by :meth:`restore_tasks` (e.g. a run still in flight
+        during the restore) are ignored; waiters follow the current table.
+        """
+
+        if not task.is_terminal:
+            return
+        with self._lock:
+            if self.tasks.get(task.id) is not task:
+                return
+            waiters = self._waiters.pop(task.id, [])
+        for future in waiters:
+            if not future.done():
+                future.set_result(task)
+
+    def mark_dirty(self, task_ids: Iterable[str]) -> None:
+        """Record that tasks changed outside the kernel so the next delta checkpoint includes them."""
+
+        with self._lock:
+            self._dirty.update(task_ids)
+
+    def snapshot_checkpoint(self, full: bool = False) -> CheckpointSnapshot:
+        """Capture the tasks for the next checkpoint and reset the dirty set.
+
+        Every task changed since the last checkpoint is copied with
+        :meth:`Task.snapshot`. A full checkpoint (requested, or forced because
+        no base exists yet) additionally takes the cached wire records of all
+        unchanged tasks, which is a plain dict copy. That is all that happens
+        under the lock; :meth:`serialise_checkpoint` does the expensive part.
+        If the checkpoint cannot be written, hand the ids back through
+        :meth:`mark_dirty`.
+        """
+
+        with self._lock:
+            full = full or self._full_checkpoint_required
+            ids = self._dirty | (self.tasks.keys() - self._wire.keys()) if full else self._dirty
+            changed = [self.tasks[task_id].snapshot() for task_id in ids if task_id in self.tasks]
+            clean = dict(self._wire) if full else {}
+            self._dirty = set()
+            self._full_checkpoint_required = False
+        return CheckpointSnapshot(changed, clean, full)
+
+    def serialise_checkpoint(self, snapshot: CheckpointSnapshot) -> Dict[str, Dict[str, Any]]:
+        """Wire-format tasks of ``snapshot``; safe to call off the event loop."""
+
+        changed = {task.id: task.to_wire_format() for task in snapshot.changed}
+        with self._lock:
+            self._wire.update(changed)
+        tasks = snapshot.clean
+        tasks.update(changed)
+        return tasks
+
+    def collect_checkpoint(self, full: bool = False) -> Tuple[Dict[str, Dict[str, Any]], bool]:
+        """Snapshot and serialise in one call; returns ``(tasks, full)``."""
+
+        snapshot = self.snapshot_checkpoint(full)
+        return self.serialise_checkpoint(snapshot), snapshot.full
+
+    def require_full_checkpoint(self) -> None:
+        with self._lock:
+            self._full_checkpoint_required = True
+
+    async def restore_tasks(
+        self, payloads: Mapping[str, Dict[str, Any]], checkpoint_id: Optional[str] = None
+    ) -> Dict[str, int]:
+        """Replace the task table with checkpointed tasks (wire format, keyed by id).
+
+        Pending and queued tasks go back on the queue. Tasks that were executing
+        when the checkpoint was taken have no running execution any more, so
+        they are requeued as well. Executions in flight right now finish on
+        their own objects and no longer affect the table. Decoding runs off
+        the event loop; the swap happens under the lock in one pass, with a
+        single heap rebuild. One ``state_restored`` event is published, and
+        the next checkpoint is forced to be a full one.
+        """
+
+        loop = asyncio.get_running_loop()
+        tasks = await loop.run_in_executor(None, _decode_tasks, payloads)
+        now = datetime.now(timezone.utc)
+        requeued: List[str] = []
+        entries = []
+        assignments: Dict[str, int] = defaultdict(int)
+        executing, pending, queued = TaskStatus.EXECUTING, TaskStatus.PENDING, TaskStatus.QUEUED
+        with self._lock:
+            for task in tasks:
+                status = task.status
+                if status is executing:
+                    task.status = queued
+                    task.started_at = None
+                    task.assigned_worker = None
+                    requeued.append(task.id)
+                if status is pending or status is queued or status is executing:
+                    deadline = now + timedelta(seconds=task.timeout_seconds) if task.timeout_seconds else None
+                    entries.append((task, task.priority, deadline))
+                elif task.assigned_worker:
+                    assignments[task.assigned_worker] += 1
+
+            accepted = self.task_queue.restore(entries, assignments)
+            changed = set(requeued)
+            for (task, _, _), ok in zip(entries, accepted):
+                if not ok:
+                    task.status = TaskStatus.REJECTED
+                    task.error = "Queue full"
+                    changed.add(task.id)
+                elif task.status is pending:
+                    task.status = queued
+                    changed.add(task.id)
+
+            self.tasks = {task.id: task for task in tasks}
+            # Records whose task was not adjusted above are already current.
+            self._wire = {task_id: payload for task_id, payload in payloads.items() if task_id not in changed}
+            self._dirty = changed
+            self._full_checkpoint_required = True
+            vanished: List[asyncio.Future[Optional[Task]]] = []
+            for task_id in list(self._waiters):
+                task = self.tasks.get(task_id)
+                if task is None:
+                    vanished.extend(self._waiters.pop(task_id))
+                elif task.is_terminal:
+                    self._notify_waiters(task)
+        for future in vanished:
+            # Unknown after the restore, as wait_for_task reports for unknown ids.
+            if not future.done():
+                future.set_result(None)
+
+        summary = {
+            "tasks": len(tasks),
+            "queued": sum(accepted),
+            "requeued": len(requeued),
+            "rejected": len(accepted) - sum(accepted),
+        }
+        logger.info(
+            "Restored %s tasks (%s queued, %s requeued)", summary["tasks"], summary["queued"], summary["requeued"]
+        )
+        await self.event_bus.publish(
+            event_type="state_restored",
+            data={"checkpoint_id": checkpoint_id, **summary},
+            source="kernel",
+        )
+        return summary
+
     def register_worker(self, worker: Worker) -> bool:
         """Register a worker with the pool."""
 
@@ -171,7 +405,11 @@ class ColonyKernel:
                     continue
 
                 if self.worker_pool.assign_task(worker.id, task.id):
-                    success, execution_time = await self.executor.execute_task(task, worker.id)
+                    self.mark_dirty([task.id])
+                    try:
+                        success, execution_time = await self.executor.execute_task(task, worker.id)
+                    finally:
+                        self.mark_dirty([task.id])
                     self.task_queue.record_completion(execution_time, success)
                     self.scheduler.release_resources(task)
             except asyncio.CancelledError:
@@ -7,7 +7,7 @@ import logging
 import threading
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from colonyos.core.models import Task
 
@@ -94,6 +94,71 @@ class PriorityTaskQueue:
             logger.debug("Enqueued task %s with priority %s", task.id, priority)
             return True
 
+    def enqueue_many(
+        self,
+        items: List[Tuple[Task, Optional[int], Optional[datetime]]],
+    ) -> List[bool]:
+        """Add ``(task, priority, deadline)`` entries in one pass.
+
+        Accepted entries are appended and the heap is rebuilt once, which is
+        cheaper than pushing one by one for large batches. Entries beyond the
+        queue capacity are rejected, mirroring :meth:`enqueue`.
+        """
+
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            capacity = max(self.max_size - len(self._heap), 0)
+            accepted: List[bool] = []
+            fresh: List[QueuedTask] = []
+            for task, priority, deadline in items:
+                if len(fresh) >= capacity:
+                    accepted.append(False)
+                    continue
+                queued_task = QueuedTask(
+                    priority=task.priority if priority is None else priority,
+                    deadline=deadline,
+                    task_id=task.id,
+                    task=task,
+                    enqueued_at=now,
+                )
+                fresh.append(queued_task)
+                self._task_index[task.id] = queued_task
+                accepted.append(True)
+
+            if fresh:
+                if len(fresh) > len(self._heap):
+                    self._heap.extend(fresh)
+                    heapq.heapify(self._heap)
+                else:
+                    for queued_task in fresh:
+                        heapq.heappush(self._heap, queued_task)
+                self._stats.total_enqueued += len(fresh)
+                self._stats.current_queue_size = len(self._task_index)
+
+            rejected = len(accepted) - len(fresh)
+            if rejected:
+                logger.warning("Queue full (%s), rejected %s tasks from batch", self.max_size, rejected)
+            return accepted
+
+    def restore(
+        self,
+        items: List[Tuple[Task, Optional[int], Optional[datetime]]],
+        worker_assignments: Dict[str, int],
+    ) -> List[bool]:
+        """Replace the queue contents with ``items`` and the per-worker dequeue counts.
+
+        Entries are accepted as by :meth:`enqueue_many`, so the heap is built
+        with a single heapify. Statistics other than the queue size are kept.
+        """
+
+        with self._lock:
+            self.clear()
+            enqueued = self._stats.total_enqueued
+            accepted = self.enqueue_many(items)
+            self._stats.total_enqueued = enqueued
+            self._worker_assignments = dict(worker_assignments)
+            return accepted
+
     def dequeue(self, worker_id: Optional[str] = None) -> Optional[Task]:
         """Remove and return the highest priority task."""
 
@@ -313,7 +313,7 @@ class WorkerExecutor:
                 source="worker_executor",
             )
 
-            for callback in self.execution_callbacks.get(task.id, []):
+            for callback in self.execution_callbacks.pop(task.id, []):
                 try:
                     callback(task)
                 except Exception as exc:  # pragma: no cover - observer safety
@@ -4,11 +4,13 @@ from __future__ import annotations
 
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import click
 import requests
+from requests.adapters import HTTPAdapter
 from rich.console import Console
 from rich.layout import Layout
 from rich.live import Live
@@ -34,11 +36,35 @@ class ColonyClient:
         response.raise_for_status()
         return response.json()
 
+    def submit_batch(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        body = "".join(json.dumps(item) + "\n" for item in items)
+        response = self.session.post(
+            f"{self.base_url}/tasks:batch",
+            data=body.encode("utf-8"),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        response.raise_for_status()
+        return [json.loads(line) for line in response.iter_lines() if line]
+
+    def set_pool_size(self, size: int) -> None:
+        adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
     def get_task(self, task_id: str) -> Dict[str, any]:
         response = self.session.get(f"{self.base_url}/tasks/{task_id}")
         response.raise_for_status()
         return response.json()
 
+    def wait_for_task(self, task_id: str, timeout: float = 30.0) -> Dict[str, any]:
+        response = self.session.get(
+            f"{self.base_url}/tasks/{task_id}/wait",
+            params={"timeout": timeout},
+            timeout=timeout + 10,
+        )
+        response.raise_for_status()
+        return response.json()
+
     def list_tasks(self, status: Optional[str] = None) -> List[Dict[str, any]]:
         params = {"status": status} if status else None
         response = self.session.get(f"{self.base_url}/tasks", params=params)
@@ -80,11 +106,10 @@ def submit(ctx: click.Context, description: str, priority: int, timeout: int, wa
         with Progress() as progress:
             task_progress = progress.add_task("[cyan]Executing...", total=None)
             while True:
-                current = client.get_task(task["id"])
-                if current["status"] in {"completed", "failed", "cancelled", "timeout"}:
+                current = client.wait_for_task(task["id"], timeout=30)
+                if current["status"] in {"completed", "failed", "cancelled", "timeout", "rejected"}:
                     progress.stop()
                     break
-                time.sleep(1)
         if current["status"] == "completed":
             console.print("\n[green]✓ Task completed[/green]")
             if current.get("result"):
@@ -95,6 +120,81 @@ def submit(ctx: click.Context, description: str, priority: int, timeout: int, wa
                 console.print(f"Error: {current['error']}")
 
 
+def _read_batch_file(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield ``(number, spec)`` from a JSON array file or an NDJSON file.
+
+    ``number`` is the 1-based source line for NDJSON (blank lines included)
+    and the 1-based element position for a JSON array.
+    """
+
+    with open(path, "r", encoding="utf-8") as handle:
+        head = handle.read(1)
+        while head and head.isspace():
+            head = handle.read(1)
+        if head == "[":
+            handle.seek(0)
+            yield from enumerate(json.load(handle), start=1)
+            return
+        handle.seek(0)
+        for number, line in enumerate(handle, start=1):
+            if line.strip():
+                yield number, json.loads(line)
+
+
+def _chunked(items: Iterator[Tuple[int, Dict[str, Any]]], size: int) -> Iterator[List[Tuple[int, Dict[str, Any]]]]:
+    chunk: List[Tuple[int, Dict[str, Any]]] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@cli.command("submit-batch")
+@click.argument("file", type=click.Path(exists=True, dir_okay=False))
+@click.option("--concurrency", default=4, type=int, help="Parallel batch requests")
+@click.option("--chunk-size", default=1000, type=int, help="Tasks per batch request")
+@click.pass_context
+def submit_batch(ctx: click.Context, file: str, concurrency: int, chunk_size: int) -> None:
+    client: ColonyClient = ctx.obj["client"]
+    client.set_pool_size(concurrency)
+    chunks = list(_chunked(_read_batch_file(file), chunk_size))
+    submitted = 0
+    errors: List[Dict[str, Any]] = []
+    with Progress() as progress:
+        task_progress = progress.add_task("[cyan]Submitting...", total=sum(len(chunk) for chunk in chunks))
+        with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+            futures = {}
+            for chunk in chunks:
+                futures[pool.submit(client.submit_batch, [item for _, item in chunk])] = [line for line, _ in chunk]
+            for future in as_completed(futures):
+                lines = futures[future]
+                try:
+                    results = future.result()
+                except (requests.RequestException, ValueError) as exc:
+                    # One failed request must not drop the chunks already accepted.
+                    errors.extend({"line": line, "error": f"Request failed: {exc}"} for line in lines)
+                    progress.advance(task_progress, len(lines))
+                    continue
+                for result in results:
+                    if "id" in result:
+                        submitted += 1
+                    else:
+                        errors.append({**result, "line": lines[result["index"]]})
+                    progress.advance(task_progress)
+    console.print(f"[green]✓[/green] Submitted {submitted} tasks")
+    if errors:
+        console.print(f"[red]✗ {len(errors)} tasks failed[/red]")
+        table = Table(title="Failures")
+        table.add_column("Line", style="cyan")
+        table.add_column("Error", style="red")
+        for error in sorted(errors, key=lambda item: item["line"])[:20]:
+            table.add_row(str(error["line"]), error["error"])
+        console.print(table)
+
+
 @cli.command()
 @click.option("--status", help="Filter by status")
 @click.option("--limit", default=20, type=int, help="Maximum results")
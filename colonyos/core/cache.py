@@ -0,0 +1,158 @@
+"""In-process LRU cache used as a read-through tier in front of memory backends."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+CacheKey = Tuple[str, str]
+
+MISSING = object()
+"""Sentinel returned by :meth:`MemoryCache.get` when nothing usable is cached."""
+
+
+def approximate_size(value: Any) -> int:
+    """Rough in-memory footprint of a decoded JSON-style value, in bytes."""
+
+    if isinstance(value, (str, bytes)):
+        return 49 + len(value)
+    if isinstance(value, dict):
+        return 64 + sum(approximate_size(k) + approximate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(approximate_size(item) for item in value)
+    return 32
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires_at")
+
+    def __init__(self, value: Any, size: int, expires_at: Optional[float]) -> None:
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+
+
+class MemoryCache:
+    """Entry- and byte-bounded LRU keyed by ``(scope, key)``.
+
+    Entries never outlive the backend expiry they were loaded with, and an
+    optional ``max_age`` bounds staleness against writers in other processes.
+    Absent keys are cached as negative entries for ``negative_ttl`` seconds.
+    Cached values are shared between readers and must be treated as read-only.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_age: Optional[float] = None,
+        negative_ttl: Optional[float] = 5.0,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+
+    @property
+    def epoch(self) -> int:
+        """Invalidation counter; pass it to :meth:`put` to drop racing fills."""
+
+        return self._epoch
+
+    def get(self, scope: str, key: str) -> Any:
+        """Return the cached value, ``None`` for a cached miss, or :data:`MISSING`."""
+
+        cache_key = (scope, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at <= time.time():
+                self._remove(cache_key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(cache_key)
+            if entry.value is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return entry.value
+
+    def put(self, scope: str, key: str, value: Any, expires_at: Optional[float] = None, epoch: Optional[int] = None) -> None:
+        """Cache ``value`` (``None`` for a negative entry) until ``expires_at``.
+
+        When ``epoch`` is given and an invalidation happened since it was read,
+        the fill is dropped because the backend value may already be stale.
+        """
+
+        now = time.time()
+        if value is None:
+            if self.negative_ttl is None:
+                return
+            limit: Optional[float] = now + self.negative_ttl
+            size = 0
+        else:
+            limit = now + self.max_age if self.max_age is not None else None
+            size = approximate_size(value)
+            if size > self.max_bytes:
+                return
+        if expires_at is not None:
+            limit = expires_at if limit is None else min(limit, expires_at)
+        if limit is not None and limit <= now:
+            return
+
+        cache_key = (scope, key)
+        with self._lock:
+            if epoch is not None and epoch != self._epoch:
+                return
+            self._remove(cache_key)
+            self._entries[cache_key] = _Entry(value, size, limit)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, scope: str, key: str) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._remove((scope, key))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, cache_key: CacheKey) -> None:
+        entry = self._entries.pop(cache_key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
+
+
+__all__ = ["MISSING", "MemoryCache", "approximate_size"]
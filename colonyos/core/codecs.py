@@ -0,0 +1,156 @@
+"""Value codecs used by the memory backends.
+
+A codec turns a JSON-compatible value into bytes and back. Codecs are named
+by a spec of the form ``"<serializer>[+<compressor>]"`` (for example
+``"json"``, ``"msgpack+lz4"``); backends store the resolved name next to each
+value so rows written with one codec stay readable after the default changes.
+
+``"auto"`` picks the fastest option installed: ``msgpack`` over ``json`` and
+``lz4`` over ``zlib``. The optional dependencies come from the ``fast`` extra.
+"""
+
+from __future__ import annotations
+
+import json
+import zlib
+from functools import lru_cache
+from typing import Any, Union
+
+try:  # pragma: no cover - optional dependency
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:  # pragma: no cover - optional dependency
+    import lz4.block as lz4_block
+except ImportError:  # pragma: no cover - optional dependency
+    lz4_block = None
+
+# Payloads smaller than this are stored uncompressed by compressed codecs.
+COMPRESSION_THRESHOLD = 512
+
+_RAW = b"\x00"
+_PACKED = b"\x01"
+
+
+class Codec:
+    """Serializer interface: ``encode`` to bytes, ``decode`` back to a value."""
+
+    name = "base"
+
+    def encode(self, value: Any) -> bytes:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def decode(self, data: Union[bytes, str]) -> Any:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.name!r})"
+
+
+class JSONCodec(Codec):
+    """Compact UTF-8 JSON; also decodes legacy rows stored as text."""
+
+    name = "json"
+
+    def encode(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+
+class MsgpackCodec(Codec):
+    """MessagePack binary encoding."""
+
+    name = "msgpack"
+
+    def __init__(self) -> None:
+        if msgpack is None:
+            raise RuntimeError("The msgpack codec requires the 'msgpack' package (pip install colonyos[fast])")
+
+    def encode(self, value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+class CompressedCodec(Codec):
+    """Wraps another codec and compresses payloads above ``threshold`` bytes.
+
+    Each payload carries a one-byte marker so small values skip compression
+    without needing a separate codec tag.
+    """
+
+    def __init__(self, inner: Codec, compression: str, threshold: int = COMPRESSION_THRESHOLD) -> None:
+        if compression == "lz4":
+            if lz4_block is None:
+                raise RuntimeError("The lz4 codec requires the 'lz4' package (pip install colonyos[fast])")
+            self._compress = lz4_block.compress
+            self._decompress = lz4_block.decompress
+        elif compression == "zlib":
+            self._compress = lambda data: zlib.compress(data, 1)
+            self._decompress = zlib.decompress
+        else:
+            raise ValueError(f"Unknown compression: {compression}")
+        self.inner = inner
+        self.compression = compression
+        self.threshold = threshold
+        self.name = f"{inner.name}+{compression}"
+
+    def encode(self, value: Any) -> bytes:
+        raw = self.inner.encode(value)
+        if len(raw) < self.threshold:
+            return _RAW + raw
+        return _PACKED + self._compress(raw)
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        data = bytes(data)
+        if data[:1] == _PACKED:
+            return self.inner.decode(self._decompress(data[1:]))
+        return self.inner.decode(data[1:])
+
+
+def _resolve_serializer(name: str) -> str:
+    if name == "auto":
+        return "msgpack" if msgpack is not None else "json"
+    return name
+
+
+def _resolve_compression(name: str) -> str:
+    if name == "auto":
+        return "lz4" if lz4_block is not None else "zlib"
+    return name
+
+
+@lru_cache(maxsize=None)
+def get_codec(spec: str) -> Codec:
+    """Return the codec for ``spec`` (e.g. ``"json"``, ``"auto+auto"``)."""
+
+    serializer, _, compression = spec.partition("+")
+    serializer = _resolve_serializer(serializer)
+    if serializer == "json":
+        codec: Codec = JSONCodec()
+    elif serializer == "msgpack":
+        codec = MsgpackCodec()
+    else:
+        raise ValueError(f"Unknown codec: {spec}")
+    if compression:
+        codec = CompressedCodec(codec, _resolve_compression(compression))
+    return codec
+
+
+def resolve_codec(codec: Union[str, Codec]) -> Codec:
+    return get_codec(codec) if isinstance(codec, str) else codec
+
+
+__all__ = [
+    "COMPRESSION_THRESHOLD",
+    "Codec",
+    "CompressedCodec",
+    "JSONCodec",
+    "MsgpackCodec",
+    "get_codec",
+    "resolve_codec",
+]
@@ -3,11 +3,14 @@
 from __future__ import annotations
 
 import asyncio
-from dataclasses import dataclass
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import islice
 from datetime import datetime, timezone
-from typing import Any, Awaitable, Callable, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Tuple
 from uuid import uuid4
 
+from colonyos.core.event_log import SegmentedEventLog
 from colonyos.core.types import Event
 
 EventHandler = Callable[[Event], Awaitable[None]]
@@ -31,7 +34,12 @@ class EventBusBackend:
     async def unsubscribe(self, subscription_id: str) -> None:  # pragma: no cover - interface
         raise NotImplementedError
 
-    async def get_history(self, event_type: Optional[str], limit: int) -> List[Event]:  # pragma: no cover - interface
+    async def get_history(
+        self, event_type: Optional[str], limit: int, since: Optional[int] = None
+    ) -> List[Event]:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    async def replay(self, since: int, limit: int) -> "EventReplay":  # pragma: no cover - interface
         raise NotImplementedError
 
 
@@ -42,13 +50,40 @@ class Subscription:
     handler: EventHandler
 
 
+@dataclass
+class EventReplay:
+    """Events after a client cursor, plus whether the cursor fell out of retention."""
+
+    events: List[Event] = field(default_factory=list)
+    gap: bool = False
+    first_sequence: int = 1
+    last_sequence: int = 0
+
+    @property
+    def complete(self) -> bool:
+        """True when the replay reached the newest retained event."""
+
+        return not self.events or self.events[-1].sequence >= self.last_sequence
+
+
+def _detect_gap(since: int, first_sequence: int, last_sequence: int) -> bool:
+    """A cursor is unusable when it was evicted or is ahead of this bus (e.g. a restart)."""
+
+    return since > last_sequence or first_sequence > since + 1
+
+
 class InMemoryEventBus(EventBusBackend):
-    """Simple in-memory event bus backend with async dispatch."""
+    """Simple in-memory event bus backend with async dispatch.
+
+    History is a ring buffer of the last ``history_size`` events; every published
+    event receives a monotonically increasing ``sequence`` number.
+    """
 
-    def __init__(self) -> None:
+    def __init__(self, history_size: int = 10_000) -> None:
         self._subscriptions: Dict[str, Subscription] = {}
         self._lock = asyncio.Lock()
-        self._history: List[Event] = []
+        self._history: Deque[Event] = deque(maxlen=history_size)
+        self._next_sequence = 1
         self._running = False
 
     async def start(self) -> None:
@@ -64,14 +99,24 @@ class InMemoryEventBus(EventBusBackend):
             return
 
         async with self._lock:
-            self._history.append(event)
+            self._record(event)
             subscriptions = list(self._subscriptions.values())
+        self._dispatch(event, subscriptions)
 
+    @staticmethod
+    def _dispatch(event: Event, subscriptions: List[Subscription]) -> None:
         for subscription in subscriptions:
             if subscription.event_type not in {event.event_type, "*"}:
                 continue
             asyncio.create_task(subscription.handler(event))
 
+    def _record(self, event: Event) -> None:
+        """Sequence and persist an event to history; called with the bus lock held."""
+
+        event.sequence = self._next_sequence
+        self._next_sequence += 1
+        self._history.append(event)
+
     async def subscribe(self, event_type: str, handler: EventHandler) -> str:
         subscription_id = str(uuid4())
         async with self._lock:
@@ -86,12 +131,117 @@ class InMemoryEventBus(EventBusBackend):
         async with self._lock:
             self._subscriptions.pop(subscription_id, None)
 
-    async def get_history(self, event_type: Optional[str], limit: int = 100) -> List[Event]:
+    async def get_history(self, event_type: Optional[str], limit: int = 100, since: Optional[int] = None) -> List[Event]:
         async with self._lock:
+            if since is not None:
+                events = self._events_after(since)
+                if event_type is not None:
+                    events = (event for event in events if event.event_type == event_type)
+                return list(islice(events, limit))
             if event_type is None:
-                return list(self._history[-limit:])
+                return list(self._history)[-limit:] if limit > 0 else []
             return [event for event in self._history if event.event_type == event_type][-limit:]
 
+    def _events_after(self, since: int) -> Iterator[Event]:
+        first = self._history[0].sequence if self._history else self._next_sequence
+        return islice(self._history, max(since + 1 - first, 0), None)
+
+    async def replay(self, since: int, limit: int = 1000) -> EventReplay:
+        async with self._lock:
+            first = self._history[0].sequence if self._history else self._next_sequence
+            last = self._next_sequence - 1
+            return EventReplay(
+                events=list(islice(self._events_after(since), limit)),
+                gap=_detect_gap(since, first, last),
+                first_sequence=first,
+                last_sequence=last,
+            )
+
+
+class DurableEventBus(InMemoryEventBus):
+    """In-process event bus whose history lives in a segmented on-disk log.
+
+    Dispatch to subscribers is identical to :class:`InMemoryEventBus`; history
+    survives restarts and is read back from the log instead of RAM.
+
+    Appends never block the event loop: publishes queue up and a flusher
+    writes them to the log in batches on a worker thread, where the log
+    assigns their sequences. A publish returns, and subscribers see the
+    event, only once it has been written.
+    """
+
+    def __init__(self, log: SegmentedEventLog) -> None:
+        super().__init__()
+        self.log = log
+        self.batches = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: List[Tuple[Event, "asyncio.Future[None]"]] = []
+        self._flusher: Optional["asyncio.Task[None]"] = None
+
+    async def stop(self) -> None:
+        await super().stop()
+        if self._flusher is not None and self._loop is asyncio.get_running_loop():
+            await asyncio.wait([self._flusher])
+        self.log.close()
+
+    async def publish(self, event: Event) -> None:
+        if not self._running:
+            return
+
+        await self._append(event)
+        async with self._lock:
+            subscriptions = list(self._subscriptions.values())
+        self._dispatch(event, subscriptions)
+
+    async def _append(self, event: Event) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Futures belong to one loop; start afresh if the caller's loop changed.
+            self._loop, self._pending, self._flusher = loop, [], None
+        future: "asyncio.Future[None]" = loop.create_future()
+        self._pending.append((event, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = loop.create_task(self._flush())
+        await future
+
+    async def _flush(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            batch, self._pending = self._pending, []
+            events = [event for event, _ in batch]
+            try:
+                sequences = await loop.run_in_executor(None, self.log.append_many, events)
+            except Exception as exc:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            self.batches += 1
+            for (event, future), sequence in zip(batch, sequences):
+                event.sequence = sequence
+                if not future.done():
+                    future.set_result(None)
+
+    async def get_history(self, event_type: Optional[str], limit: int = 100, since: Optional[int] = None) -> List[Event]:
+        loop = asyncio.get_running_loop()
+        if since is not None:
+            return await loop.run_in_executor(None, self._read_after, since, limit, event_type)
+        records = await loop.run_in_executor(None, self.log.read_last, limit, event_type)
+        return [event for _, event in records]
+
+    def _read_after(self, since: int, limit: int, event_type: Optional[str] = None) -> List[Event]:
+        events = (event for _, event in self.log.replay(since))
+        if event_type is not None:
+            events = (event for event in events if event.event_type == event_type)
+        return list(islice(events, limit))
+
+    async def replay(self, since: int, limit: int = 1000) -> EventReplay:
+        first = self.log.first_sequence
+        last = self.log.next_sequence - 1
+        loop = asyncio.get_running_loop()
+        events = await loop.run_in_executor(None, self._read_after, since, limit)
+        return EventReplay(events=events, gap=_detect_gap(since, first, last), first_sequence=first, last_sequence=last)
+
 
 class EventBus:
     """High level event bus facade used by ColonyOS."""
@@ -115,8 +265,13 @@ class EventBus:
     async def unsubscribe(self, subscription_id: str) -> None:
         await self.backend.unsubscribe(subscription_id)
 
-    async def get_history(self, event_type: Optional[str] = None, limit: int = 100) -> List[Event]:
-        return await self.backend.get_history(event_type, limit)
+    async def get_history(self, event_type: Optional[str] = None, limit: int = 100, since: Optional[int] = None) -> List[Event]:
+        return await self.backend.get_history(event_type, limit, since)
+
+    async def replay(self, since: int, limit: int = 1000) -> EventReplay:
+        """Return events published after sequence ``since`` and whether a gap occurred."""
+
+        return await self.backend.replay(since, limit)
 
 
 class RedisEventBus(EventBusBackend):
@@ -141,13 +296,18 @@ class RedisEventBus(EventBusBackend):
     async def unsubscribe(self, subscription_id: str) -> None:
         await self._backend.unsubscribe(subscription_id)
 
-    async def get_history(self, event_type: Optional[str], limit: int) -> List[Event]:
-        return await self._backend.get_history(event_type, limit)
+    async def get_history(self, event_type: Optional[str], limit: int, since: Optional[int] = None) -> List[Event]:
+        return await self._backend.get_history(event_type, limit, since)
+
+    async def replay(self, since: int, limit: int = 1000) -> EventReplay:
+        return await self._backend.replay(since, limit)
 
 
 __all__ = [
+    "DurableEventBus",
     "EventBus",
     "EventBusBackend",
+    "EventReplay",
     "InMemoryEventBus",
     "RedisEventBus",
     "Subscription",
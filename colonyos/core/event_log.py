@@ -0,0 +1,463 @@
+"""Segmented, append-only on-disk event log used for durable event history."""
+
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from colonyos.core.types import Event
+
+logger = logging.getLogger(__name__)
+
+# Record layout: body_len, crc32, sequence, timestamp, type_len, source_len
+# followed by the event type, the source and the JSON-encoded data.
+_HEADER = struct.Struct("<IIQdHH")
+_CRC_FIELDS = struct.Struct("<QdHH")
+# Index layout: one (sequence, byte offset) pair per record.
+_INDEX_ENTRY = struct.Struct("<QQ")
+
+_LOG_SUFFIX = ".log"
+_INDEX_SUFFIX = ".idx"
+
+
+def _encode_record(sequence: int, event: Event) -> bytes:
+    event_type = event.event_type.encode("utf-8")
+    source = event.source.encode("utf-8")
+    data = json.dumps(event.data, separators=(",", ":"), default=str).encode("utf-8")
+    timestamp = event.timestamp.timestamp()
+    body = event_type + source + data
+    crc = zlib.crc32(_CRC_FIELDS.pack(sequence, timestamp, len(event_type), len(source)) + body)
+    return _HEADER.pack(len(body), crc, sequence, timestamp, len(event_type), len(source)) + body
+
+
+def _decode_record(buffer: Any, offset: int) -> Optional[Tuple[int, Event, int]]:
+    """Decode the record at ``offset``; return ``None`` for a torn or corrupt tail."""
+
+    end = offset + _HEADER.size
+    if end > len(buffer):
+        return None
+    body_len, crc, sequence, timestamp, type_len, source_len = _HEADER.unpack_from(buffer, offset)
+    if type_len + source_len > body_len or end + body_len > len(buffer):
+        return None
+    body = bytes(buffer[end : end + body_len])
+    if zlib.crc32(_CRC_FIELDS.pack(sequence, timestamp, type_len, source_len) + body) != crc:
+        return None
+    event = Event(
+        event_type=body[:type_len].decode("utf-8"),
+        source=body[type_len : type_len + source_len].decode("utf-8"),
+        data=json.loads(body[type_len + source_len :]),
+        timestamp=datetime.fromtimestamp(timestamp, timezone.utc),
+        sequence=sequence,
+    )
+    return sequence, event, end + body_len
+
+
+def _peek_type(buffer: Any, offset: int) -> Optional[Tuple[int, str, int]]:
+    """Read just the sequence and event type of a record (used for filtered scans)."""
+
+    end = offset + _HEADER.size
+    if end > len(buffer):
+        return None
+    body_len, _, sequence, _, type_len, _ = _HEADER.unpack_from(buffer, offset)
+    if end + body_len > len(buffer):
+        return None
+    return sequence, bytes(buffer[end : end + type_len]).decode("utf-8"), end + body_len
+
+
+@dataclass
+class _Segment:
+    """A single log file plus its offset index."""
+
+    base_sequence: int
+    path: str
+    index_path: str
+    size: int = 0
+    last_sequence: int = 0
+
+    @property
+    def modified_at(self) -> float:
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return 0.0
+
+
+class SegmentedEventLog:
+    """Append-only event log split into size-bounded segments.
+
+    Each segment is a pair of files: ``<base>.log`` holds compact binary records
+    and ``<base>.idx`` maps every sequence number to its byte offset. Reads map
+    segments with ``mmap`` and walk them sequentially, so replay never loads the
+    whole history into memory. Closed segments are deleted once the log exceeds
+    ``retention_bytes`` or their newest record is older than ``retention_seconds``;
+    limits are enforced on open, when a segment rolls, and by the first append
+    after the oldest closed segment ages out.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 64 * 1024 * 1024,
+        retention_bytes: Optional[int] = None,
+        retention_seconds: Optional[float] = None,
+        fsync: bool = False,
+    ) -> None:
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.retention_bytes = retention_bytes
+        self.retention_seconds = retention_seconds
+        self.fsync = fsync
+
+        self._lock = threading.RLock()
+        self._segments: List[_Segment] = []
+        self._log_file: Any = None
+        self._index_file: Any = None
+        self._next_sequence = 1
+        # When the oldest closed segment passes retention_seconds.
+        self._expires_at = float("inf")
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_segments()
+        self._open_active()
+        self.enforce_retention()
+
+    # ------------------------------------------------------------------ setup
+
+    def _segment_paths(self, base_sequence: int) -> Tuple[str, str]:
+        stem = os.path.join(self.directory, f"{base_sequence:020d}")
+        return stem + _LOG_SUFFIX, stem + _INDEX_SUFFIX
+
+    def _load_segments(self) -> None:
+        bases = sorted(
+            int(name[: -len(_LOG_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.endswith(_LOG_SUFFIX) and name[: -len(_LOG_SUFFIX)].isdigit()
+        )
+        for base in bases:
+            path, index_path = self._segment_paths(base)
+            segment = _Segment(base_sequence=base, path=path, index_path=index_path, size=os.path.getsize(path))
+            self._segments.append(segment)
+
+        for segment in self._segments[:-1]:
+            segment.last_sequence = self._last_indexed_sequence(segment)
+        if self._segments:
+            self._recover(self._segments[-1])
+
+        if self._segments and self._segments[-1].last_sequence:
+            self._next_sequence = self._segments[-1].last_sequence + 1
+        elif self._segments:
+            self._next_sequence = self._segments[-1].base_sequence
+
+    def _last_indexed_sequence(self, segment: _Segment) -> int:
+        try:
+            with open(segment.index_path, "rb") as handle:
+                handle.seek(0, os.SEEK_END)
+                size = handle.tell() - handle.tell() % _INDEX_ENTRY.size
+                if size == 0:
+                    return 0
+                handle.seek(size - _INDEX_ENTRY.size)
+                sequence, _ = _INDEX_ENTRY.unpack(handle.read(_INDEX_ENTRY.size))
+                return sequence
+        except OSError:
+            return 0
+
+    def _recover(self, segment: _Segment) -> None:
+        """Validate the active segment, truncate a torn tail and rebuild its index."""
+
+        entries: List[Tuple[int, int]] = []
+        valid_size = 0
+        if segment.size:
+            with open(segment.path, "rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                offset = 0
+                while offset < len(view):
+                    decoded = _decode_record(view, offset)
+                    if decoded is None:
+                        break
+                    sequence, _, next_offset = decoded
+                    entries.append((sequence, offset))
+                    offset = next_offset
+                valid_size = offset
+
+        if valid_size != segment.size:
+            logger.warning("Truncating torn event log tail in %s at byte %s", segment.path, valid_size)
+            with open(segment.path, "r+b") as handle:
+                handle.truncate(valid_size)
+            segment.size = valid_size
+
+        with open(segment.index_path, "wb") as handle:
+            handle.write(b"".join(_INDEX_ENTRY.pack(sequence, offset) for sequence, offset in entries))
+        segment.last_sequence = entries[-1][0] if entries else 0
+
+    def _open_active(self) -> None:
+        if not self._segments:
+            self._segments.append(self._new_segment(self._next_sequence))
+        active = self._segments[-1]
+        self._log_file = open(active.path, "ab")
+        self._index_file = open(active.index_path, "ab")
+
+    def _new_segment(self, base_sequence: int) -> _Segment:
+        path, index_path = self._segment_paths(base_sequence)
+        open(path, "ab").close()
+        open(index_path, "ab").close()
+        return _Segment(base_sequence=base_sequence, path=path, index_path=index_path)
+
+    # ------------------------------------------------------------------ writes
+
+    @property
+    def first_sequence(self) -> int:
+        """Oldest sequence number still retained (``next_sequence`` when empty)."""
+
+        with self._lock:
+            for segment in self._segments:
+                if segment.last_sequence:
+                    return segment.base_sequence
+            return self._next_sequence
+
+    @property
+    def next_sequence(self) -> int:
+        with self._lock:
+            return self._next_sequence
+
+    def append(self, event: Event) -> int:
+        """Append an event and return its sequence number."""
+
+        return self.append_many([event])[0]
+
+    def append_many(self, events: List[Event]) -> List[int]:
+        """Append ``events`` in order and return their sequence numbers.
+
+        Sequences are assigned under the log lock, and each segment touched
+        gets one write, one flush and (with ``fsync``) one ``os.fsync``.
+        """
+
+        with self._lock:
+            if self._log_file is None:
+                raise RuntimeError("Event log is closed")
+            if time.time() > self._expires_at:
+                self.enforce_retention()
+            sequences: List[int] = []
+            pending: List[Tuple[int, bytes]] = []
+            size = self._segments[-1].size
+            for event in events:
+                if size >= self.segment_bytes and (pending or self._segments[-1].last_sequence):
+                    self._commit(pending)
+                    pending = []
+                    self._roll()
+                    size = 0
+                sequence = self._next_sequence + len(pending)
+                record = _encode_record(sequence, event)
+                pending.append((sequence, record))
+                size += len(record)
+                sequences.append(sequence)
+            self._commit(pending)
+            return sequences
+
+    def _commit(self, pending: List[Tuple[int, bytes]]) -> None:
+        """Write encoded records to the active segment; sizes advance only once written."""
+
+        if not pending:
+            return
+        active = self._segments[-1]
+        offset = active.size
+        index: List[bytes] = []
+        for sequence, record in pending:
+            index.append(_INDEX_ENTRY.pack(sequence, offset))
+            offset += len(record)
+        self._log_file.write(b"".join(record for _, record in pending))
+        self._index_file.write(b"".join(index))
+        self._log_file.flush()
+        self._index_file.flush()
+        if self.fsync:
+            os.fsync(self._log_file.fileno())
+        active.size = offset
+        active.last_sequence = pending[-1][0]
+        self._next_sequence = pending[-1][0] + 1
+
+    def _roll(self) -> None:
+        self._log_file.close()
+        self._index_file.close()
+        self._segments.append(self._new_segment(self._next_sequence))
+        self._open_active()
+        self.enforce_retention()
+
+    def enforce_retention(self) -> int:
+        """Delete closed segments beyond the size/age limits; return how many were removed."""
+
+        with self._lock:
+            removed = 0
+            now = time.time()
+            while len(self._segments) > 1:
+                oldest = self._segments[0]
+                total = sum(segment.size for segment in self._segments)
+                too_big = self.retention_bytes is not None and total > self.retention_bytes
+                too_old = self.retention_seconds is not None and now - oldest.modified_at > self.retention_seconds
+                if not (too_big or too_old):
+                    break
+                self._segments.pop(0)
+                for path in (oldest.path, oldest.index_path):
+                    try:
+                        os.remove(path)
+                    except OSError:  # pragma: no cover - best effort cleanup
+                        logger.warning("Failed to remove event log file %s", path)
+                removed += 1
+            self._expires_at = float("inf")
+            if self.retention_seconds is not None and len(self._segments) > 1:
+                self._expires_at = self._segments[0].modified_at + self.retention_seconds
+            return removed
+
+    def close(self) -> None:
+        with self._lock:
+            if self._log_file is not None:
+                self._log_file.close()
+                self._index_file.close()
+                self._log_file = None
+                self._index_file = None
+
+    # ------------------------------------------------------------------ reads
+
+    def _snapshot(self) -> List[Tuple[_Segment, int]]:
+        """Return segments with the byte size visible to readers right now."""
+
+        with self._lock:
+            return [(segment, segment.size) for segment in self._segments]
+
+    def _locate(self, segment: _Segment, sequence: int) -> int:
+        """Binary-search the offset index for the first record with ``>= sequence``."""
+
+        if sequence <= segment.base_sequence:
+            return 0
+        with open(segment.index_path, "rb") as handle:
+            data = handle.read()
+        count = len(data) // _INDEX_ENTRY.size
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            found, _ = _INDEX_ENTRY.unpack_from(data, middle * _INDEX_ENTRY.size)
+            if found < sequence:
+                low = middle + 1
+            else:
+                high = middle
+        if low == count:
+            return -1
+        return _INDEX_ENTRY.unpack_from(data, low * _INDEX_ENTRY.size)[1]
+
+    @staticmethod
+    def _tail_offset(segment: _Segment, size: int, count: int) -> int:
+        """Offset of the ``count``-th newest record below ``size``, read from the index tail.
+
+        Returns 0 (scan the whole segment) when the index holds fewer entries.
+        """
+
+        try:
+            handle = open(segment.index_path, "rb")
+        except FileNotFoundError:
+            return 0
+        with handle:
+            end = handle.seek(0, os.SEEK_END)
+            end -= end % _INDEX_ENTRY.size
+            while end > 0:
+                start = max(0, end - max(count, 1024) * _INDEX_ENTRY.size)
+                handle.seek(start)
+                # Entries past ``size`` were appended after the snapshot; skip them.
+                visible = [offset for _, offset in _INDEX_ENTRY.iter_unpack(handle.read(end - start)) if offset < size]
+                if len(visible) >= count:
+                    return visible[-count]
+                count -= len(visible)
+                end = start
+        return 0
+
+    @staticmethod
+    def _scan(segment: _Segment, size: int, start: int = 0) -> Iterator[Tuple[int, Event]]:
+        if size == 0 or start < 0:
+            return
+        try:
+            handle = open(segment.path, "rb")
+        except FileNotFoundError:  # removed by retention while we were reading
+            return
+        with handle, mmap.mmap(handle.fileno(), size, access=mmap.ACCESS_READ) as view:
+            offset = start
+            while offset < size:
+                decoded = _decode_record(view, offset)
+                if decoded is None:
+                    break
+                sequence, event, offset = decoded
+                yield sequence, event
+
+    def replay(self, since: int = 0) -> Iterator[Tuple[int, Event]]:
+        """Yield ``(sequence, event)`` pairs with sequence greater than ``since``."""
+
+        for segment, size in self._snapshot():
+            if segment.last_sequence and segment.last_sequence <= since:
+                continue
+            start = self._locate(segment, since + 1) if since else 0
+            yield from self._scan(segment, size, start)
+
+    def read_last(self, limit: int, event_type: Optional[str] = None) -> List[Tuple[int, Event]]:
+        """Return the newest ``limit`` records, optionally restricted to one event type.
+
+        Segments are scanned newest first and only ``limit`` matches are held at a
+        time, so memory stays bounded regardless of how much history is on disk.
+        Without a type filter, reading starts at the offset the index gives for
+        the oldest wanted record, so only those records are decoded.
+        """
+
+        if limit <= 0:
+            return []
+        collected: List[Tuple[int, Event]] = []
+        for segment, size in reversed(self._snapshot()):
+            remaining = limit - len(collected)
+            if remaining <= 0:
+                break
+            window: Deque[Tuple[int, Event]] = deque(maxlen=remaining)
+            if event_type is None:
+                window.extend(self._scan(segment, size, self._tail_offset(segment, size, remaining)))
+            else:
+                window.extend(self._scan_type(segment, size, event_type))
+            collected = list(window) + collected
+        return collected
+
+    def _scan_type(self, segment: _Segment, size: int, event_type: str) -> Iterator[Tuple[int, Event]]:
+        """Scan a segment decoding only records whose type matches."""
+
+        if size == 0:
+            return
+        try:
+            handle = open(segment.path, "rb")
+        except FileNotFoundError:
+            return
+        with handle, mmap.mmap(handle.fileno(), size, access=mmap.ACCESS_READ) as view:
+            offset = 0
+            while offset < size:
+                peeked = _peek_type(view, offset)
+                if peeked is None:
+                    break
+                _, found_type, next_offset = peeked
+                if found_type == event_type:
+                    decoded = _decode_record(view, offset)
+                    if decoded is None:
+                        break
+                    sequence, event, _ = decoded
+                    yield sequence, event
+                offset = next_offset
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "segments": len(self._segments),
+                "bytes": sum(segment.size for segment in self._segments),
+                "first_sequence": self.first_sequence,
+                "next_sequence": self._next_sequence,
+            }
+
+
+__all__ = ["SegmentedEventLog"]
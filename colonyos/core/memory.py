@@ -2,15 +2,51 @@
 
 from __future__ import annotations
 
-import json
+import bisect
+import heapq
+import itertools
+import os
+import logging
+import queue
 import sqlite3
 import threading
 import time
-from typing import Any, Dict, List, Optional
+import weakref
+import zlib
+from contextlib import contextmanager
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple, Union
+from uuid import uuid4
+
+from colonyos.core.cache import MISSING, MemoryCache
+from colonyos.core.codecs import Codec, get_codec, resolve_codec
+from colonyos.core.memory_io import MemoryIO
+from colonyos.core.resp import RespClient, escape_glob
+from colonyos.core.vector import VectorMemory
+
+logger = logging.getLogger(__name__)
 
 
 class BaseMemory:
-    """Base key-value memory store."""
+    """Base key-value memory store.
+
+    Backends that persist bytes encode values with :attr:`codec`, or with a
+    per-scope override registered through :meth:`set_codec`.
+    """
+
+    codec: Codec = get_codec("json")
+    scope_codecs: Dict[str, Codec] = {}
+
+    def set_codec(self, codec: Union[str, Codec], scope: Optional[str] = None) -> None:
+        """Use ``codec`` for new writes, either globally or for one ``scope``."""
+
+        resolved = resolve_codec(codec)
+        if scope is None:
+            self.codec = resolved
+        else:
+            self.scope_codecs = {**self.scope_codecs, scope: resolved}
+
+    def codec_for(self, scope: str) -> Codec:
+        return self.scope_codecs.get(scope, self.codec)
 
     def store(self, key: str, value: Any, scope: str = "default", ttl: Optional[int] = None) -> None:  # pragma: no cover - interface
         raise NotImplementedError
@@ -24,142 +60,953 @@ class BaseMemory:
     def list_keys(self, scope: str = "default") -> List[str]:  # pragma: no cover - interface
         raise NotImplementedError
 
+    scan_orders: Tuple[str, ...] = ("key",)
+
+    def scan(
+        self,
+        scope: str = "default",
+        prefix: str = "",
+        start_after: Optional[str] = None,
+        limit: Optional[int] = None,
+        reverse: bool = False,
+        order: str = "key",
+    ) -> Iterator[str]:
+        """Yield live keys of ``scope`` in a stable order.
+
+        ``order="key"`` sorts by code point; backends listing ``"insertion"`` in
+        :attr:`scan_orders` can also follow write order, and those listing
+        ``"any"`` return keys unordered where sorting is expensive.
+        ``start_after`` is an exclusive cursor, so passing the last key of one
+        page continues with the next. This default sorts :meth:`list_keys`; backends override it with
+        range scans.
+        """
+
+        _check_order(self, order)
+        keys = sorted(key for key in self.list_keys(scope) if key.startswith(prefix))
+        return _page(keys, start_after, limit, reverse)
+
+    def store_many(self, items: Dict[str, Any], scope: str = "default", ttl: Optional[int] = None) -> None:
+        """Store several values at once; backends override this with a batched write."""
+
+        for key, value in items.items():
+            self.store(key, value, scope=scope, ttl=ttl)
+
+    def store_if_absent(self, key: str, value: Any, scope: str = "default", ttl: Optional[int] = None) -> bool:
+        """Store ``value`` only if ``key`` holds no live value; return whether it was written.
+
+        This default checks then writes, so it is only safe against writers in
+        this process; backends override it with an atomic conditional write.
+        """
+
+        if self.retrieve(key, scope=scope) is not None:
+            return False
+        self.store(key, value, scope=scope, ttl=ttl)
+        return True
+
+    def retrieve_many(self, keys: Iterable[str], scope: str = "default") -> Dict[str, Any]:
+        """Return values for ``keys``; missing or expired keys are omitted."""
+
+        found: Dict[str, Any] = {}
+        for key in keys:
+            value = self.retrieve(key, scope=scope)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def delete_many(self, keys: Iterable[str], scope: str = "default") -> int:
+        """Delete ``keys`` and return how many existed."""
+
+        return sum(1 for key in keys if self.delete(key, scope=scope))
+
+    def retrieve_with_expiry(self, key: str, scope: str = "default") -> Tuple[Any, Optional[float]]:
+        """Return ``(value, expires_at)``; backends without TTL tracking report ``None``."""
+
+        return self.retrieve(key, scope=scope), None
+
+    def retrieve_many_with_expiry(self, keys: Iterable[str], scope: str = "default") -> Dict[str, Tuple[Any, Optional[float]]]:
+        """Like :meth:`retrieve_many`, pairing each value with its expiry timestamp."""
+
+        return {key: (value, None) for key, value in self.retrieve_many(keys, scope=scope).items()}
+
+    # Async API: the blocking methods above run on a dedicated I/O pool (see
+    # MemoryIO); stores are coalesced into store_many batches.
+
+    io_threads = 4
+    _io: Optional[MemoryIO] = None
+
+    @property
+    def io(self) -> MemoryIO:
+        if self._io is None:
+            self._io = MemoryIO(self, threads=self.io_threads)
+        return self._io
+
+    async def astore(self, key: str, value: Any, scope: str = "default", ttl: Optional[int] = None) -> None:
+        await self.io.write({key: value}, scope, ttl)
+
+    async def astore_many(self, items: Dict[str, Any], scope: str = "default", ttl: Optional[int] = None) -> None:
+        if items:
+            await self.io.write(dict(items), scope, ttl)
+
+    async def aretrieve(self, key: str, scope: str = "default") -> Any:
+        await self.io.barrier()
+        return await self.io.run(self.retrieve, key, scope=scope)
+
+    async def aretrieve_many(self, keys: Iterable[str], scope: str = "default") -> Dict[str, Any]:
+        await self.io.barrier()
+        return await self.io.run(self.retrieve_many, list(keys), scope=scope)
+
+    async def adelete(self, key: str, scope: str = "default") -> bool:
+        await self.io.barrier()
+        return await self.io.run(self.delete, key, scope=scope)
+
+    async def adelete_many(self, keys: Iterable[str], scope: str = "default") -> int:
+        await self.io.barrier()
+        return await self.io.run(self.delete_many, list(keys), scope=scope)
+
+    async def alist_keys(self, scope: str = "default") -> List[str]:
+        await self.io.barrier()
+        return await self.io.run(self.list_keys, scope=scope)
+
+    async def ascan(
+        self,
+        scope: str = "default",
+        prefix: str = "",
+        start_after: Optional[str] = None,
+        limit: Optional[int] = None,
+        reverse: bool = False,
+        order: str = "key",
+    ) -> List[str]:
+        """Async :meth:`scan`, returning the page as a list."""
+
+        await self.io.barrier()
+        return await self.io.run(lambda: list(self.scan(scope, prefix, start_after, limit, reverse, order)))
+
+    async def aflush(self) -> None:
+        """Wait for all coalesced writes submitted so far to reach the backend."""
+
+        if self._io is not None:
+            await self._io.barrier()
+
+
+_SQL_UPSERT = "REPLACE INTO kv_store(scope, key, value, codec, expires_at) VALUES (?, ?, ?, ?, ?)"
+_SQL_LIVE = "(expires_at IS NULL OR expires_at >= ?)"
+_SQL_SELECT = f"SELECT value, codec, expires_at FROM kv_store WHERE scope = ? AND key = ? AND {_SQL_LIVE}"
+_SQL_DELETE = "DELETE FROM kv_store WHERE scope = ? AND key = ?"
+_SQL_LIST = f"SELECT key FROM kv_store WHERE scope = ? AND {_SQL_LIVE}"
+_SQL_SELECT_MANY = (
+    f"SELECT key, value, codec, expires_at FROM kv_store WHERE scope = ? AND {_SQL_LIVE} AND key IN ({{placeholders}})"
+)
+_SQL_PURGE = (
+    "DELETE FROM kv_store WHERE rowid IN "
+    "(SELECT rowid FROM kv_store WHERE expires_at IS NOT NULL AND expires_at < ? LIMIT ?)"
+)
+
+# Stay well below SQLite's default limit on bound variables per statement.
+_MAX_BATCH_VARIABLES = 500
+# Rows fetched per query by scan(); the reader is returned to the pool in between.
+_SCAN_PAGE_SIZE = 1000
+
+
+def _chunks(items: List[Any], size: int) -> Iterator[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
 
-class SQLiteMemory(BaseMemory):
-    """Lightweight SQLite-based key-value store."""
 
-    def __init__(self, path: str) -> None:
+def _check_order(memory: BaseMemory, order: str) -> None:
+    if order not in memory.scan_orders:
+        raise ValueError(f"{type(memory).__name__} cannot scan in {order!r} order; supported: {memory.scan_orders}")
+
+
+def _page(keys: List[str], start_after: Optional[str], limit: Optional[int], reverse: bool) -> Iterator[str]:
+    """Apply cursor, direction and limit to an already sorted key list."""
+
+    if reverse:
+        end = bisect.bisect_left(keys, start_after) if start_after is not None else len(keys)
+        selected = keys[max(0, end - limit) if limit is not None else 0 : end][::-1]
+    else:
+        begin = bisect.bisect_right(keys, start_after) if start_after is not None else 0
+        selected = keys[begin : begin + limit if limit is not None else None]
+    return iter(selected)
+
+
+def _prefix_upper_bound(prefix: str) -> Optional[str]:
+    """Smallest string greater than every string starting with ``prefix``."""
+
+    stripped = prefix.rstrip(chr(0x10FFFF))
+    if not stripped:
+        return None
+    following = ord(stripped[-1]) + 1
+    if 0xD800 <= following < 0xE000:  # surrogates cannot be encoded; skip past them
+        following = 0xE000
+    return stripped[:-1] + chr(following)
+
+
+class SQLiteMemory(BaseMemory):
+    """SQLite-based key-value store with long-lived, pooled connections.
+
+    A single writer connection (guarded by a lock) handles all mutations while
+    a small pool of reader connections serves lookups concurrently. File
+    databases run in WAL mode so readers never wait on the writer and only see
+    committed data. ``":memory:"`` has no WAL, so there reads go through the
+    writer connection under its lock instead of a pool: a separate shared-cache
+    connection would either block on table locks or, with ``read_uncommitted``,
+    see writes of transactions that are later rolled back.
+
+    Expired rows are never returned: reads filter on ``expires_at`` in SQL and
+    a background sweeper deletes them in batches every ``sweep_interval``
+    seconds (pass ``None`` to disable it and call :meth:`purge_expired`).
+
+    Values are stored as BLOBs together with the name of the codec that wrote
+    them, so changing ``codec`` or ``scope_codecs`` never breaks older rows.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        readers: int = 4,
+        sweep_interval: Optional[float] = 60.0,
+        sweep_batch_size: int = 1000,
+        codec: Union[str, Codec] = "json",
+        scope_codecs: Optional[Dict[str, Union[str, Codec]]] = None,
+    ) -> None:
         self.path = path
+        self.set_codec(codec)
+        for scope, scope_codec in (scope_codecs or {}).items():
+            self.set_codec(scope_codec, scope=scope)
+        self.sweep_batch_size = sweep_batch_size
+        self._in_memory = path == ":memory:"
+        if self._in_memory:
+            self._target = f"file:colonyos-{uuid4().hex}?mode=memory&cache=shared"
+        else:
+            self._target = path
         self._lock = threading.Lock()
+        self._writer = self._connect()
         self._initialize()
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._all_readers: List[sqlite3.Connection] = []
+        for _ in range(0 if self._in_memory else max(readers, 1)):
+            conn = self._connect(reader=True)
+            self._readers.put(conn)
+            self._all_readers.append(conn)
+
+        self._sweeper_stop = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+        if sweep_interval:
+            self._sweeper = threading.Thread(
+                target=_sweep_expired,
+                args=(weakref.ref(self), self._sweeper_stop, sweep_interval),
+                name="colonyos-ttl-sweeper",
+                daemon=True,
+            )
+            self._sweeper.start()
+
+    def _connect(self, reader: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self._target,
+            uri=self._in_memory,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=256,
+        )
+        conn.execute("PRAGMA busy_timeout = 5000")
+        conn.execute("PRAGMA cache_size = -16000")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        if not self._in_memory:
+            if not reader:
+                conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA mmap_size = 268435456")
+        return conn
 
     def _initialize(self) -> None:
-        with sqlite3.connect(self.path) as conn:
+        with self._lock:
+            conn = self._writer
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS kv_store (
                     scope TEXT NOT NULL,
                     key TEXT NOT NULL,
-                    value TEXT NOT NULL,
-                    expires_at REAL
+                    value BLOB NOT NULL,
+                    expires_at REAL,
+                    codec TEXT NOT NULL DEFAULT 'json'
                 )
                 """
             )
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_kv_scope_key ON kv_store(scope, key)")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(kv_store)")}
+            if "codec" not in columns:
+                # Rows written before codecs existed hold JSON text.
+                conn.execute("ALTER TABLE kv_store ADD COLUMN codec TEXT NOT NULL DEFAULT 'json'")
+            try:
+                conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_kv_scope_key_unique ON kv_store(scope, key)")
+            except sqlite3.IntegrityError:
+                # Older databases used a non-unique index, so REPLACE could leave
+                # duplicates behind; keep the most recent row for each key.
+                conn.execute(
+                    "DELETE FROM kv_store WHERE rowid NOT IN (SELECT MAX(rowid) FROM kv_store GROUP BY scope, key)"
+                )
+                conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_kv_scope_key_unique ON kv_store(scope, key)")
+            conn.execute("DROP INDEX IF EXISTS idx_kv_scope_key")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_kv_expires_at ON kv_store(expires_at) WHERE expires_at IS NOT NULL"
+            )
+            # Entries are ordered by (scope, rowid), serving insertion-order scans.
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_kv_scope ON kv_store(scope)")
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection for reads that only ever sees committed data.
+
+        Do not write through it, and do not hold it while waiting on this
+        store from another thread: for ``":memory:"`` it is the writer
+        connection, held under the writer lock.
+        """
+
+        if self._in_memory:
+            with self._lock:
+                yield self._writer
+            return
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run several writes on the writer connection as one transaction.
+
+        Yields the writer connection with the writer lock held; the
+        transaction commits when the block exits and rolls back if it raises.
+        Other stores may use this to keep their own tables in this database
+        (see :class:`~colonyos.guardian.audit_store.SQLiteAuditStore`).
+        """
+
+        with self._lock:
+            conn = self._writer
+            conn.execute("BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def purge_expired(self) -> int:
+        """Delete expired rows in batches, releasing the writer lock between them."""
+
+        removed = 0
+        while True:
+            with self._lock:
+                deleted = self._writer.execute(_SQL_PURGE, (time.time(), self.sweep_batch_size)).rowcount
+            removed += deleted
+            if deleted < self.sweep_batch_size:
+                return removed
+
+    def vacuum(self) -> None:
+        """Rebuild the database file to reclaim space left by deleted rows."""
+
+        with self._lock:
+            self._writer.execute("VACUUM")
+            if not self._in_memory:
+                self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self) -> None:
+        """Stop the sweeper and close the writer and all pooled reader connections."""
+
+        self._sweeper_stop.set()
+        with self._lock:
+            for conn in self._all_readers:
+                conn.close()
+            self._all_readers.clear()
+            self._writer.close()
+
+    def _encode(self, value: Any, scope: str) -> Tuple[bytes, str]:
+        codec = self.codec_for(scope)
+        return codec.encode(value), codec.name
 
     def store(self, key: str, value: Any, scope: str = "default", ttl: Optional[int] = None) -> None:
         expires_at = None
         if ttl:
             expires_at = time.time() + ttl
 
-        payload = json.dumps(value)
-        with self._lock, sqlite3.connect(self.path) as conn:
-            conn.execute(
-                "REPLACE INTO kv_store(scope, key, value, expires_at) VALUES (?, ?, ?, ?)",
-                (scope, key, payload, expires_at),
-            )
+        payload, codec = self._encode(value, scope)
+        with self._lock:
+            self._writer.execute(_SQL_UPSERT, (scope, key, payload, codec, expires_at))
+
+    def store_if_absent(self, key: str, value: Any, scope: str = "default", ttl: Optional[int] = None) -> bool:
+        expires_at = time.time() + ttl if ttl else None
+        payload, codec = self._encode(value, scope)
+        with self.transaction() as conn:
+            if conn.execute(_SQL_SELECT, (scope, key, time.time())).fetchone():
+                return False
+            conn.execute(_SQL_UPSERT, (scope, key, payload, codec, expires_at))
+        return True
 
     def retrieve(self, key: str, scope: str = "default") -> Any:
-        with self._lock, sqlite3.connect(self.path) as conn:
-            row = conn.execute(
-                "SELECT value, expires_at FROM kv_store WHERE scope = ? AND key = ?",
-                (scope, key),
-            ).fetchone()
-            if not row:
-                return None
-            value, expires_at = row
-            if expires_at and expires_at < time.time():
-                conn.execute("DELETE FROM kv_store WHERE scope = ? AND key = ?", (scope, key))
-                return None
-            return json.loads(value)
+        return self.retrieve_with_expiry(key, scope)[0]
+
+    def retrieve_with_expiry(self, key: str, scope: str = "default") -> Tuple[Any, Optional[float]]:
+        with self.reader() as conn:
+            row = conn.execute(_SQL_SELECT, (scope, key, time.time())).fetchone()
+        if not row:
+            return None, None
+        value, codec, expires_at = row
+        return get_codec(codec).decode(value), expires_at
 
     def delete(self, key: str, scope: str = "default") -> bool:
-        with self._lock, sqlite3.connect(self.path) as conn:
-            cur = conn.execute("DELETE FROM kv_store WHERE scope = ? AND key = ?", (scope, key))
+        with self._lock:
+            cur = self._writer.execute(_SQL_DELETE, (scope, key))
             return cur.rowcount > 0
 
     def list_keys(self, scope: str = "default") -> List[str]:
-        with self._lock, sqlite3.connect(self.path) as conn:
-            rows = conn.execute("SELECT key, expires_at FROM kv_store WHERE scope = ?", (scope,)).fetchall()
-            keys: List[str] = []
-            for key, expires_at in rows:
-                if expires_at and expires_at < time.time():
-                    conn.execute("DELETE FROM kv_store WHERE scope = ? AND key = ?", (scope, key))
-                    continue
-                keys.append(key)
-            return keys
-
-
-class RedisMemory(BaseMemory):
-    """Placeholder Redis-backed memory using in-memory dict for tests."""
-
-    def __init__(self, url: str) -> None:
-        self.url = url
-        self._store: Dict[str, Dict[str, Any]] = {}
-        self._expiry: Dict[str, Dict[str, float]] = {}
+        with self.reader() as conn:
+            return [key for (key,) in conn.execute(_SQL_LIST, (scope, time.time()))]
+
+    scan_orders = ("key", "insertion")
+
+    def scan(
+        self,
+        scope: str = "default",
+        prefix: str = "",
+        start_after: Optional[str] = None,
+        limit: Optional[int] = None,
+        reverse: bool = False,
+        order: str = "key",
+    ) -> Iterator[str]:
+        """Page through ``scope`` with keyset range scans.
+
+        Key order walks the ``(scope, key)`` index and insertion order the
+        ``scope`` index (whose entries are sorted by rowid). Because ``store``
+        replaces rows, insertion order is really last-write order.
+        """
+
+        _check_order(self, order)
+        return self._scan(scope, prefix, start_after, limit, reverse, order == "insertion")
+
+    def _scan(
+        self,
+        scope: str,
+        prefix: str,
+        start_after: Optional[str],
+        limit: Optional[int],
+        reverse: bool,
+        by_insertion: bool,
+    ) -> Iterator[str]:
+        clauses = ["scope = ?", _SQL_LIVE]
+        bounds: List[Any] = []
+        if prefix:
+            clauses.append("key >= ?")
+            bounds.append(prefix)
+            upper = _prefix_upper_bound(prefix)
+            if upper is not None:
+                clauses.append("key < ?")
+                bounds.append(upper)
+        column = "rowid" if by_insertion else "key"
+        cursor: Any = start_after
+        if by_insertion and start_after is not None:
+            with self.reader() as conn:
+                row = conn.execute("SELECT rowid FROM kv_store WHERE scope = ? AND key = ?", (scope, start_after)).fetchone()
+            if row is None:
+                raise KeyError(f"Cursor key {start_after!r} not found in scope {scope!r}")
+            cursor = row[0]
+        comparison = "<" if reverse else ">"
+        direction = "DESC" if reverse else "ASC"
+        remaining = limit
+        while remaining is None or remaining > 0:
+            page = _SCAN_PAGE_SIZE if remaining is None else min(_SCAN_PAGE_SIZE, remaining)
+            where = clauses + ([f"{column} {comparison} ?"] if cursor is not None else [])
+            sql = f"SELECT rowid, key FROM kv_store WHERE {' AND '.join(where)} ORDER BY {column} {direction} LIMIT ?"
+            params = (scope, time.time(), *bounds, *([cursor] if cursor is not None else []), page)
+            with self.reader() as conn:
+                rows = conn.execute(sql, params).fetchall()
+            for _, key in rows:
+                yield key
+            if len(rows) < page:
+                return
+            cursor = rows[-1][0] if by_insertion else rows[-1][1]
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def store_many(self, items: Dict[str, Any], scope: str = "default", ttl: Optional[int] = None) -> None:
+        if not items:
+            return
+        expires_at = time.time() + ttl if ttl else None
+        codec = self.codec_for(scope)
+        rows = [(scope, key, codec.encode(value), codec.name, expires_at) for key, value in items.items()]
+        with self.transaction() as conn:
+            conn.executemany(_SQL_UPSERT, rows)
+
+    def retrieve_many(self, keys: Iterable[str], scope: str = "default") -> Dict[str, Any]:
+        return {key: value for key, (value, _) in self.retrieve_many_with_expiry(keys, scope).items()}
+
+    def retrieve_many_with_expiry(self, keys: Iterable[str], scope: str = "default") -> Dict[str, Tuple[Any, Optional[float]]]:
+        wanted = list(dict.fromkeys(keys))
+        found: Dict[str, Tuple[Any, Optional[float]]] = {}
+        now = time.time()
+        with self.reader() as conn:
+            for chunk in _chunks(wanted, _MAX_BATCH_VARIABLES):
+                sql = _SQL_SELECT_MANY.format(placeholders=",".join("?" * len(chunk)))
+                for key, value, codec, expires_at in conn.execute(sql, (scope, now, *chunk)):
+                    found[key] = (get_codec(codec).decode(value), expires_at)
+        return {key: found[key] for key in wanted if key in found}
+
+    def delete_many(self, keys: Iterable[str], scope: str = "default") -> int:
+        rows = [(scope, key) for key in dict.fromkeys(keys)]
+        if not rows:
+            return 0
+        with self.transaction() as conn:
+            return conn.executemany(_SQL_DELETE, rows).rowcount
+
+
+def _sweep_expired(memory_ref: "weakref.ref[SQLiteMemory]", stop: threading.Event, interval: float) -> None:
+    """Sweeper loop; holds only a weak reference so the store can be collected."""
+
+    while not stop.wait(interval):
+        memory = memory_ref()
+        if memory is None:
+            return
+        try:
+            removed = memory.purge_expired()
+            if removed:
+                logger.debug("Purged %s expired rows from %s", removed, memory.path)
+        except sqlite3.ProgrammingError:  # closed underneath us
+            return
+        except sqlite3.Error as exc:  # pragma: no cover - keep sweeping
+            logger.warning("TTL sweep failed: %s", exc)
+        finally:
+            del memory
+
+
+class ShardedSQLiteMemory(BaseMemory):
+    """Spreads scopes over several :class:`SQLiteMemory` files.
+
+    Each shard has its own writer connection, lock, reader pool and sweeper,
+    so writes to scopes on different shards never contend. ``scope_shards``
+    pins scopes to named shards (``{"audit": "audit"}`` gives the audit log a
+    file of its own); every other scope is placed on one of ``shards`` hash
+    shards by a CRC32 of its name. Scopes listed in ``spread_scopes`` are
+    instead split across the hash shards by key, for scopes too hot for one
+    writer; those scopes only support key-order scans.
+
+    ``directory`` holds one ``<shard>.db`` file per shard; ``":memory:"``
+    keeps every shard in memory. Remaining keyword arguments are passed to
+    each :class:`SQLiteMemory`.
+    """
+
+    scan_orders = ("key", "insertion")
+
+    def __init__(
+        self,
+        directory: str,
+        shards: int = 4,
+        scope_shards: Optional[Mapping[str, str]] = None,
+        spread_scopes: Collection[str] = (),
+        codec: Union[str, Codec] = "json",
+        scope_codecs: Optional[Dict[str, Union[str, Codec]]] = None,
+        **options: Any,
+    ) -> None:
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        self.directory = directory
+        self.scope_shards = dict(scope_shards or {})
+        self.spread_scopes = frozenset(spread_scopes)
+        pinned_spread = self.spread_scopes & set(self.scope_shards)
+        if pinned_spread:
+            raise ValueError(f"Scopes cannot be both pinned and spread: {sorted(pinned_spread)}")
+        if directory != ":memory:":
+            os.makedirs(directory, exist_ok=True)
+        options.update(codec=codec, scope_codecs=scope_codecs)
+        self._hashed = [f"shard-{index:02d}" for index in range(shards)]
+        names = list(dict.fromkeys(self._hashed + list(self.scope_shards.values())))
+        self.shards: Dict[str, SQLiteMemory] = {name: self._open(name, options) for name in names}
+        self.set_codec(codec)
+        for scope, scope_codec in (scope_codecs or {}).items():
+            self.set_codec(scope_codec, scope=scope)
+
+    def _open(self, name: str, options: Dict[str, Any]) -> SQLiteMemory:
+        path = ":memory:" if self.directory == ":memory:" else os.path.join(self.directory, f"{name}.db")
+        return SQLiteMemory(path, **options)
+
+    def set_codec(self, codec: Union[str, Codec], scope: Optional[str] = None) -> None:
+        super().set_codec(codec, scope)
+        for shard in getattr(self, "shards", {}).values():
+            shard.set_codec(codec, scope)
+
+    def shard_name(self, scope: str, key: Optional[str] = None) -> str:
+        """Name of the shard holding ``key`` in ``scope``."""
+
+        pinned = self.scope_shards.get(scope)
+        if pinned is not None:
+            return pinned
+        if scope in self.spread_scopes:
+            if key is None:
+                raise ValueError(f"Scope {scope!r} is spread by key; a key is required")
+            token = f"{scope}\0{key}"
+        else:
+            token = scope
+        return self._hashed[zlib.crc32(token.encode("utf-8")) % len(self._hashed)]
+
+    def shard_for(self, scope: str, key: Optional[str] = None) -> SQLiteMemory:
+        """The shard holding ``key`` in ``scope``, or every key of a scope that is not spread.
+
+        Stores that keep their own tables next to a scope's rows use the
+        returned :class:`SQLiteMemory` through its public API.
+        """
+
+        return self.shards[self.shard_name(scope, key)]
+
+    def _scope_shards(self, scope: str) -> List[SQLiteMemory]:
+        if scope in self.spread_scopes:
+            return [self.shards[name] for name in self._hashed]
+        return [self.shard_for(scope)]
+
+    def _group(self, keys: Iterable[str], scope: str) -> Dict[str, List[str]]:
+        groups: Dict[str, List[str]] = {}
+        for key in keys:
+            groups.setdefault(self.shard_name(scope, key), []).append(key)
+        return groups
 
     def store(self, key: str, value: Any, scope: str = "default", ttl: Optional[int] = None) -> None:
-        scope_store = self._store.setdefault(scope, {})
-        scope_store[key] = value
-        if ttl:
-            self._expiry.setdefault(scope, {})[key] = time.time() + ttl
+        self.shard_for(scope, key).store(key, value, scope=scope, ttl=ttl)
+
+    def store_if_absent(self, key: str, value: Any, scope: str = "default", ttl: Optional[int] = None) -> bool:
+        return self.shard_for(scope, key).store_if_absent(key, value, scope=scope, ttl=ttl)
 
     def retrieve(self, key: str, scope: str = "default") -> Any:
-        expires = self._expiry.get(scope, {}).get(key)
-        if expires and expires < time.time():
-            self.delete(key, scope)
-            return None
-        return self._store.get(scope, {}).get(key)
+        return self.shard_for(scope, key).retrieve(key, scope=scope)
+
+    def retrieve_with_expiry(self, key: str, scope: str = "default") -> Tuple[Any, Optional[float]]:
+        return self.shard_for(scope, key).retrieve_with_expiry(key, scope=scope)
 
     def delete(self, key: str, scope: str = "default") -> bool:
-        existed = key in self._store.get(scope, {})
-        self._store.get(scope, {}).pop(key, None)
-        self._expiry.get(scope, {}).pop(key, None)
-        return existed
+        return self.shard_for(scope, key).delete(key, scope=scope)
 
     def list_keys(self, scope: str = "default") -> List[str]:
-        keys = list(self._store.get(scope, {}).keys())
-        return [key for key in keys if self.retrieve(key, scope) is not None]
+        return [key for shard in self._scope_shards(scope) for key in shard.list_keys(scope)]
+
+    def scan(
+        self,
+        scope: str = "default",
+        prefix: str = "",
+        start_after: Optional[str] = None,
+        limit: Optional[int] = None,
+        reverse: bool = False,
+        order: str = "key",
+    ) -> Iterator[str]:
+        _check_order(self, order)
+        shards = self._scope_shards(scope)
+        if len(shards) == 1:
+            return shards[0].scan(scope, prefix, start_after, limit, reverse, order)
+        if order != "key":
+            raise ValueError(f"Scope {scope!r} is spread across shards and only supports key-order scans")
+        # Each shard yields keys in order; merging them keeps the global order.
+        merged = heapq.merge(*(shard.scan(scope, prefix, start_after, limit, reverse) for shard in shards), reverse=reverse)
+        return itertools.islice(merged, limit)
+
+    def store_many(self, items: Dict[str, Any], scope: str = "default", ttl: Optional[int] = None) -> None:
+        for name, keys in self._group(items, scope).items():
+            self.shards[name].store_many({key: items[key] for key in keys}, scope=scope, ttl=ttl)
+
+    def retrieve_many(self, keys: Iterable[str], scope: str = "default") -> Dict[str, Any]:
+        return {key: value for key, (value, _) in self.retrieve_many_with_expiry(keys, scope).items()}
+
+    def retrieve_many_with_expiry(self, keys: Iterable[str], scope: str = "default") -> Dict[str, Tuple[Any, Optional[float]]]:
+        wanted = list(dict.fromkeys(keys))
+        found: Dict[str, Tuple[Any, Optional[float]]] = {}
+        for name, group in self._group(wanted, scope).items():
+            found.update(self.shards[name].retrieve_many_with_expiry(group, scope=scope))
+        return {key: found[key] for key in wanted if key in found}
+
+    def delete_many(self, keys: Iterable[str], scope: str = "default") -> int:
+        return sum(
+            self.shards[name].delete_many(group, scope=scope)
+            for name, group in self._group(dict.fromkeys(keys), scope).items()
+        )
+
+    def purge_expired(self) -> int:
+        return sum(shard.purge_expired() for shard in self.shards.values())
+
+    def vacuum(self, shard: Optional[str] = None) -> None:
+        """Vacuum one shard by name, or every shard in turn."""
+
+        targets = [self.shards[shard]] if shard is not None else list(self.shards.values())
+        for target in targets:
+            target.vacuum()
+
+    def close(self) -> None:
+        for shard in self.shards.values():
+            shard.close()
+
+
+class RedisMemory(BaseMemory):
+    """Redis-backed store shared by every process pointed at the same server.
+
+    Keys are namespaced as ``<key_prefix>:<scope>:<key>``. Values carry their
+    codec name as a ``<codec>\\0`` header so codecs can change per scope or
+    over time. TTLs are native Redis expiries, multi-key operations are
+    pipelined over a pooled connection, and :meth:`iter_keys` pages through a
+    scope with ``SCAN`` instead of materialising the keyspace.
+    """
+
+    scan_orders = ("key", "any")
+
+    def __init__(
+        self,
+        url: str,
+        key_prefix: str = "colonyos",
+        codec: Union[str, Codec] = "json",
+        scope_codecs: Optional[Dict[str, Union[str, Codec]]] = None,
+        max_connections: int = 16,
+        scan_count: int = 1000,
+    ) -> None:
+        self.url = url
+        self.key_prefix = key_prefix
+        self.scan_count = scan_count
+        self.client = RespClient(url, max_connections=max_connections)
+        self.set_codec(codec)
+        for scope, scope_codec in (scope_codecs or {}).items():
+            self.set_codec(scope_codec, scope=scope)
+
+    def _key(self, key: str, scope: str) -> str:
+        return f"{self.key_prefix}:{scope}:{key}"
+
+    def _encode(self, value: Any, scope: str) -> bytes:
+        codec = self.codec_for(scope)
+        return codec.name.encode("ascii") + b"\0" + codec.encode(value)
+
+    @staticmethod
+    def _decode(payload: Optional[bytes]) -> Any:
+        if payload is None:
+            return None
+        name, _, body = payload.partition(b"\0")
+        return get_codec(name.decode("ascii")).decode(body)
+
+    def _set_command(self, key: str, value: Any, scope: str, ttl: Optional[int]) -> List[Any]:
+        command: List[Any] = ["SET", self._key(key, scope), self._encode(value, scope)]
+        if ttl:
+            command += ["PX", max(int(ttl * 1000), 1)]
+        return command
+
+    def store(self, key: str, value: Any, scope: str = "default", ttl: Optional[int] = None) -> None:
+        self.client.execute(*self._set_command(key, value, scope, ttl))
 
+    def store_if_absent(self, key: str, value: Any, scope: str = "default", ttl: Optional[int] = None) -> bool:
+        return self.client.execute(*self._set_command(key, value, scope, ttl), "NX") is not None
 
-class VectorMemory:
-    """Simple vector memory placeholder."""
+    def retrieve(self, key: str, scope: str = "default") -> Any:
+        return self._decode(self.client.execute("GET", self._key(key, scope)))
 
-    def __init__(self) -> None:
-        self._store: Dict[str, List[float]] = {}
+    def retrieve_with_expiry(self, key: str, scope: str = "default") -> Tuple[Any, Optional[float]]:
+        name = self._key(key, scope)
+        payload, remaining = self.client.pipeline([("GET", name), ("PTTL", name)])
+        if payload is None:
+            return None, None
+        return self._decode(payload), time.time() + remaining / 1000 if remaining >= 0 else None
 
-    def upsert(self, key: str, vector: List[float]) -> None:
-        self._store[key] = vector
+    def delete(self, key: str, scope: str = "default") -> bool:
+        return self.client.execute("DEL", self._key(key, scope)) > 0
 
-    def query(self, vector: List[float], top_k: int = 5) -> List[str]:
-        return list(self._store.keys())[:top_k]
+    def iter_keys(self, scope: str = "default", page_size: Optional[int] = None, prefix: str = "") -> Iterator[str]:
+        """Yield the keys of ``scope`` (optionally starting with ``prefix``) page by page using ``SCAN``.
 
+        ``SCAN`` may return a key more than once; each key is yielded once.
+        """
 
-class HybridMemory:
-    """Composite memory combining relational and vector stores."""
+        namespace = self._key("", scope)
+        match = escape_glob(namespace + prefix) + "*"
+        seen: Set[bytes] = set()
+        for name in self.client.scan_iter(match=match, count=page_size or self.scan_count):
+            if name not in seen:
+                seen.add(name)
+                yield name.decode("utf-8")[len(namespace) :]
 
-    def __init__(self, relational: BaseMemory, vector: Optional[VectorMemory] = None) -> None:
+    def list_keys(self, scope: str = "default") -> List[str]:
+        return list(self.iter_keys(scope))
+
+    def scan(
+        self,
+        scope: str = "default",
+        prefix: str = "",
+        start_after: Optional[str] = None,
+        limit: Optional[int] = None,
+        reverse: bool = False,
+        order: str = "key",
+    ) -> Iterator[str]:
+        """Key-ordered scan; ``SCAN`` is unordered, so matches are sorted client-side.
+
+        The prefix is pushed into the ``MATCH`` pattern, so only keys under it
+        are transferred, but every page, even with ``limit=1``, still lists and
+        sorts all N matching keys: O(N) per call. When any keys will do (e.g.
+        an emptiness probe), pass ``order="any"``; it streams ``SCAN`` results
+        unsorted and stops after ``limit`` keys, without cursor support.
+        """
+
+        _check_order(self, order)
+        if order == "any":
+            if start_after is not None:
+                raise ValueError("Unordered scans do not support start_after")
+            return itertools.islice(self.iter_keys(scope, prefix=prefix), limit)
+        return _page(sorted(self.iter_keys(scope, prefix=prefix)), start_after, limit, reverse)
+
+    def store_many(self, items: Dict[str, Any], scope: str = "default", ttl: Optional[int] = None) -> None:
+        commands = [self._set_command(key, value, scope, ttl) for key, value in items.items()]
+        for chunk in _chunks(commands, _MAX_BATCH_VARIABLES):
+            self.client.pipeline(chunk)
+
+    def retrieve_many(self, keys: Iterable[str], scope: str = "default") -> Dict[str, Any]:
+        return {key: value for key, (value, _) in self.retrieve_many_with_expiry(keys, scope).items()}
+
+    def retrieve_many_with_expiry(self, keys: Iterable[str], scope: str = "default") -> Dict[str, Tuple[Any, Optional[float]]]:
+        wanted = list(dict.fromkeys(keys))
+        found: Dict[str, Tuple[Any, Optional[float]]] = {}
+        for chunk in _chunks(wanted, _MAX_BATCH_VARIABLES):
+            names = [self._key(key, scope) for key in chunk]
+            replies = self.client.pipeline([("MGET", *names)] + [("PTTL", name) for name in names])
+            now = time.time()
+            for key, payload, remaining in zip(chunk, replies[0], replies[1:]):
+                if payload is not None:
+                    found[key] = (self._decode(payload), now + remaining / 1000 if remaining >= 0 else None)
+        return found
+
+    def delete_many(self, keys: Iterable[str], scope: str = "default") -> int:
+        names = [self._key(key, scope) for key in dict.fromkeys(keys)]
+        return sum(self.client.execute("DEL", *chunk) for chunk in _chunks(names, _MAX_BATCH_VARIABLES))
+
+    def close(self) -> None:
+        self.client.close()
+
+
+class HybridMemory(BaseMemory):
+    """Composite memory combining relational and vector stores.
+
+    With a :class:`MemoryCache`, reads go through an in-process LRU that honours
+    backend expiry; every write or delete made through this object invalidates
+    the affected keys before returning.
+    """
+
+    def __init__(
+        self,
+        relational: BaseMemory,
+        vector: Optional[VectorMemory] = None,
+        cache: Optional[MemoryCache] = None,
+    ) -> None:
         self.relational = relational
         self.vector = vector
+        self.cache = cache
 
     def store(self, key: str, value: Any, scope: str = "default", ttl: Optional[int] = None) -> None:
-        self.relational.store(key, value, scope=scope, ttl=ttl)
+        try:
+            self.relational.store(key, value, scope=scope, ttl=ttl)
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate(scope, key)
 
     def retrieve(self, key: str, scope: str = "default") -> Any:
-        return self.relational.retrieve(key, scope=scope)
+        cache = self.cache
+        if cache is None:
+            return self.relational.retrieve(key, scope=scope)
+        cached = cache.get(scope, key)
+        if cached is not MISSING:
+            return cached
+        epoch = cache.epoch
+        value, expires_at = self.relational.retrieve_with_expiry(key, scope=scope)
+        cache.put(scope, key, value, expires_at, epoch=epoch)
+        return value
 
     def delete(self, key: str, scope: str = "default") -> bool:
-        return self.relational.delete(key, scope=scope)
+        try:
+            return self.relational.delete(key, scope=scope)
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate(scope, key)
 
     def list_keys(self, scope: str = "default") -> List[str]:
         return self.relational.list_keys(scope=scope)
 
-    def upsert_vector(self, key: str, vector: List[float]) -> None:
+    @property  # type: ignore[override]
+    def scan_orders(self) -> Tuple[str, ...]:
+        return self.relational.scan_orders
+
+    def scan(
+        self,
+        scope: str = "default",
+        prefix: str = "",
+        start_after: Optional[str] = None,
+        limit: Optional[int] = None,
+        reverse: bool = False,
+        order: str = "key",
+    ) -> Iterator[str]:
+        return self.relational.scan(scope, prefix, start_after, limit, reverse, order)
+
+    def store_many(self, items: Dict[str, Any], scope: str = "default", ttl: Optional[int] = None) -> None:
+        try:
+            self.relational.store_many(items, scope=scope, ttl=ttl)
+        finally:
+            if self.cache is not None:
+                for key in items:
+                    self.cache.invalidate(scope, key)
+
+    def store_if_absent(self, key: str, value: Any, scope: str = "default", ttl: Optional[int] = None) -> bool:
+        try:
+            return self.relational.store_if_absent(key, value, scope=scope, ttl=ttl)
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate(scope, key)
+
+    def retrieve_many(self, keys: Iterable[str], scope: str = "default") -> Dict[str, Any]:
+        cache = self.cache
+        if cache is None:
+            return self.relational.retrieve_many(keys, scope=scope)
+        wanted = list(dict.fromkeys(keys))
+        found: Dict[str, Any] = {}
+        missing: List[str] = []
+        for key in wanted:
+            cached = cache.get(scope, key)
+            if cached is MISSING:
+                missing.append(key)
+            elif cached is not None:
+                found[key] = cached
+        if missing:
+            epoch = cache.epoch
+            loaded = self.relational.retrieve_many_with_expiry(missing, scope=scope)
+            for key in missing:
+                value, expires_at = loaded.get(key, (None, None))
+                cache.put(scope, key, value, expires_at, epoch=epoch)
+                if value is not None:
+                    found[key] = value
+        return {key: found[key] for key in wanted if key in found}
+
+    def delete_many(self, keys: Iterable[str], scope: str = "default") -> int:
+        keys = list(keys)
+        try:
+            return self.relational.delete_many(keys, scope=scope)
+        finally:
+            if self.cache is not None:
+                for key in keys:
+                    self.cache.invalidate(scope, key)
+
+    async def aflush(self) -> None:
+        # Callers such as the audit log write through the relational store directly.
+        await super().aflush()
+        await self.relational.aflush()
+
+    def upsert_vector(self, key: str, vector: List[float], metadata: Optional[Dict[str, Any]] = None) -> None:
         if not self.vector:
             raise RuntimeError("Vector backend not configured")
-        self.vector.upsert(key, vector)
+        self.vector.upsert(key, vector, metadata=metadata)
+
+    def query_vector(
+        self,
+        vector: List[float],
+        top_k: int = 5,
+        where: Optional[Dict[str, Any]] = None,
+        **search_params: Any,
+    ) -> List[str]:
+        """Nearest keys to ``vector`` among those whose metadata matches ``where``.
+
+        ``search_params`` tune ANN indexes (e.g. ``nprobe``).
+        """
 
-    def query_vector(self, vector: List[float], top_k: int = 5) -> List[str]:
         if not self.vector:
             return []
-        return self.vector.query(vector, top_k=top_k)
+        return self.vector.query(vector, top_k=top_k, where=where, **search_params)
@@ -0,0 +1,111 @@
+"""Thread-pool offload and write coalescing behind the async memory API."""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover
+    from colonyos.core.memory import BaseMemory
+
+_PendingWrite = Tuple[str, Optional[int], Dict[str, Any], "asyncio.Future[None]"]
+
+
+class MemoryIO:
+    """Runs blocking memory calls on a dedicated pool, keeping the event loop free.
+
+    Writes are coalesced: while one batch is being applied, new ``store``
+    calls queue up and are then written together through ``store_many`` (one
+    transaction for SQLite, one pipeline for Redis). Consecutive writes to the
+    same scope and TTL merge, later values for a key winning. Reads and
+    deletes first wait for every write submitted before them, so callers
+    always read their own writes.
+    """
+
+    def __init__(self, memory: "BaseMemory", threads: int = 4) -> None:
+        self.memory = memory
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="colonyos-memory")
+        self.batches = 0
+        self.writes = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: List[_PendingWrite] = []
+        self._flusher: Optional["asyncio.Task[None]"] = None
+        self._last: Optional["asyncio.Future[None]"] = None
+
+    def _bind(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Futures belong to one loop; start afresh if the caller's loop changed.
+            self._loop = loop
+            self._pending = []
+            self._flusher = None
+            self._last = None
+        return loop
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        loop = self._bind()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def write(self, items: Dict[str, Any], scope: str, ttl: Optional[int]) -> None:
+        """Queue ``items`` for the next batch and wait until they are stored."""
+
+        loop = self._bind()
+        future: "asyncio.Future[None]" = loop.create_future()
+        self._pending.append((scope, ttl, items, future))
+        self._last = future
+        if self._flusher is None or self._flusher.done():
+            self._flusher = loop.create_task(self._flush())
+        await future
+
+    async def barrier(self) -> None:
+        """Wait until every write submitted so far has been applied (or failed)."""
+
+        self._bind()
+        last = self._last
+        if last is not None and not last.done():
+            await asyncio.wait([last])
+
+    async def _flush(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            batch, self._pending = self._pending, []
+            try:
+                errors = await loop.run_in_executor(self.executor, self._apply, batch)
+            except BaseException as exc:  # pragma: no cover - executor shut down
+                errors = [exc] * len(batch)
+            for (_, _, _, future), error in zip(batch, errors):
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(error)
+
+    def _apply(self, batch: List[_PendingWrite]) -> List[Optional[BaseException]]:
+        errors: List[Optional[BaseException]] = []
+        start = 0
+        while start < len(batch):
+            scope, ttl = batch[start][0], batch[start][1]
+            end = start
+            merged: Dict[str, Any] = {}
+            while end < len(batch) and batch[end][0] == scope and batch[end][1] == ttl:
+                merged.update(batch[end][2])
+                end += 1
+            error: Optional[BaseException] = None
+            try:
+                self.memory.store_many(merged, scope=scope, ttl=ttl)
+            except Exception as exc:
+                error = exc
+            self.batches += 1
+            self.writes += end - start
+            errors.extend([error] * (end - start))
+            start = end
+        return errors
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True)
+
+
+__all__ = ["MemoryIO"]
@@ -0,0 +1,515 @@
+"""Minimal Redis protocol (RESP2) client, connection pool and local stand-in server.
+
+The client implements just what the memory backend needs: single commands,
+pipelines (many commands written in one go, replies read back in order) and a
+bounded pool of long-lived connections. :class:`LocalRespServer` speaks the
+same protocol in-process for tests and single-node development; it supports
+the string, expiry and keyspace commands used by :class:`RedisMemory`.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import re
+import socket
+import socketserver
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from urllib.parse import unquote, urlparse
+
+logger = logging.getLogger(__name__)
+
+Arg = Union[str, bytes, int, float]
+
+
+class RespError(Exception):
+    """Error reply sent by the server (``-ERR ...``)."""
+
+
+def _encode_arg(arg: Arg) -> bytes:
+    if isinstance(arg, bytes):
+        return arg
+    if isinstance(arg, str):
+        return arg.encode("utf-8")
+    return str(arg).encode("ascii")
+
+
+def encode_command(args: Sequence[Arg]) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = _encode_arg(arg)
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+def read_reply(reader: BinaryIO) -> Any:
+    """Read one reply; error replies are returned as :class:`RespError` instances."""
+
+    line = reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by server")
+    prefix, body = line[:1], line[1:-2]
+    if prefix == b"+":
+        return body.decode("utf-8")
+    if prefix == b"-":
+        return RespError(body.decode("utf-8"))
+    if prefix == b":":
+        return int(body)
+    if prefix == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        return reader.read(length + 2)[:-2]
+    if prefix == b"*":
+        length = int(body)
+        if length < 0:
+            return None
+        return [read_reply(reader) for _ in range(length)]
+    raise ConnectionError(f"Unexpected reply prefix {prefix!r}")
+
+
+class RespConnection:
+    """One TCP connection with a buffered reader."""
+
+    def __init__(self, host: str, port: int, timeout: Optional[float] = None) -> None:
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self.sock.makefile("rb")
+
+    def execute_many(self, commands: Sequence[Sequence[Arg]]) -> List[Any]:
+        self.sock.sendall(b"".join(encode_command(command) for command in commands))
+        return [read_reply(self._reader) for _ in commands]
+
+    def close(self) -> None:
+        try:
+            self._reader.close()
+        finally:
+            self.sock.close()
+
+
+class RespConnectionPool:
+    """Bounded LIFO pool of connections to the server named by a ``redis://`` URL."""
+
+    def __init__(self, url: str, max_connections: int = 16, timeout: Optional[float] = 10.0) -> None:
+        parsed = urlparse(url)
+        if parsed.scheme not in ("redis", ""):
+            raise ValueError(f"Unsupported URL scheme: {parsed.scheme}")
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[RespConnection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _open(self) -> RespConnection:
+        conn = RespConnection(self.host, self.port, self.timeout)
+        setup: List[Sequence[Arg]] = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        for reply in conn.execute_many(setup) if setup else []:
+            if isinstance(reply, RespError):
+                conn.close()
+                raise reply
+        return conn
+
+    def _acquire(self) -> RespConnection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.max_connections
+            if create:
+                self._created += 1
+        if create:
+            try:
+                return self._open()
+            except BaseException:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError("Timed out waiting for a pooled connection") from None
+
+    @contextmanager
+    def connection(self) -> Iterator[RespConnection]:
+        conn = self._acquire()
+        try:
+            yield conn
+        except BaseException:
+            # Interrupted mid-exchange (I/O error, timeout, cancellation...), the
+            # stream may hold unread replies; never hand it out again.
+            conn.close()
+            with self._lock:
+                self._created -= 1
+            raise
+        self._idle.put(conn)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._created -= 1
+
+
+class RespClient:
+    """Pooled client: :meth:`execute` for one command, :meth:`pipeline` for many."""
+
+    def __init__(self, url: str, max_connections: int = 16, timeout: Optional[float] = 10.0) -> None:
+        self.url = url
+        self.pool = RespConnectionPool(url, max_connections=max_connections, timeout=timeout)
+
+    def execute(self, *args: Arg) -> Any:
+        reply = self.pipeline([args])[0]
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+    def pipeline(self, commands: Sequence[Sequence[Arg]], raise_on_error: bool = True) -> List[Any]:
+        """Send ``commands`` in one write and return their replies in order."""
+
+        if not commands:
+            return []
+        with self.pool.connection() as conn:
+            replies = conn.execute_many(commands)
+        if raise_on_error:
+            for reply in replies:
+                if isinstance(reply, RespError):
+                    raise reply
+        return replies
+
+    def scan_iter(self, match: Optional[str] = None, count: int = 1000) -> Iterator[bytes]:
+        cursor = b"0"
+        while True:
+            args: List[Arg] = ["SCAN", cursor]
+            if match is not None:
+                args += ["MATCH", match]
+            args += ["COUNT", count]
+            cursor, keys = self.execute(*args)
+            yield from keys
+            if cursor == b"0":
+                return
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+def escape_glob(text: str) -> str:
+    """Escape Redis glob metacharacters so ``text`` matches literally."""
+
+    return re.sub(r"([*?\[\]\\])", r"\\\1", text)
+
+
+def _glob_to_regex(pattern: bytes) -> "re.Pattern[bytes]":
+    out = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i : i + 1]
+        if char == b"\\" and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1 : i + 2]))
+            i += 2
+            continue
+        if char == b"*":
+            out.append(b".*")
+        elif char == b"?":
+            out.append(b".")
+        elif char == b"[":
+            end = pattern.find(b"]", i + 1)
+            if end == -1:
+                out.append(re.escape(char))
+            else:
+                body = pattern[i + 1 : end]
+                if body.startswith(b"^"):
+                    body = b"^" + re.escape(body[1:]).replace(b"\\-", b"-")
+                else:
+                    body = re.escape(body).replace(b"\\-", b"-")
+                out.append(b"[" + body + b"]")
+                i = end
+        else:
+            out.append(re.escape(char))
+        i += 1
+    return re.compile(b"".join(out) + b"\\Z", re.DOTALL)
+
+
+class _Keyspace:
+    """Thread-safe dictionary of string values with millisecond expiry."""
+
+    def __init__(self) -> None:
+        self.values: Dict[bytes, bytes] = {}
+        self.expires: Dict[bytes, float] = {}
+        self.lock = threading.Lock()
+
+    def alive(self, key: bytes) -> bool:
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.time() * 1000:
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+            return False
+        return key in self.values
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "_Server"
+
+    def handle(self) -> None:
+        while True:
+            try:
+                command = read_reply(self.rfile)
+            except (ConnectionError, OSError, ValueError):
+                return
+            if not isinstance(command, list) or not command:
+                self.wfile.write(b"-ERR protocol error\r\n")
+                return
+            try:
+                reply = self.server.dispatch(command)
+            except RespError as exc:
+                reply = exc
+            except (ValueError, IndexError):
+                reply = RespError("ERR syntax error")
+            self.wfile.write(_encode_reply(reply))
+
+
+def _encode_reply(reply: Any) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, RespError):
+        return b"-%s\r\n" % str(reply).encode("utf-8")
+    if isinstance(reply, _Status):
+        return b"+%s\r\n" % reply.encode("utf-8")
+    if isinstance(reply, bool):
+        return b":%d\r\n" % int(reply)
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    if isinstance(reply, list):
+        return b"*%d\r\n" % len(reply) + b"".join(_encode_reply(item) for item in reply)
+    raise TypeError(f"Cannot encode reply {reply!r}")
+
+
+class _Status(str):
+    """Simple-string reply such as ``+OK``."""
+
+
+_OK = _Status("OK")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int], scan_duplicates: bool = False) -> None:
+        super().__init__(address, _Handler)
+        self.keyspace = _Keyspace()
+        self.scan_duplicates = scan_duplicates
+
+    def dispatch(self, command: List[bytes]) -> Any:
+        name = command[0].upper().decode("ascii")
+        handler = getattr(self, f"cmd_{name.lower()}", None)
+        if handler is None:
+            raise RespError(f"ERR unknown command '{name}'")
+        with self.keyspace.lock:
+            return handler(*command[1:])
+
+    # Connection -----------------------------------------------------------
+
+    def cmd_ping(self, *args: bytes) -> Any:
+        return args[0] if args else _Status("PONG")
+
+    def cmd_echo(self, message: bytes) -> bytes:
+        return message
+
+    def cmd_auth(self, *args: bytes) -> Any:
+        return _OK
+
+    def cmd_select(self, db: bytes) -> Any:
+        return _OK
+
+    def cmd_client(self, *args: bytes) -> Any:
+        return _OK
+
+    # Strings --------------------------------------------------------------
+
+    def cmd_get(self, key: bytes) -> Optional[bytes]:
+        space = self.keyspace
+        return space.values[key] if space.alive(key) else None
+
+    def cmd_mget(self, *keys: bytes) -> List[Optional[bytes]]:
+        return [self.cmd_get(key) for key in keys]
+
+    def cmd_set(self, key: bytes, value: bytes, *options: bytes) -> Any:
+        space = self.keyspace
+        deadline: Optional[float] = None
+        opts = [option.upper() for option in options]
+        i = 0
+        while i < len(opts):
+            if opts[i] == b"EX":
+                deadline = time.time() * 1000 + int(opts[i + 1]) * 1000
+                i += 2
+            elif opts[i] == b"PX":
+                deadline = time.time() * 1000 + int(opts[i + 1])
+                i += 2
+            elif opts[i] in (b"NX", b"XX"):
+                exists = space.alive(key)
+                if (opts[i] == b"NX") == exists:
+                    return None
+                i += 1
+            else:
+                raise RespError("ERR syntax error")
+        space.values[key] = value
+        if deadline is None:
+            space.expires.pop(key, None)
+        else:
+            space.expires[key] = deadline
+        return _OK
+
+    def cmd_mset(self, *pairs: bytes) -> Any:
+        if not pairs or len(pairs) % 2:
+            raise RespError("ERR wrong number of arguments for 'mset' command")
+        for key, value in zip(pairs[::2], pairs[1::2]):
+            self.cmd_set(key, value)
+        return _OK
+
+    # Keyspace -------------------------------------------------------------
+
+    def cmd_del(self, *keys: bytes) -> int:
+        space = self.keyspace
+        removed = 0
+        for key in keys:
+            if space.alive(key):
+                del space.values[key]
+                space.expires.pop(key, None)
+                removed += 1
+        return removed
+
+    def cmd_exists(self, *keys: bytes) -> int:
+        return sum(1 for key in keys if self.keyspace.alive(key))
+
+    def cmd_pexpire(self, key: bytes, milliseconds: bytes) -> int:
+        space = self.keyspace
+        if not space.alive(key):
+            return 0
+        space.expires[key] = time.time() * 1000 + int(milliseconds)
+        return 1
+
+    def cmd_expire(self, key: bytes, seconds: bytes) -> int:
+        return self.cmd_pexpire(key, str(int(seconds) * 1000).encode("ascii"))
+
+    def cmd_pttl(self, key: bytes) -> int:
+        space = self.keyspace
+        if not space.alive(key):
+            return -2
+        deadline = space.expires.get(key)
+        return -1 if deadline is None else max(int(deadline - time.time() * 1000), 0)
+
+    def cmd_ttl(self, key: bytes) -> int:
+        remaining = self.cmd_pttl(key)
+        return remaining if remaining < 0 else (remaining + 999) // 1000
+
+    def cmd_scan(self, cursor: bytes, *options: bytes) -> List[Any]:
+        match: Optional["re.Pattern[bytes]"] = None
+        count = 10
+        opts = list(options)
+        for i in range(0, len(opts), 2):
+            option = opts[i].upper()
+            if option == b"MATCH":
+                match = _glob_to_regex(opts[i + 1])
+            elif option == b"COUNT":
+                count = int(opts[i + 1])
+            else:
+                raise RespError("ERR syntax error")
+        # Cursor is a position in the sorted keyspace, so a full iteration
+        # returns every key that existed throughout, as real SCAN guarantees.
+        keys = sorted(self.keyspace.values)
+        start = int(cursor)
+        # Real SCAN may return a key more than once (e.g. while rehashing);
+        # scan_duplicates mimics that by repeating half of the previous page.
+        overlap = max(1, count // 2) if self.scan_duplicates else 0
+        window = keys[max(0, start - overlap) : start + count]
+        found = [key for key in window if self.keyspace.alive(key) and (match is None or match.match(key))]
+        following = start + count
+        return [b"0" if following >= len(keys) else str(following).encode("ascii"), found]
+
+    def cmd_keys(self, pattern: bytes) -> List[bytes]:
+        regex = _glob_to_regex(pattern)
+        return [key for key in list(self.keyspace.values) if self.keyspace.alive(key) and regex.match(key)]
+
+    def cmd_dbsize(self) -> int:
+        return sum(1 for key in list(self.keyspace.values) if self.keyspace.alive(key))
+
+    def cmd_flushdb(self, *args: bytes) -> Any:
+        self.keyspace.values.clear()
+        self.keyspace.expires.clear()
+        return _OK
+
+    cmd_flushall = cmd_flushdb
+
+
+class LocalRespServer:
+    """In-process RESP server on a background thread (tests and single-node setups).
+
+    Usage::
+
+        with LocalRespServer() as server:
+            memory = RedisMemory(server.url)
+
+    ``scan_duplicates`` makes ``SCAN`` repeat keys across pages, as a real
+    server may, so clients can be tested against it.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, scan_duplicates: bool = False) -> None:
+        self._server = _Server((host, port), scan_duplicates=scan_duplicates)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        host, port = self._server.server_address[:2]
+        return str(host), int(port)
+
+    @property
+    def url(self) -> str:
+        host, port = self.address
+        return f"redis://{host}:{port}/0"
+
+    def start(self) -> "LocalRespServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="colonyos-resp", daemon=True)
+        self._thread.start()
+        logger.debug("Local RESP server listening on %s", self.url)
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "LocalRespServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+__all__ = [
+    "LocalRespServer",
+    "RespClient",
+    "RespConnection",
+    "RespConnectionPool",
+    "RespError",
+    "encode_command",
+    "escape_glob",
+    "read_reply",
+]
@@ -26,6 +26,9 @@ class TaskStatus(Enum):
     REJECTED = "rejected"
 
 
+_STATUS_BY_VALUE = {status.value: status for status in TaskStatus}
+
+
 class WorkerStatus(Enum):
     """Status states for worker availability."""
 
@@ -198,6 +201,18 @@ class Event:
     data: Dict[str, Any]
     source: str
     timestamp: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    sequence: int = 0
+
+    def to_wire_format(self) -> Dict[str, Any]:
+        """Serialize for transport to API clients."""
+
+        return {
+            "type": self.event_type,
+            "data": self.data,
+            "timestamp": self.timestamp.isoformat(),
+            "source": self.source,
+            "sequence": self.sequence,
+        }
 
 
 @dataclass
@@ -272,6 +287,21 @@ class Task:
             return (datetime.now(timezone.utc) - self.started_at).total_seconds()
         return None
 
+    def snapshot(self) -> "Task":
+        """Cheap point-in-time copy for serialising outside the kernel lock.
+
+        Top-level fields and the ``requirements``/``constraints``/``metadata``
+        dicts are copied; values nested deeper, and ``result``, are shared and
+        must be replaced rather than mutated in place.
+        """
+
+        copy = object.__new__(Task)
+        copy.__dict__.update(self.__dict__)
+        copy.requirements = dict(self.requirements)
+        copy.constraints = dict(self.constraints)
+        copy.metadata = dict(self.metadata)
+        return copy
+
     def to_wire_format(self) -> Dict[str, Any]:
         return {
             "id": self.id,
@@ -296,33 +326,28 @@ class Task:
 
     @classmethod
     def from_wire_format(cls, payload: Dict[str, Any]) -> "Task":
-        task = cls(
+        get = payload.get
+        created_at, started_at, completed_at = get("created_at"), get("started_at"), get("completed_at")
+        return cls(
             id=payload["id"],
             description=payload["description"],
-            created_by=payload.get("created_by", "unknown"),
-            priority=payload.get("priority", 0),
-            status=TaskStatus(payload.get("status", TaskStatus.PENDING.value)),
-            timeout_seconds=payload.get("timeout_seconds"),
-            requirements=payload.get("requirements", {}),
-            constraints=payload.get("constraints", {}),
-            metadata=payload.get("metadata", {}),
-            result=payload.get("result"),
-            error=payload.get("error"),
-            error_trace=payload.get("error_trace"),
-            max_retries=payload.get("max_retries", 0),
-            retry_count=payload.get("retry_count", 0),
+            created_by=get("created_by", "unknown"),
+            priority=get("priority", 0),
+            status=_STATUS_BY_VALUE.get(get("status")) or TaskStatus(get("status", TaskStatus.PENDING.value)),
+            created_at=datetime.fromisoformat(created_at) if created_at else datetime.now(timezone.utc),
+            started_at=datetime.fromisoformat(started_at) if started_at else None,
+            completed_at=datetime.fromisoformat(completed_at) if completed_at else None,
+            assigned_worker=get("assigned_worker"),
+            timeout_seconds=get("timeout_seconds"),
+            requirements=get("requirements", {}),
+            constraints=get("constraints", {}),
+            metadata=get("metadata", {}),
+            result=get("result"),
+            error=get("error"),
+            error_trace=get("error_trace"),
+            max_retries=get("max_retries", 0),
+            retry_count=get("retry_count", 0),
         )
-        created_at = payload.get("created_at")
-        if created_at:
-            task.created_at = datetime.fromisoformat(created_at)
-        started_at = payload.get("started_at")
-        if started_at:
-            task.started_at = datetime.fromisoformat(started_at)
-        completed_at = payload.get("completed_at")
-        if completed_at:
-            task.completed_at = datetime.fromisoformat(completed_at)
-        task.assigned_worker = payload.get("assigned_worker")
-        return task
 
 
 @dataclass
@@ -379,9 +404,32 @@ class ColonyConfig:
     worker_heartbeat_timeout: int = 120
     memory_backend: str = "sqlite"
     memory_connection_string: str = ":memory:"
+    memory_shards: int = 4
+    memory_scope_shards: Dict[str, str] = field(
+        default_factory=lambda: {"audit": "audit", "checkpoints": "checkpoints", "checkpoints.meta": "checkpoints"}
+    )
+    memory_key_prefix: str = "colonyos"
+    memory_codec: str = "json"
+    # Portable by default: "auto" picks msgpack/lz4 when installed, and rows
+    # written that way cannot be read by processes without those packages.
+    memory_scope_codecs: Dict[str, str] = field(
+        default_factory=lambda: {"checkpoints": "json+zlib", "audit": "json+zlib"}
+    )
+    memory_cache_entries: int = 0
+    memory_cache_bytes: int = 64 * 1024 * 1024
+    memory_cache_negative_ttl: Optional[float] = 5.0
     event_bus_type: str = "inmemory"
+    event_log_path: Optional[str] = None
+    event_log_segment_bytes: int = 64 * 1024 * 1024
+    event_log_retention_bytes: Optional[int] = None
+    event_log_retention_seconds: Optional[int] = None
+    event_log_fsync: bool = False
     message_queue_url: Optional[str] = None
     vector_db_backend: Optional[str] = None
+    vector_db_path: Optional[str] = None
+    vector_metric: str = "cosine"
+    vector_index_params: Dict[str, Any] = field(default_factory=dict)
+    checkpoint_full_every: int = 16
     mind: Dict[str, Any] = field(default_factory=dict)
     guardian: Dict[str, Any] = field(
         default_factory=lambda: {"consensus_threshold": 0.66, "drift_threshold": 0.3}
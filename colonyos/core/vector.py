@@ -0,0 +1,687 @@
+"""Vector similarity memory backed by a contiguous NumPy matrix."""
+
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from colonyos.core.vector_metadata import Filter, MetadataIndex
+
+METRICS = ("cosine", "dot", "l2")
+STORAGE_DTYPES = ("float32", "float16")
+QUANTIZATIONS = ("int8",)
+
+_META_FILE = "index.json"
+_METADATA_FILE = "metadata.npz"
+_IVF_FILE = "ivf.npz"
+# Rows converted to float32 at a time when scoring float16 or int8 storage.
+_SCORE_CHUNK = 2048
+
+
+class _Column:
+    """A growable array, optionally backed by a memory-mapped file."""
+
+    def __init__(self, dtype: Any, width: Optional[int], capacity: int, path: Optional[str] = None) -> None:
+        self.dtype = np.dtype(dtype)
+        self.tail: Tuple[int, ...] = (width,) if width else ()
+        self.path = path
+        if path is not None and os.path.exists(path) and os.path.getsize(path):
+            self.data = np.memmap(path, dtype=self.dtype, mode="r+", shape=(self._rows_on_disk(),) + self.tail)
+        elif path is not None:
+            self.data = np.memmap(path, dtype=self.dtype, mode="w+", shape=(capacity,) + self.tail)
+        else:
+            self.data = np.empty((capacity,) + self.tail, dtype=self.dtype)
+
+    @property
+    def _row_bytes(self) -> int:
+        return int(self.dtype.itemsize * int(np.prod(self.tail, dtype=np.int64)))
+
+    def _rows_on_disk(self) -> int:
+        assert self.path is not None
+        return os.path.getsize(self.path) // self._row_bytes
+
+    def reserve(self, size: int, used: int) -> None:
+        capacity = self.data.shape[0]
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        if self.path is None:
+            grown = np.empty((capacity,) + self.tail, dtype=self.dtype)
+            grown[:used] = self.data[:used]
+            self.data = grown
+            return
+        # Extend the file in place and remap; existing rows stay where they are.
+        self.data.flush()
+        del self.data
+        with open(self.path, "r+b") as handle:
+            handle.truncate(capacity * self._row_bytes)
+        self.data = np.memmap(self.path, dtype=self.dtype, mode="r+", shape=(capacity,) + self.tail)
+
+    def flush(self) -> None:
+        if isinstance(self.data, np.memmap):
+            self.data.flush()
+
+
+def _matmul(queries: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """``queries @ matrix.T`` that upcasts non-float32 storage chunk by chunk."""
+
+    if matrix.dtype == np.float32:
+        return queries @ matrix.T
+    out = np.empty((queries.shape[0], matrix.shape[0]), dtype=np.float32)
+    for start in range(0, matrix.shape[0], _SCORE_CHUNK):
+        block = matrix[start : start + _SCORE_CHUNK].astype(np.float32)
+        out[:, start : start + _SCORE_CHUNK] = queries @ block.T
+    return out
+
+
+def _quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-vector int8 codes and their float32 scales."""
+
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class VectorMemory:
+    """Exact nearest-neighbour search over float32 vectors.
+
+    Vectors live in one growable ``(capacity, dimension)`` matrix; a query is a
+    single matrix-vector product followed by ``argpartition``. For the
+    ``cosine`` metric rows are normalised on insert so scoring is a plain dot
+    product. Deletes move the last row into the freed slot.
+
+    With ``path`` the matrix (``float32`` or half-size ``float16``) and its
+    side arrays are memory-mapped files in that directory, so reopening is
+    instant and processes share the OS page cache; :meth:`flush` persists the
+    key index. ``quantization="int8"`` keeps 4x smaller codes for a coarse
+    pass and re-ranks the best ``top_k * rerank_factor`` rows exactly.
+
+    Each vector may carry metadata, stored column-wise (see
+    :mod:`colonyos.core.vector_metadata`); queries accept a ``where`` filter
+    that is compiled to a row mask so only matching vectors are scored.
+
+    Scores are similarities (higher first) for ``cosine`` and ``dot`` and
+    squared Euclidean distances (lower first) for ``l2``.
+    """
+
+    def __init__(
+        self,
+        dimension: Optional[int] = None,
+        metric: str = "cosine",
+        initial_capacity: int = 1024,
+        path: Optional[str] = None,
+        dtype: str = "float32",
+        quantization: Optional[str] = None,
+        rerank_factor: int = 4,
+    ) -> None:
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}; expected one of {', '.join(METRICS)}")
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Unknown dtype {dtype!r}; expected one of {', '.join(STORAGE_DTYPES)}")
+        if quantization is not None and quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization {quantization!r}")
+        self.metric = metric
+        self.dimension = dimension
+        self.path = path
+        self.dtype = dtype
+        self.quantization = quantization
+        self.rerank_factor = max(rerank_factor, 1)
+        self._initial_capacity = max(initial_capacity, 1)
+        self._vectors: Optional[_Column] = None
+        self._norms: Optional[_Column] = None
+        self._codes: Optional[_Column] = None
+        self._scales: Optional[_Column] = None
+        self._keys: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._metadata = MetadataIndex(self._initial_capacity)
+        # Bumped by every flush so side files written alongside index.json can
+        # tell whether they still describe it.
+        self._generation = 0
+        self._lock = threading.RLock()
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            if os.path.exists(os.path.join(path, _META_FILE)):
+                self._load()
+                return
+        if dimension is not None:
+            self._allocate(dimension)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._index
+
+    @property
+    def _matrix(self) -> Optional[np.ndarray]:
+        return self._vectors.data if self._vectors is not None else None
+
+    @property
+    def _sq_norms(self) -> Optional[np.ndarray]:
+        return self._norms.data if self._norms is not None else None
+
+    def _columns(self) -> List[_Column]:
+        return [column for column in (self._vectors, self._norms, self._codes, self._scales) if column is not None]
+
+    def _file(self, name: str) -> Optional[str]:
+        return os.path.join(self.path, name) if self.path is not None else None
+
+    def _allocate(self, dimension: int, capacity: Optional[int] = None) -> None:
+        self.dimension = dimension
+        capacity = capacity or self._initial_capacity
+        self._vectors = _Column(self.dtype, dimension, capacity, self._file(f"vectors.{self.dtype}"))
+        self._norms = _Column(np.float32, None, capacity, self._file("norms.float32"))
+        if self.quantization == "int8":
+            self._codes = _Column(np.int8, dimension, capacity, self._file("codes.int8"))
+            self._scales = _Column(np.float32, None, capacity, self._file("scales.float32"))
+
+    def _load(self) -> None:
+        assert self.path is not None
+        with open(os.path.join(self.path, _META_FILE), "r", encoding="utf-8") as handle:
+            meta = json.load(handle)
+        for name in ("metric", "dtype", "quantization"):
+            if meta[name] != getattr(self, name):
+                raise ValueError(f"{self.path} was written with {name}={meta[name]!r}, not {getattr(self, name)!r}")
+        if self.dimension is not None and meta["dimension"] != self.dimension:
+            raise ValueError(f"{self.path} holds vectors of dimension {meta['dimension']}")
+        self._keys = list(meta["keys"])
+        self._index = {key: row for row, key in enumerate(self._keys)}
+        self._generation = meta.get("generation", 0)
+        if meta["dimension"] is not None:
+            self._allocate(meta["dimension"])
+            if any(column.data.shape[0] < len(self._keys) for column in self._columns()):
+                raise ValueError(f"Vector files in {self.path} are shorter than the key index")
+        if meta.get("metadata"):
+            with np.load(os.path.join(self.path, _METADATA_FILE)) as arrays:
+                self._metadata = MetadataIndex.from_state(meta["metadata"], arrays, self._initial_capacity)
+
+    def flush(self) -> None:
+        """Flush mapped arrays and atomically rewrite the key index (no-op in memory)."""
+
+        if self.path is None:
+            return
+        with self._lock:
+            for column in self._columns():
+                column.flush()
+            metadata = self._metadata.state()
+            if metadata["schema"]:
+                target = os.path.join(self.path, _METADATA_FILE)
+                with open(target + ".tmp", "wb") as handle:
+                    np.savez(handle, **metadata["arrays"])
+                os.replace(target + ".tmp", target)
+            self._generation += 1
+            meta = {
+                "generation": self._generation,
+                "dimension": self.dimension,
+                "metric": self.metric,
+                "dtype": self.dtype,
+                "quantization": self.quantization,
+                "keys": self._keys,
+                "metadata": metadata["schema"],
+            }
+            target = os.path.join(self.path, _META_FILE)
+            with open(target + ".tmp", "w", encoding="utf-8") as handle:
+                json.dump(meta, handle, separators=(",", ":"))
+            os.replace(target + ".tmp", target)
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        """Validate a ``(n, dimension)`` batch and normalise it for cosine."""
+
+        if vectors.ndim != 2 or vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected vectors of dimension {self.dimension}, got shape {vectors.shape}")
+        if self.metric == "cosine":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            np.maximum(norms, np.finfo(np.float32).tiny, out=norms)
+            vectors = vectors / norms
+        return vectors
+
+    def upsert(self, key: str, vector: Sequence[float], metadata: Optional[Mapping[str, Any]] = None) -> None:
+        self.upsert_many([key], [vector], None if metadata is None else [metadata])
+
+    def upsert_many(
+        self,
+        keys: Sequence[str],
+        vectors: Iterable[Sequence[float]],
+        metadata: Optional[Sequence[Optional[Mapping[str, Any]]]] = None,
+    ) -> None:
+        """Insert or replace several vectors with one copy into the matrix.
+
+        ``metadata`` (one mapping or ``None`` per key) replaces any metadata
+        previously stored for those keys.
+        """
+
+        batch = np.asarray(vectors, dtype=np.float32)
+        if batch.ndim == 1:
+            batch = batch.reshape(1, -1)
+        if len(keys) != batch.shape[0]:
+            raise ValueError("keys and vectors must have the same length")
+        if metadata is not None and len(metadata) != len(keys):
+            raise ValueError("keys and metadata must have the same length")
+        with self._lock:
+            for item in metadata or ():
+                self._metadata.validate(item)
+            if self._vectors is None:
+                self._allocate(batch.shape[1])
+            batch = self._prepare(batch)
+            assert self._vectors is not None and self._norms is not None
+            used = len(self._keys)
+            rows = np.empty(len(keys), dtype=np.int64)
+            for position, key in enumerate(keys):
+                row = self._index.get(key)
+                if row is None:
+                    row = len(self._keys)
+                    self._index[key] = row
+                    self._keys.append(key)
+                rows[position] = row
+            for column in self._columns():
+                column.reserve(len(self._keys), used)
+            stored = batch.astype(self._vectors.dtype)
+            self._vectors.data[rows] = stored
+            exact = stored.astype(np.float32)
+            self._norms.data[rows] = np.einsum("ij,ij->i", exact, exact)
+            if self._codes is not None and self._scales is not None:
+                self._codes.data[rows], self._scales.data[rows] = _quantize_int8(exact)
+            self._metadata.reserve(len(self._keys))
+            for position, row in enumerate(rows.tolist()):
+                self._metadata.set(row, metadata[position] if metadata is not None else None)
+            self._on_write(rows, batch)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Return a float32 copy of the stored (normalised, for cosine) vector."""
+
+        with self._lock:
+            row = self._index.get(key)
+            if row is None or self._vectors is None:
+                return None
+            return self._vectors.data[row].astype(np.float32)
+
+    def get_metadata(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._index.get(key)
+            return None if row is None else self._metadata.get(row)
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            row = self._index.pop(key, None)
+            if row is None:
+                return False
+            last = len(self._keys) - 1
+            self._on_delete(row, last)
+            if row != last:
+                moved = self._keys[last]
+                for column in self._columns():
+                    column.data[row] = column.data[last]
+                self._metadata.move(last, row)
+                self._keys[row] = moved
+                self._index[moved] = row
+            self._metadata.clear(last)
+            self._keys.pop()
+            return True
+
+    def _filter_rows(self, where: Filter) -> np.ndarray:
+        """Row numbers whose metadata satisfies ``where``."""
+
+        return np.flatnonzero(self._metadata.mask(where, len(self._keys)))
+
+    def _on_write(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        """Hook for indexes: ``vectors`` were stored at ``rows``."""
+
+    def _on_delete(self, row: int, last: int) -> None:
+        """Hook for indexes: ``row`` is freed and ``last`` will move into it."""
+
+    def _scores(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return ``(m, n)`` scores where larger is always better.
+
+        ``rows`` restricts scoring to a subset of stored vectors.
+        """
+
+        assert self._matrix is not None and self._sq_norms is not None
+        count = len(self._keys)
+        if rows is None:
+            matrix, sq_norms = self._matrix[:count], self._sq_norms[:count]
+        else:
+            matrix, sq_norms = self._matrix[rows], self._sq_norms[rows]
+        return self._adjust(_matmul(queries, matrix), sq_norms)
+
+    def _coarse_scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Approximate ``(1, n)`` scores from the int8 codes."""
+
+        assert self._codes is not None and self._scales is not None and self._sq_norms is not None
+        count = len(self._keys)
+        if rows is None:
+            codes, scales, sq_norms = self._codes.data[:count], self._scales.data[:count], self._sq_norms[:count]
+        else:
+            codes, scales, sq_norms = self._codes.data[rows], self._scales.data[rows], self._sq_norms[rows]
+        scores = _matmul(query, codes)
+        scores *= scales
+        return self._adjust(scores, sq_norms)
+
+    def _adjust(self, scores: np.ndarray, sq_norms: np.ndarray) -> np.ndarray:
+        if self.metric == "l2":
+            # -(|x|^2 - 2 x.q + |q|^2); the |q|^2 term is added back for reporting.
+            scores *= 2
+            scores -= sq_norms
+        return scores
+
+    def _hits(self, query: np.ndarray, scores: np.ndarray, rows: np.ndarray) -> List[Tuple[str, float]]:
+        """Turn best-first ``rows`` and their internal scores into ``(key, score)``."""
+
+        if self.metric == "l2":
+            scores = float(query @ query) - scores
+        return [(self._keys[i], float(score)) for i, score in zip(rows.tolist(), scores.tolist())]
+
+    def _top_k(self, scores: np.ndarray, top_k: int) -> np.ndarray:
+        count = scores.shape[1]
+        if top_k >= count:
+            return np.argsort(-scores, axis=1, kind="stable")
+        candidates = np.argpartition(scores, count - top_k, axis=1)[:, count - top_k :]
+        order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind="stable")
+        return np.take_along_axis(candidates, order, axis=1)
+
+    def _search(self, query: np.ndarray, top_k: int, rows: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """Top-k for one prepared query over all rows or the given subset."""
+
+        candidates = rows if rows is not None else np.arange(len(self._keys))
+        shortlist = top_k * self.rerank_factor
+        if self._codes is not None and candidates.size > shortlist:
+            coarse = self._coarse_scores(query[None, :], rows)
+            candidates = candidates[self._top_k(coarse, shortlist)[0]]
+            rows = candidates
+        scores = self._scores(query[None, :], rows)
+        best = self._top_k(scores, top_k)[0]
+        return self._hits(query, scores[0, best], candidates[best])
+
+    def query_batch_with_scores(
+        self,
+        vectors: Iterable[Sequence[float]],
+        top_k: int = 5,
+        where: Optional[Filter] = None,
+        **search_params: Any,
+    ) -> List[List[Tuple[str, float]]]:
+        """Answer several queries with one matrix-matrix product.
+
+        ``where`` restricts the search to rows whose metadata matches; the
+        result is still the exact top-k among those rows. ``search_params``
+        are index tuning knobs (such as ``nprobe``); exact search has none and
+        ignores them.
+        """
+
+        queries = np.asarray(vectors, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        with self._lock:
+            if not self._keys or top_k <= 0:
+                return [[] for _ in range(queries.shape[0])]
+            queries = self._prepare(queries)
+            rows = self._filter_rows(where) if where else None
+            if rows is not None and rows.size == 0:
+                return [[] for _ in range(queries.shape[0])]
+            if self._codes is not None:
+                return [self._search(query, top_k, rows) for query in queries]
+            scores = self._scores(queries, rows)
+            best = self._top_k(scores, top_k)
+            return [
+                self._hits(queries[row], scores[row, indices], indices if rows is None else rows[indices])
+                for row, indices in enumerate(best)
+            ]
+
+    def query_with_scores(
+        self, vector: Sequence[float], top_k: int = 5, where: Optional[Filter] = None, **search_params: Any
+    ) -> List[Tuple[str, float]]:
+        return self.query_batch_with_scores([vector], top_k=top_k, where=where, **search_params)[0]
+
+    def query_batch(
+        self, vectors: Iterable[Sequence[float]], top_k: int = 5, where: Optional[Filter] = None, **search_params: Any
+    ) -> List[List[str]]:
+        batches = self.query_batch_with_scores(vectors, top_k=top_k, where=where, **search_params)
+        return [[key for key, _ in hits] for hits in batches]
+
+    def query(
+        self, vector: Sequence[float], top_k: int = 5, where: Optional[Filter] = None, **search_params: Any
+    ) -> List[str]:
+        return [key for key, _ in self.query_with_scores(vector, top_k=top_k, where=where, **search_params)]
+
+
+def _kmeans(
+    sample: np.ndarray, clusters: int, iterations: int, rng: np.random.Generator, spherical: bool
+) -> np.ndarray:
+    """Lloyd's k-means; ``spherical`` keeps centroids unit length (cosine)."""
+
+    centroids = sample[rng.choice(sample.shape[0], clusters, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _nearest(sample, centroids, spherical)
+        counts = np.bincount(labels, minlength=clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters from random points so every list stays useful.
+            sums[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()), replace=False)]
+            counts[empty] = 1
+        centroids = sums / counts[:, None]
+        if spherical:
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), np.finfo(np.float32).tiny)
+    return centroids.astype(np.float32)
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray, spherical: bool, chunk: int = 16384) -> np.ndarray:
+    labels = np.empty(vectors.shape[0], dtype=np.int32)
+    sq_norms = None if spherical else np.einsum("ij,ij->i", centroids, centroids)
+    for start in range(0, vectors.shape[0], chunk):
+        scores = vectors[start : start + chunk].astype(np.float32, copy=False) @ centroids.T
+        if sq_norms is not None:
+            scores *= 2
+            scores -= sq_norms
+        labels[start : start + chunk] = scores.argmax(axis=1)
+    return labels
+
+
+class IVFVectorMemory(VectorMemory):
+    """Approximate search with an inverted-file (IVF) index over k-means cells.
+
+    Vectors are stored exactly as in :class:`VectorMemory`; each one is also
+    assigned to its nearest of ``nlist`` centroids. A query scores only the
+    vectors in the ``nprobe`` closest cells, trading recall for speed. The
+    index trains itself once ``train_size`` vectors are stored (searching
+    exactly until then); later inserts are assigned incrementally, and
+    :meth:`train` can be called again after the distribution drifts.
+
+    Storage options (``path``, ``dtype``, ``quantization``) are passed through
+    to :class:`VectorMemory`. With ``path``, :meth:`flush` also saves the
+    centroids and cell assignments to ``ivf.npz``; a reopened index loads them
+    and only retrains if that file is missing or was not written with the
+    current ``index.json``.
+    """
+
+    def __init__(
+        self,
+        dimension: Optional[int] = None,
+        metric: str = "cosine",
+        nlist: int = 256,
+        nprobe: int = 8,
+        train_size: Optional[int] = None,
+        kmeans_iterations: int = 20,
+        initial_capacity: int = 1024,
+        seed: int = 0,
+        **storage: Any,
+    ) -> None:
+        super().__init__(dimension=dimension, metric=metric, initial_capacity=initial_capacity, **storage)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size or nlist * 39
+        self.kmeans_iterations = kmeans_iterations
+        self._rng = np.random.default_rng(seed)
+        self._centroids: Optional[np.ndarray] = None
+        self._assign = np.full(max(self._initial_capacity, len(self._keys)), -1, dtype=np.int32)
+        self._lists: List[Set[int]] = []
+        if not self._load_cells() and len(self._keys) >= self.train_size:
+            self.train()
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    def train(self, sample_size: Optional[int] = None) -> None:
+        """(Re)build centroids from a random sample and reassign every vector."""
+
+        with self._lock:
+            count = len(self._keys)
+            if count == 0:
+                return
+            assert self._matrix is not None
+            clusters = min(self.nlist, count)
+            size = min(count, sample_size or max(self.train_size, clusters * 64))
+            sample = self._matrix[np.sort(self._rng.choice(count, size, replace=False))].astype(np.float32)
+            spherical = self.metric != "l2"
+            self._centroids = _kmeans(sample, clusters, self.kmeans_iterations, self._rng, spherical)
+            self._index_cells(_nearest(self._matrix[:count], self._centroids, spherical))
+
+    def _index_cells(self, labels: np.ndarray) -> None:
+        """Assign rows ``0..len(labels)`` to cells and rebuild the inverted lists."""
+
+        assert self._centroids is not None
+        clusters = self._centroids.shape[0]
+        self._assign[: labels.shape[0]] = labels
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(clusters + 1))
+        self._lists = [set(order[bounds[i] : bounds[i + 1]].tolist()) for i in range(clusters)]
+
+    def _load_cells(self) -> bool:
+        """Restore centroids and assignments saved by :meth:`flush`, if still current."""
+
+        source = self._file(_IVF_FILE)
+        if source is None or not self._keys or not os.path.exists(source):
+            return False
+        with np.load(source) as arrays:
+            centroids, labels = arrays["centroids"], arrays["assign"]
+            generation, nlist = int(arrays["generation"]), int(arrays["nlist"])
+        if (
+            generation != self._generation
+            or nlist != self.nlist
+            or labels.shape[0] != len(self._keys)
+            or centroids.shape[1] != self.dimension
+        ):
+            return False
+        self._centroids = centroids.astype(np.float32, copy=False)
+        self._index_cells(labels.astype(np.int32, copy=False))
+        return True
+
+    def flush(self) -> None:
+        """Flush the vectors, then save the cells against the new ``index.json``."""
+
+        if self.path is None:
+            return
+        with self._lock:
+            super().flush()
+            if self._centroids is None:
+                return
+            target = os.path.join(self.path, _IVF_FILE)
+            with open(target + ".tmp", "wb") as handle:
+                np.savez(
+                    handle,
+                    centroids=self._centroids,
+                    assign=self._assign[: len(self._keys)],
+                    generation=np.int64(self._generation),
+                    nlist=np.int64(self.nlist),
+                )
+            os.replace(target + ".tmp", target)
+
+    def _on_write(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        needed = len(self._keys)
+        if needed > self._assign.shape[0]:
+            grown = np.full(max(needed, self._assign.shape[0] * 2), -1, dtype=np.int32)
+            grown[: self._assign.shape[0]] = self._assign
+            self._assign = grown
+        if self._centroids is None:
+            if needed >= self.train_size:
+                self.train()
+            return
+        labels = _nearest(vectors, self._centroids, self.metric != "l2")
+        for row, label in zip(rows.tolist(), labels.tolist()):
+            previous = self._assign[row]
+            if previous >= 0:
+                self._lists[previous].discard(row)
+            self._lists[label].add(row)
+            self._assign[row] = label
+
+    def _on_delete(self, row: int, last: int) -> None:
+        label = self._assign[row]
+        if label >= 0:
+            self._lists[label].discard(row)
+        if row != last:
+            moved = self._assign[last]
+            if moved >= 0:
+                self._lists[moved].discard(last)
+                self._lists[moved].add(row)
+            self._assign[row] = moved
+        self._assign[last] = -1
+
+    def query_batch_with_scores(
+        self,
+        vectors: Iterable[Sequence[float]],
+        top_k: int = 5,
+        where: Optional[Filter] = None,
+        nprobe: Optional[int] = None,
+        **search_params: Any,
+    ) -> List[List[Tuple[str, float]]]:
+        """Search the ``nprobe`` nearest cells per query (exact until trained).
+
+        With ``where``, probed cells are intersected with the filter mask. A
+        filter selective enough to match fewer rows than the probed cells
+        would hold is answered by exact search over the matching rows instead,
+        so selective filters cannot starve the result.
+        """
+
+        with self._lock:
+            if self._centroids is None:
+                return super().query_batch_with_scores(vectors, top_k=top_k, where=where)
+            queries = np.asarray(vectors, dtype=np.float32)
+            if queries.ndim == 1:
+                queries = queries.reshape(1, -1)
+            if top_k <= 0:
+                return [[] for _ in range(queries.shape[0])]
+            queries = self._prepare(queries)
+            probes = min(nprobe or self.nprobe, self._centroids.shape[0])
+            cell_scores = queries @ self._centroids.T
+            if self.metric == "l2":
+                cell_scores *= 2
+                cell_scores -= np.einsum("ij,ij->i", self._centroids, self._centroids)
+            nearest_cells = np.argpartition(-cell_scores, probes - 1, axis=1)[:, :probes]
+
+            mask: Optional[np.ndarray] = None
+            if where:
+                mask = self._metadata.mask(where, len(self._keys))
+                matching = np.flatnonzero(mask)
+                if matching.size <= len(self._keys) * probes / self._centroids.shape[0]:
+                    return [self._search(query, top_k, matching) if matching.size else [] for query in queries]
+
+            results: List[List[Tuple[str, float]]] = []
+            for query, cells in zip(queries, nearest_cells):
+                rows = np.fromiter(
+                    itertools.chain.from_iterable(self._lists[cell] for cell in cells.tolist()), dtype=np.int64
+                )
+                if mask is not None:
+                    rows = rows[mask[rows]]
+                results.append(self._search(query, top_k, rows) if rows.size else [])
+            return results
+
+
+def create_vector_memory(backend: str, metric: str = "cosine", **params: Any) -> VectorMemory:
+    """Build the vector index selected by ``ColonyConfig.vector_db_backend``."""
+
+    if backend in ("flat", "chromadb"):
+        # "chromadb" is kept for existing configs and maps to the local index.
+        return VectorMemory(metric=metric, **params)
+    if backend == "ivf":
+        return IVFVectorMemory(metric=metric, **params)
+    raise ValueError(f"Unknown vector backend: {backend}")
+
+
+__all__ = ["METRICS", "QUANTIZATIONS", "STORAGE_DTYPES", "IVFVectorMemory", "VectorMemory", "create_vector_memory"]
@@ -0,0 +1,335 @@
+"""Columnar metadata for vector rows and the filter expressions evaluated on it.
+
+Each metadata field becomes one column aligned with the vector matrix rows:
+numbers (and datetimes, as timestamps) in a float64 array, strings as int32
+codes into a per-field vocabulary, and lists of strings as one boolean bitmap
+per tag. A filter compiles to a boolean row mask before any vector is scored.
+
+Filters use a MongoDB-style dict::
+
+    {"scope": "tasks", "tags": {"$all": ["gpu"]}, "created_at": {"$gte": cutoff}}
+
+Top-level entries are ANDed. Field operators are ``$eq``, ``$ne``, ``$in``,
+``$nin``, ``$gt``, ``$gte``, ``$lt``, ``$lte``, ``$exists`` and (for tag
+fields) ``$all``; ``$and``, ``$or`` and ``$not`` combine sub-filters. A bare
+value means ``$eq``, which for tag fields tests membership.
+"""
+
+from __future__ import annotations
+
+import operator
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+
+Filter = Mapping[str, Any]
+
+_COMPARISONS: Dict[str, Callable[[Any, Any], Any]] = {
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+}
+
+
+def _grow(array: np.ndarray, capacity: int, fill: Any) -> np.ndarray:
+    if capacity <= array.shape[0]:
+        return array
+    grown = np.full(max(capacity, array.shape[0] * 2), fill, dtype=array.dtype)
+    grown[: array.shape[0]] = array
+    return grown
+
+
+def _as_number(value: Any) -> float:
+    return value.timestamp() if isinstance(value, datetime) else float(value)
+
+
+class _NumericField:
+    kind = "number"
+
+    def __init__(self, capacity: int) -> None:
+        self.values = np.full(capacity, np.nan)
+
+    def reserve(self, capacity: int) -> None:
+        self.values = _grow(self.values, capacity, np.nan)
+
+    def set(self, row: int, value: Any) -> None:
+        self.values[row] = np.nan if value is None else _as_number(value)
+
+    def move(self, src: int, dst: int) -> None:
+        self.values[dst] = self.values[src]
+
+    def get(self, row: int) -> Any:
+        value = self.values[row]
+        return None if np.isnan(value) else float(value)
+
+    def exists(self, count: int) -> np.ndarray:
+        return ~np.isnan(self.values[:count])
+
+    def match(self, op: str, operand: Any, count: int) -> np.ndarray:
+        values = self.values[:count]
+        if op in ("$eq", "$ne"):
+            mask = values == _as_number(operand)
+            return ~mask if op == "$ne" else mask
+        if op in ("$in", "$nin"):
+            mask = np.isin(values, [_as_number(item) for item in operand])
+            return ~mask if op == "$nin" else mask
+        if op in _COMPARISONS:
+            return _COMPARISONS[op](values, _as_number(operand))
+        raise ValueError(f"Operator {op} is not supported on numeric fields")
+
+
+class _CategoryField:
+    kind = "category"
+
+    def __init__(self, capacity: int) -> None:
+        self.codes = np.full(capacity, -1, dtype=np.int32)
+        self.vocabulary: List[str] = []
+        self._lookup: Dict[str, int] = {}
+
+    def reserve(self, capacity: int) -> None:
+        self.codes = _grow(self.codes, capacity, -1)
+
+    def _code(self, value: str) -> int:
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.vocabulary)
+            self.vocabulary.append(value)
+        return code
+
+    def set(self, row: int, value: Any) -> None:
+        self.codes[row] = -1 if value is None else self._code(value)
+
+    def move(self, src: int, dst: int) -> None:
+        self.codes[dst] = self.codes[src]
+
+    def get(self, row: int) -> Any:
+        code = self.codes[row]
+        return None if code < 0 else self.vocabulary[code]
+
+    def exists(self, count: int) -> np.ndarray:
+        return self.codes[:count] >= 0
+
+    def match(self, op: str, operand: Any, count: int) -> np.ndarray:
+        codes = self.codes[:count]
+        if op in ("$eq", "$ne"):
+            mask = codes == self._lookup.get(operand, -2)
+            return ~mask if op == "$ne" else mask
+        if op in ("$in", "$nin"):
+            mask = np.isin(codes, [self._lookup.get(item, -2) for item in operand])
+            return ~mask if op == "$nin" else mask
+        if op in _COMPARISONS:
+            # Evaluate on the (small) vocabulary, then select matching codes.
+            compare = _COMPARISONS[op]
+            wanted = [code for code, value in enumerate(self.vocabulary) if compare(value, operand)]
+            return np.isin(codes, wanted)
+        raise ValueError(f"Operator {op} is not supported on string fields")
+
+
+class _TagField:
+    kind = "tags"
+
+    def __init__(self, capacity: int) -> None:
+        self.present = np.zeros(capacity, dtype=bool)
+        self.bitmaps: Dict[str, np.ndarray] = {}
+
+    def reserve(self, capacity: int) -> None:
+        self.present = _grow(self.present, capacity, False)
+        for tag, bitmap in self.bitmaps.items():
+            self.bitmaps[tag] = _grow(bitmap, self.present.shape[0], False)
+
+    def set(self, row: int, value: Any) -> None:
+        for bitmap in self.bitmaps.values():
+            bitmap[row] = False
+        self.present[row] = value is not None
+        for tag in value or ():
+            bitmap = self.bitmaps.get(tag)
+            if bitmap is None:
+                bitmap = self.bitmaps[tag] = np.zeros(self.present.shape[0], dtype=bool)
+            bitmap[row] = True
+
+    def move(self, src: int, dst: int) -> None:
+        self.present[dst] = self.present[src]
+        for bitmap in self.bitmaps.values():
+            bitmap[dst] = bitmap[src]
+
+    def get(self, row: int) -> Any:
+        if not self.present[row]:
+            return None
+        return [tag for tag, bitmap in self.bitmaps.items() if bitmap[row]]
+
+    def exists(self, count: int) -> np.ndarray:
+        return self.present[:count].copy()
+
+    def _any(self, tags: Iterable[str], count: int) -> np.ndarray:
+        mask = np.zeros(count, dtype=bool)
+        for tag in tags:
+            bitmap = self.bitmaps.get(tag)
+            if bitmap is not None:
+                mask |= bitmap[:count]
+        return mask
+
+    def match(self, op: str, operand: Any, count: int) -> np.ndarray:
+        if op in ("$eq", "$ne"):
+            mask = self._any([operand], count)
+            return ~mask if op == "$ne" else mask
+        if op in ("$in", "$nin"):
+            mask = self._any(operand, count)
+            return ~mask if op == "$nin" else mask
+        if op == "$all":
+            mask = self.present[:count].copy()
+            for tag in operand:
+                bitmap = self.bitmaps.get(tag)
+                if bitmap is None:
+                    return np.zeros(count, dtype=bool)
+                mask &= bitmap[:count]
+            return mask
+        raise ValueError(f"Operator {op} is not supported on tag fields")
+
+
+_FIELD_TYPES = {field.kind: field for field in (_NumericField, _CategoryField, _TagField)}
+
+
+def _kind_of(value: Any) -> str:
+    if isinstance(value, (bool, int, float, datetime)):
+        return "number"
+    if isinstance(value, str):
+        return "category"
+    if isinstance(value, (list, tuple, set, frozenset)) and all(isinstance(item, str) for item in value):
+        return "tags"
+    raise ValueError(f"Unsupported metadata value {value!r}; use numbers, strings or lists of strings")
+
+
+class MetadataIndex:
+    """Per-row metadata stored column by column, with filter-to-mask compilation."""
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.capacity = capacity
+        self.fields: Dict[str, Any] = {}
+
+    def reserve(self, capacity: int) -> None:
+        if capacity <= self.capacity:
+            return
+        self.capacity = max(capacity, self.capacity * 2)
+        for field in self.fields.values():
+            field.reserve(self.capacity)
+
+    def validate(self, metadata: Optional[Mapping[str, Any]]) -> None:
+        """Raise ``ValueError`` if ``metadata`` cannot be stored, before anything is written."""
+
+        for name, value in (metadata or {}).items():
+            if value is None:
+                continue
+            kind = _kind_of(value)
+            field = self.fields.get(name)
+            if field is not None and field.kind != kind:
+                raise ValueError(f"Metadata field {name!r} holds {field.kind} values, got {value!r}")
+
+    def set(self, row: int, metadata: Optional[Mapping[str, Any]]) -> None:
+        """Replace the metadata of ``row``; fields not given become missing."""
+
+        self.validate(metadata)
+        metadata = metadata or {}
+        for name, value in metadata.items():
+            if value is None or name in self.fields:
+                continue
+            self.fields[name] = _FIELD_TYPES[_kind_of(value)](self.capacity)
+        for name, field in self.fields.items():
+            field.set(row, metadata.get(name))
+
+    def move(self, src: int, dst: int) -> None:
+        for field in self.fields.values():
+            field.move(src, dst)
+
+    def clear(self, row: int) -> None:
+        for field in self.fields.values():
+            field.set(row, None)
+
+    def get(self, row: int) -> Dict[str, Any]:
+        values = {name: field.get(row) for name, field in self.fields.items()}
+        return {name: value for name, value in values.items() if value is not None}
+
+    def mask(self, where: Filter, count: int) -> np.ndarray:
+        """Compile ``where`` into a boolean mask over the first ``count`` rows."""
+
+        mask = np.ones(count, dtype=bool)
+        for name, condition in where.items():
+            if name == "$and":
+                for clause in condition:
+                    mask &= self.mask(clause, count)
+            elif name == "$or":
+                either = np.zeros(count, dtype=bool)
+                for clause in condition:
+                    either |= self.mask(clause, count)
+                mask &= either
+            elif name == "$not":
+                mask &= ~self.mask(condition, count)
+            elif name.startswith("$"):
+                raise ValueError(f"Unknown filter operator {name}")
+            else:
+                mask &= self._field_mask(name, condition, count)
+        return mask
+
+    def _field_mask(self, name: str, condition: Any, count: int) -> np.ndarray:
+        operators = condition if isinstance(condition, Mapping) else {"$eq": condition}
+        field = self.fields.get(name)
+        mask = np.ones(count, dtype=bool)
+        for op, operand in operators.items():
+            if op == "$exists":
+                present = field.exists(count) if field is not None else np.zeros(count, dtype=bool)
+                mask &= present if operand else ~present
+            elif field is None:
+                # A field nobody has set only satisfies negative operators.
+                if op not in ("$ne", "$nin"):
+                    return np.zeros(count, dtype=bool)
+            else:
+                mask &= field.match(op, operand, count)
+        return mask
+
+    def state(self) -> Dict[str, Any]:
+        """Serialisable schema plus the column arrays keyed for ``np.savez``."""
+
+        schema: Dict[str, Any] = {}
+        arrays: Dict[str, np.ndarray] = {}
+        for position, (name, field) in enumerate(self.fields.items()):
+            entry: Dict[str, Any] = {"kind": field.kind}
+            if field.kind == "number":
+                arrays[f"f{position}"] = field.values
+            elif field.kind == "category":
+                arrays[f"f{position}"] = field.codes
+                entry["vocabulary"] = field.vocabulary
+            else:
+                arrays[f"f{position}"] = field.present
+                entry["tags"] = list(field.bitmaps)
+                for index, bitmap in enumerate(field.bitmaps.values()):
+                    arrays[f"f{position}t{index}"] = bitmap
+            schema[name] = entry
+        return {"schema": schema, "arrays": arrays}
+
+    @classmethod
+    def from_state(cls, schema: Mapping[str, Any], arrays: Mapping[str, np.ndarray], capacity: int) -> "MetadataIndex":
+        index = cls(capacity)
+        for position, (name, entry) in enumerate(schema.items()):
+            field = _FIELD_TYPES[entry["kind"]](capacity)
+            column = np.asarray(arrays[f"f{position}"])
+            if entry["kind"] == "number":
+                field.values = column.copy()
+            elif entry["kind"] == "category":
+                field.codes = column.copy()
+                field.vocabulary = list(entry["vocabulary"])
+                field._lookup = {value: code for code, value in enumerate(field.vocabulary)}
+            else:
+                field.present = column.copy()
+                field.bitmaps = {
+                    tag: np.asarray(arrays[f"f{position}t{i}"]).copy() for i, tag in enumerate(entry["tags"])
+                }
+            field.reserve(capacity)
+            index.fields[name] = field
+        index.capacity = max([capacity] + [len(arrays[key]) for key in arrays])
+        for field in index.fields.values():
+            field.reserve(index.capacity)
+        return index
+
+
+__all__ = ["Filter", "MetadataIndex"]
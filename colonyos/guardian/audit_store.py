@@ -0,0 +1,359 @@
+"""Append-only, sequence-numbered storage for the audit log."""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from colonyos.core.codecs import get_codec
+from colonyos.core.memory import BaseMemory, HybridMemory, ShardedSQLiteMemory, SQLiteMemory
+
+logger = logging.getLogger(__name__)
+
+AuditRecord = Tuple[int, Dict[str, Any]]
+Link = Callable[[Dict[str, Any], str], None]
+TimeBound = Union[datetime, float, None]
+
+_PAGE_SIZE = 500
+_SCOPE_NAME = re.compile(r"^\w+$")
+
+
+def _epoch(value: TimeBound) -> Optional[float]:
+    return value.timestamp() if isinstance(value, datetime) else value
+
+
+def _payload_time(payload: Dict[str, Any]) -> float:
+    return datetime.fromisoformat(payload["timestamp"]).timestamp()
+
+
+class AuditStore:
+    """Append-only log of audit payloads, numbered by a gapless sequence from 1.
+
+    Payloads are the hashed dicts built by :class:`~colonyos.guardian.safety.AuditLog`
+    and come back unchanged; the sequence is returned alongside them.
+    """
+
+    def append(self, payloads: List[Dict[str, Any]], link: Optional[Link] = None) -> List[int]:  # pragma: no cover - interface
+        """Append ``payloads`` atomically where the backend allows; return their sequences.
+
+        With ``link``, each payload is chained while its sequence is allocated:
+        ``link(payload, prev_hash)`` is called with the ``hash`` of the record
+        stored just before it and updates the payload in place.
+        """
+
+        raise NotImplementedError
+
+    def query(
+        self,
+        event_type: Optional[str] = None,
+        start_seq: Optional[int] = None,
+        end_seq: Optional[int] = None,
+        since: TimeBound = None,
+        until: TimeBound = None,
+        limit: Optional[int] = None,
+        reverse: bool = False,
+    ) -> Iterator[AuditRecord]:  # pragma: no cover - interface
+        """Yield ``(seq, payload)`` in sequence order.
+
+        ``start_seq`` and ``since`` are inclusive, ``end_seq`` and ``until``
+        exclusive. With ``reverse`` the newest matching records come first.
+        """
+
+        raise NotImplementedError
+
+    def put_seal(self, seal: Dict[str, Any]) -> None:  # pragma: no cover - interface
+        """Store (or replace) the verification checkpoint for ``seal["segment"]``."""
+
+        raise NotImplementedError
+
+    def seals(self) -> List[Dict[str, Any]]:  # pragma: no cover - interface
+        """All verification checkpoints, ordered by segment."""
+
+        raise NotImplementedError
+
+    def last(self) -> Optional[AuditRecord]:
+        return next(self.query(limit=1, reverse=True), None)
+
+    def count(self) -> int:
+        last = self.last()
+        return last[0] if last else 0
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteAuditStore(AuditStore):
+    """Audit table living in the database of a :class:`SQLiteMemory`.
+
+    ``seq`` is the integer primary key, so sequence ranges are rowid range
+    scans; ``(event_type, seq)`` and ``timestamp`` indexes serve the filters.
+    Writes go through the memory's :meth:`~SQLiteMemory.transaction` and reads
+    through :meth:`~SQLiteMemory.reader`.
+    """
+
+    def __init__(self, memory: SQLiteMemory, scope: str = "audit") -> None:
+        if not _SCOPE_NAME.match(scope):
+            raise ValueError(f"Audit scope {scope!r} must be alphanumeric")
+        self.memory = memory
+        self.scope = scope
+        self.table = f"audit_{scope}"
+        # (seq, hash) of the last record this instance wrote, to skip decoding
+        # the head again while no other writer has appended.
+        self._head: Tuple[int, str] = (0, "")
+        with memory.transaction() as conn:
+            conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    seq INTEGER PRIMARY KEY,
+                    id TEXT NOT NULL UNIQUE,
+                    timestamp REAL NOT NULL,
+                    event_type TEXT NOT NULL,
+                    payload BLOB NOT NULL,
+                    codec TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_type ON {self.table}(event_type, seq)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_time ON {self.table}(timestamp)")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table}_seals (segment INTEGER PRIMARY KEY, record TEXT NOT NULL)"
+            )
+
+    def append(self, payloads: List[Dict[str, Any]], link: Optional[Link] = None) -> List[int]:
+        if not payloads:
+            return []
+        codec = self.memory.codec_for(self.scope)
+        if link is None:
+            encoded = [codec.encode(payload) for payload in payloads]
+        with self.memory.transaction() as conn:
+            (last,) = conn.execute(f"SELECT COALESCE(MAX(seq), 0) FROM {self.table}").fetchone()
+            if link is not None:
+                prev_hash = self._head[1] if self._head[0] == last else self._head_hash(conn, last)
+                encoded = []
+                for payload in payloads:
+                    link(payload, prev_hash)
+                    prev_hash = payload["hash"]
+                    encoded.append(codec.encode(payload))
+            rows = [
+                (last + offset, payload["id"], _payload_time(payload), payload["event_type"], blob, codec.name)
+                for offset, (payload, blob) in enumerate(zip(payloads, encoded), start=1)
+            ]
+            conn.executemany(
+                f"INSERT INTO {self.table}(seq, id, timestamp, event_type, payload, codec) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        self._head = (rows[-1][0], payloads[-1].get("hash", ""))
+        return [row[0] for row in rows]
+
+    def _head_hash(self, conn: Any, seq: int) -> str:
+        row = conn.execute(f"SELECT payload, codec FROM {self.table} WHERE seq = ?", (seq,)).fetchone()
+        return get_codec(row[1]).decode(row[0])["hash"] if row else ""
+
+    def query(
+        self,
+        event_type: Optional[str] = None,
+        start_seq: Optional[int] = None,
+        end_seq: Optional[int] = None,
+        since: TimeBound = None,
+        until: TimeBound = None,
+        limit: Optional[int] = None,
+        reverse: bool = False,
+    ) -> Iterator[AuditRecord]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        for clause, value in (
+            ("event_type = ?", event_type),
+            ("seq >= ?", start_seq),
+            ("seq < ?", end_seq),
+            ("timestamp >= ?", _epoch(since)),
+            ("timestamp < ?", _epoch(until)),
+        ):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return self._pages(clauses, params, limit, reverse)
+
+    def _pages(self, clauses: List[str], params: List[Any], limit: Optional[int], reverse: bool) -> Iterator[AuditRecord]:
+        comparison, direction = ("<", "DESC") if reverse else (">", "ASC")
+        cursor: Optional[int] = None
+        remaining = limit
+        while remaining is None or remaining > 0:
+            page = _PAGE_SIZE if remaining is None else min(_PAGE_SIZE, remaining)
+            where = clauses + ([f"seq {comparison} ?"] if cursor is not None else [])
+            sql = f"SELECT seq, payload, codec FROM {self.table}"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            sql += f" ORDER BY seq {direction} LIMIT ?"
+            with self.memory.reader() as conn:
+                rows = conn.execute(sql, (*params, *([cursor] if cursor is not None else []), page)).fetchall()
+            for seq, blob, codec in rows:
+                yield seq, get_codec(codec).decode(blob)
+            if len(rows) < page:
+                return
+            cursor = rows[-1][0]
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def count(self) -> int:
+        with self.memory.reader() as conn:
+            (last,) = conn.execute(f"SELECT COALESCE(MAX(seq), 0) FROM {self.table}").fetchone()
+        return last
+
+    def put_seal(self, seal: Dict[str, Any]) -> None:
+        with self.memory.transaction() as conn:
+            conn.execute(
+                f"REPLACE INTO {self.table}_seals(segment, record) VALUES (?, ?)",
+                (seal["segment"], json.dumps(seal, sort_keys=True)),
+            )
+
+    def seals(self) -> List[Dict[str, Any]]:
+        with self.memory.reader() as conn:
+            rows = conn.execute(f"SELECT record FROM {self.table}_seals ORDER BY segment").fetchall()
+        return [json.loads(record) for (record,) in rows]
+
+
+class KVAuditStore(AuditStore):
+    """Fallback for backends without SQL, e.g. Redis.
+
+    Records are stored in scope ``<scope>.log`` under zero-padded sequence
+    keys, so sequence ranges are key-ordered scans. Filters are evaluated
+    while scanning rather than from an index. Each sequence is claimed with
+    :meth:`~BaseMemory.store_if_absent`, so processes sharing the backend
+    never overwrite each other's records; a writer that loses a claim moves
+    on to the next sequence, relinking the payload to the record it lost to.
+    """
+
+    def __init__(self, memory: BaseMemory, scope: str = "audit") -> None:
+        self.memory = memory
+        self.scope = f"{scope}.log"
+        self.seal_scope = f"{scope}.seals"
+        self._lock = threading.Lock()
+        last = self.last()
+        # (seq, hash) of the newest record known to this instance.
+        self._head: Tuple[int, str] = (last[0], last[1].get("hash", "")) if last else (0, "")
+
+    @staticmethod
+    def _key(seq: int) -> str:
+        return f"{seq:020d}"
+
+    def append(self, payloads: List[Dict[str, Any]], link: Optional[Link] = None) -> List[int]:
+        with self._lock:
+            return [self._claim(payload, link) for payload in payloads]
+
+    def _claim(self, payload: Dict[str, Any], link: Optional[Link]) -> int:
+        while True:
+            seq, prev_hash = self._head[0] + 1, self._head[1]
+            if link is not None:
+                link(payload, prev_hash)
+            if self.memory.store_if_absent(self._key(seq), payload, scope=self.scope):
+                self._head = (seq, payload.get("hash", ""))
+                return seq
+            self._head = (seq, self._stored_hash(seq))
+
+    def _stored_hash(self, seq: int) -> str:
+        stored = self.memory.retrieve(self._key(seq), scope=self.scope)
+        return stored.get("hash", "") if stored else ""
+
+    def query(
+        self,
+        event_type: Optional[str] = None,
+        start_seq: Optional[int] = None,
+        end_seq: Optional[int] = None,
+        since: TimeBound = None,
+        until: TimeBound = None,
+        limit: Optional[int] = None,
+        reverse: bool = False,
+    ) -> Iterator[AuditRecord]:
+        since, until = _epoch(since), _epoch(until)
+        if reverse:
+            cursor = self._key(end_seq) if end_seq is not None else None
+        else:
+            cursor = self._key(start_seq - 1) if start_seq is not None and start_seq > 0 else None
+        produced = 0
+        while limit is None or produced < limit:
+            keys = list(self.memory.scan(self.scope, start_after=cursor, limit=_PAGE_SIZE, reverse=reverse))
+            found = self.memory.retrieve_many(keys, scope=self.scope)
+            for key in keys:
+                seq = int(key)
+                if (reverse and start_seq is not None and seq < start_seq) or (
+                    not reverse and end_seq is not None and seq >= end_seq
+                ):
+                    return
+                payload = found.get(key)
+                if payload is None or (event_type is not None and payload["event_type"] != event_type):
+                    continue
+                if since is not None or until is not None:
+                    moment = _payload_time(payload)
+                    if (since is not None and moment < since) or (until is not None and moment >= until):
+                        continue
+                yield seq, payload
+                produced += 1
+                if limit is not None and produced >= limit:
+                    return
+            if len(keys) < _PAGE_SIZE:
+                return
+            cursor = keys[-1]
+
+    def count(self) -> int:
+        with self._lock:
+            # Catch up with records other writers appended since our last claim.
+            while True:
+                stored = self.memory.retrieve(self._key(self._head[0] + 1), scope=self.scope)
+                if stored is None:
+                    return self._head[0]
+                self._head = (self._head[0] + 1, stored.get("hash", ""))
+
+    def put_seal(self, seal: Dict[str, Any]) -> None:
+        self.memory.store(f"{seal['segment']:012d}", seal, scope=self.seal_scope)
+
+    def seals(self) -> List[Dict[str, Any]]:
+        keys = list(self.memory.scan(self.seal_scope))
+        return list(self.memory.retrieve_many(keys, scope=self.seal_scope).values())
+
+
+def create_audit_store(memory: BaseMemory, scope: str = "audit") -> AuditStore:
+    """Pick the indexed SQLite store when ``memory`` is SQLite-backed, else the KV fallback.
+
+    Entries written by older versions as plain ``scope`` keys are moved into
+    the new store the first time it is opened empty.
+    """
+
+    if isinstance(memory, HybridMemory):
+        memory = memory.relational
+    if isinstance(memory, ShardedSQLiteMemory):
+        store: AuditStore = SQLiteAuditStore(memory.shard_for(scope), scope)
+    elif isinstance(memory, SQLiteMemory):
+        store = SQLiteAuditStore(memory, scope)
+    else:
+        store = KVAuditStore(memory, scope)
+    _migrate_legacy(memory, scope, store)
+    return store
+
+
+def _migrate_legacy(memory: BaseMemory, scope: str, store: AuditStore) -> None:
+    probe = "any" if "any" in memory.scan_orders else "key"
+    if next(memory.scan(scope, limit=1, order=probe), None) is None:
+        return
+    if store.count():
+        logger.warning("Audit scope %r still holds legacy entries next to a populated audit store; leaving them", scope)
+        return
+    started = time.perf_counter()
+    by_insertion = "insertion" in memory.scan_orders
+    keys = list(memory.scan(scope, order="insertion" if by_insertion else "key"))
+    payloads: List[Dict[str, Any]] = []
+    for start in range(0, len(keys), _PAGE_SIZE):
+        chunk = keys[start : start + _PAGE_SIZE]
+        payloads.extend(memory.retrieve_many(chunk, scope=scope).values())
+    if not by_insertion:
+        payloads.sort(key=lambda payload: (payload["timestamp"], payload["id"]))
+    store.append(payloads)
+    memory.delete_many(keys, scope=scope)
+    logger.info("Migrated %s legacy audit entries in %.2fs", len(payloads), time.perf_counter() - started)
+
+
+__all__ = ["AuditRecord", "AuditStore", "Link", "KVAuditStore", "SQLiteAuditStore", "create_audit_store"]
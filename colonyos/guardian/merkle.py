@@ -0,0 +1,96 @@
+"""Merkle trees over audit entry hashes, with inclusion proofs.
+
+Leaves and inner nodes are domain-separated (``0x00``/``0x01`` prefixes) so a
+leaf can never be passed off as an inner node. A node without a sibling on
+its level is promoted unchanged, so proofs only list real siblings.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+# (side of the sibling, sibling hash as hex); side is "L" or "R".
+ProofStep = Tuple[str, str]
+
+
+def leaf_hash(data: bytes) -> bytes:
+    return hashlib.sha256(b"\x00" + data).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def _next_level(level: List[bytes]) -> List[bytes]:
+    paired = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+    if len(level) % 2:
+        paired.append(level[-1])
+    return paired
+
+
+def merkle_root(items: Sequence[bytes]) -> bytes:
+    """Root over ``items`` (raw leaf data); the empty tree hashes to ``sha256(b"")``."""
+
+    if not items:
+        return hashlib.sha256(b"").digest()
+    level = [leaf_hash(item) for item in items]
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0]
+
+
+def merkle_path(items: Sequence[bytes], index: int) -> List[ProofStep]:
+    """Sibling hashes from leaf ``index`` up to the root."""
+
+    if not 0 <= index < len(items):
+        raise IndexError(f"Leaf {index} out of range for {len(items)} items")
+    level = [leaf_hash(item) for item in items]
+    path: List[ProofStep] = []
+    while len(level) > 1:
+        sibling = index ^ 1
+        if sibling < len(level):
+            path.append(("L" if sibling < index else "R", level[sibling].hex()))
+        level = _next_level(level)
+        index //= 2
+    return path
+
+
+def root_from_path(item: bytes, path: Sequence[ProofStep]) -> bytes:
+    current = leaf_hash(item)
+    for side, sibling in path:
+        other = bytes.fromhex(sibling)
+        current = node_hash(other, current) if side == "L" else node_hash(current, other)
+    return current
+
+
+@dataclass
+class InclusionProof:
+    """Proof that an audit entry hash belongs to a segment and, once sealed, to the log root.
+
+    ``segment_path`` leads from the entry hash to ``segment_root``;
+    ``root_path`` leads from the segment root to ``root``, the tree over all
+    sealed segment roots. For the open (unsealed) segment ``root_path`` is
+    empty and ``root`` equals ``segment_root``.
+    """
+
+    seq: int
+    entry_hash: str
+    segment: int
+    segment_root: str
+    root: str
+    segment_path: List[ProofStep] = field(default_factory=list)
+    root_path: List[ProofStep] = field(default_factory=list)
+
+    def verify(self, trusted_root: Optional[str] = None) -> bool:
+        segment_root = root_from_path(bytes.fromhex(self.entry_hash), self.segment_path).hex()
+        if segment_root != self.segment_root:
+            return False
+        if self.root_path or self.root != self.segment_root:
+            if root_from_path(bytes.fromhex(segment_root), self.root_path).hex() != self.root:
+                return False
+        return trusted_root is None or trusted_root == self.root
+
+
+__all__ = ["InclusionProof", "ProofStep", "leaf_hash", "merkle_path", "merkle_root", "node_hash", "root_from_path"]
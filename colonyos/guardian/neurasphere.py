@@ -3,15 +3,20 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
 from uuid import uuid4
 
+from colonyos.core.cache import approximate_size
 from colonyos.core.types import ColonyConfig, Identity, IdentityManager, Task
 from colonyos.core.memory import HybridMemory
 from colonyos.core.event_bus import EventBus
+if TYPE_CHECKING:  # pragma: no cover
+    from colonyos.body.kernel import ColonyKernel
 from colonyos.guardian.safety import (
+    AuditEntry,
     AuditLog,
     ProhibitedPatternRule,
     ResourceLimitRule,
@@ -62,33 +67,211 @@ class ConsensusVote:
 
 
 class StateManager:
-    """Simple checkpoint manager using memory backend."""
+    """Checkpoint manager using memory backend.
 
-    def __init__(self, memory: HybridMemory, scope: str = "checkpoints") -> None:
+    Besides plain state checkpoints it keeps a chain of task checkpoints: a
+    full *base* snapshot followed by *deltas* holding only the tasks changed
+    since their parent. Every delta lists its ancestors back to the base in
+    ``chain``, so a rollback fetches the whole chain in one batch read and
+    replays it in order. After ``full_every`` deltas the next checkpoint is a
+    new base, which bounds replay cost; :meth:`compact` drops old history.
+
+    Each checkpoint is two records: the state body in ``scope`` (stored with
+    that scope's codec, compressed by default) and a small metadata row in
+    ``<scope>.meta``. Listing only reads metadata; bodies are read and
+    decoded when a state is actually loaded.
+    """
+
+    def __init__(self, memory: HybridMemory, scope: str = "checkpoints", full_every: int = 16) -> None:
         self.memory = memory
         self.scope = scope
+        self.meta_scope = f"{scope}.meta"
+        self.full_every = full_every
+        # Id and ancestry of the newest task checkpoint written by this manager.
+        self._head: Optional[Dict[str, Any]] = None
+        self._backfilled = False
 
-    def create_checkpoint(self, state: Dict[str, Any]) -> str:
-        checkpoint_id = str(uuid4())
-        payload = {
-            "id": checkpoint_id,
+    @staticmethod
+    def _payload(state: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": str(uuid4()),
             "state": state,
             "timestamp": datetime.now(timezone.utc).isoformat(),
         }
-        self.memory.store(checkpoint_id, payload, scope=self.scope)
-        return checkpoint_id
+
+    @staticmethod
+    def _meta(payload: Dict[str, Any]) -> Dict[str, Any]:
+        tasks = payload.get("tasks")
+        return {
+            "id": payload["id"],
+            "timestamp": payload["timestamp"],
+            "kind": payload.get("kind", "state"),
+            "parent": payload.get("parent"),
+            "chain": payload.get("chain", []),
+            "task_count": len(tasks) if tasks is not None else None,
+            "size": approximate_size(payload),
+        }
+
+    def _write(self, payload: Dict[str, Any]) -> None:
+        # Body first: metadata must never point at a missing body.
+        self.memory.store(payload["id"], payload, scope=self.scope)
+        self.memory.store(payload["id"], self._meta(payload), scope=self.meta_scope)
+
+    async def _awrite(self, payload: Dict[str, Any]) -> None:
+        # Both writes join the same coalesced batch, body first.
+        await asyncio.gather(
+            self.memory.astore(payload["id"], payload, scope=self.scope),
+            self.memory.astore(payload["id"], self._meta(payload), scope=self.meta_scope),
+        )
+
+    def create_checkpoint(self, state: Dict[str, Any]) -> str:
+        payload = self._payload(state)
+        self._write(payload)
+        return payload["id"]
+
+    async def acreate_checkpoint(self, state: Dict[str, Any]) -> str:
+        """Store a checkpoint without blocking the event loop on encoding or I/O."""
+
+        payload = self._payload(state)
+        await self._awrite(payload)
+        return payload["id"]
+
+    def needs_base(self) -> bool:
+        """Whether the next task checkpoint has to be a full snapshot."""
+
+        head = self._head
+        return head is None or len(head["chain"]) >= self.full_every
+
+    def _task_payload(self, tasks: Dict[str, Any], full: bool, state: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        payload = self._payload(state or {})
+        head = self._head
+        if full or head is None:
+            payload.update(kind="base", parent=None, chain=[], tasks=tasks)
+        else:
+            payload.update(kind="delta", parent=head["id"], chain=head["chain"] + [head["id"]], tasks=tasks)
+        return payload
+
+    def create_task_checkpoint(
+        self, tasks: Dict[str, Any], full: bool, state: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Store ``tasks`` (wire format) as a base snapshot or as a delta on the current head."""
+
+        payload = self._task_payload(tasks, full, state)
+        self._write(payload)
+        self._head = {"id": payload["id"], "chain": payload["chain"]}
+        return payload["id"]
+
+    async def acreate_task_checkpoint(
+        self, tasks: Dict[str, Any], full: bool, state: Optional[Dict[str, Any]] = None
+    ) -> str:
+        payload = self._task_payload(tasks, full, state)
+        await self._awrite(payload)
+        self._head = {"id": payload["id"], "chain": payload["chain"]}
+        return payload["id"]
+
+    def _backfill(self) -> None:
+        """Create metadata for checkpoints written before metadata existed (once per instance)."""
+
+        if self._backfilled:
+            return
+        missing = sorted(set(self.memory.list_keys(self.scope)) - set(self.memory.list_keys(self.meta_scope)))
+        for start in range(0, len(missing), 256):
+            bodies = self.memory.retrieve_many(missing[start : start + 256], scope=self.scope)
+            self.memory.store_many({key: self._meta(body) for key, body in bodies.items()}, scope=self.meta_scope)
+        self._backfilled = True
 
     def list_checkpoints(self) -> List[Dict[str, Any]]:
-        checkpoints: List[Dict[str, Any]] = []
-        for key in self.memory.list_keys(scope=self.scope):
-            payload = self.memory.retrieve(key, scope=self.scope)
-            if payload:
-                checkpoints.append(payload)
+        """Metadata of every checkpoint, oldest first; no state bodies are read."""
+
+        self._backfill()
+        keys = self.memory.list_keys(scope=self.meta_scope)
+        checkpoints = [meta for meta in self.memory.retrieve_many(keys, scope=self.meta_scope).values() if meta]
         checkpoints.sort(key=lambda cp: cp["timestamp"])
         return checkpoints
 
+    async def alist_checkpoints(self) -> List[Dict[str, Any]]:
+        await self.memory.aflush()
+        return await self.memory.io.run(self.list_checkpoints)
+
+    def get_checkpoint_meta(self, checkpoint_id: str) -> Optional[Dict[str, Any]]:
+        return self.memory.retrieve(checkpoint_id, scope=self.meta_scope)
+
     async def load_checkpoint(self, checkpoint_id: str) -> Optional[Dict[str, Any]]:
-        return self.memory.retrieve(checkpoint_id, scope=self.scope)
+        return await self.memory.aretrieve(checkpoint_id, scope=self.scope)
+
+    @staticmethod
+    def _replay(payload: Dict[str, Any], ancestors: Dict[str, Any]) -> Dict[str, Any]:
+        if "tasks" not in payload:
+            return payload["state"]
+        tasks: Dict[str, Any] = {}
+        for ancestor_id in payload["chain"]:
+            ancestor = ancestors.get(ancestor_id)
+            if ancestor is None:
+                raise ValueError(f"Checkpoint {payload['id']} depends on missing checkpoint {ancestor_id}")
+            tasks.update(ancestor["tasks"])
+        tasks.update(payload["tasks"])
+        return {**payload["state"], "tasks": tasks, "timestamp": payload["timestamp"]}
+
+    def load_state(self, checkpoint_id: str) -> Optional[Dict[str, Any]]:
+        """Rebuild the state at ``checkpoint_id``, replaying deltas onto their base.
+
+        The chain comes from the metadata row, so the checkpoint and all its
+        ancestors are fetched in a single batch read.
+        """
+
+        meta = self.get_checkpoint_meta(checkpoint_id)
+        chain = meta["chain"] if meta else []
+        bodies = self.memory.retrieve_many(chain + [checkpoint_id], scope=self.scope)
+        payload = bodies.get(checkpoint_id)
+        if payload is None:
+            return None
+        if meta is None and payload.get("chain"):
+            bodies.update(self.memory.retrieve_many(payload["chain"], scope=self.scope))
+        return self._replay(payload, bodies)
+
+    async def aload_state(self, checkpoint_id: str) -> Optional[Dict[str, Any]]:
+        await self.memory.aflush()
+        return await self.memory.io.run(self.load_state, checkpoint_id)
+
+    def compact(self, keep: int = 1) -> int:
+        """Delete all but the newest ``keep`` checkpoints and return how many were removed.
+
+        Kept deltas that depend on deleted checkpoints are rewritten: the oldest
+        such delta becomes a base holding its replayed tasks, and the chains of
+        the deltas after it are cut at that new base.
+        """
+
+        checkpoints = self.list_checkpoints()
+        if keep >= len(checkpoints):
+            return 0
+        cut = len(checkpoints) - max(keep, 0)
+        doomed = [checkpoint["id"] for checkpoint in checkpoints[:cut]]
+        doomed_set = set(doomed)
+        rebased: Set[str] = set()
+        rewritten: Dict[str, Dict[str, Any]] = {}
+        for checkpoint in checkpoints[cut:]:
+            if checkpoint["kind"] != "delta":
+                continue
+            chain = checkpoint["chain"]
+            starts = [index for index, ancestor in enumerate(chain) if ancestor in rebased]
+            trimmed = chain[starts[-1] :] if starts else chain
+            if any(ancestor in doomed_set for ancestor in trimmed):
+                payload = self.memory.retrieve(checkpoint["id"], scope=self.scope)
+                tasks = self.load_state(checkpoint["id"])["tasks"]
+                rewritten[checkpoint["id"]] = {**payload, "kind": "base", "parent": None, "chain": [], "tasks": tasks}
+                rebased.add(checkpoint["id"])
+            elif trimmed != chain:
+                payload = self.memory.retrieve(checkpoint["id"], scope=self.scope)
+                rewritten[checkpoint["id"]] = {**payload, "chain": trimmed}
+        for payload in rewritten.values():
+            self._write(payload)
+        head = self._head
+        if head is not None and head["id"] in rewritten:
+            self._head = {"id": head["id"], "chain": rewritten[head["id"]]["chain"]}
+        elif head is not None and head["id"] in doomed_set:
+            self._head = None
+        self.memory.delete_many(doomed, scope=self.meta_scope)
+        return self.memory.delete_many(doomed, scope=self.scope)
 
 
 class Neurasphere:
@@ -107,7 +290,8 @@ class Neurasphere:
         self.identity_manager = identity_manager
         self.identity: Optional[Identity] = None
         self.audit_log = AuditLog(memory.relational)
-        self.state_manager = StateManager(memory)
+        self.state_manager = StateManager(memory, full_every=config.checkpoint_full_every)
+        self._checkpoint_lock = asyncio.Lock()
         self.consensus = ConsensusCoordinator(config.guardian if hasattr(config, "guardian") else None)
         self._safety_rules = [
             ProhibitedPatternRule([r"rm\s+-rf", r"DROP\s+TABLE"]),
@@ -117,14 +301,14 @@ class Neurasphere:
 
     def set_identity(self, identity: Identity) -> None:
         self.identity = identity
+        self.audit_log.set_signer(
+            identity,
+            functools.partial(self.identity_manager.sign_message, identity.id),
+            self.identity_manager.get_identity,
+        )
 
     async def validate_task(self, task: Task) -> Tuple[bool, List[TaskViolation]]:
-        violations: List[TaskViolation] = []
-        for rule in self._safety_rules:
-            passed, message = rule.check(task)
-            if not passed and message:
-                violations.append(TaskViolation(rule=rule.__class__.__name__, message=message))
-        approved = len(violations) == 0
+        approved, violations = self._check_rules(task)
         if approved:
             await self.event_bus.publish("task_validated", {"task_id": task.id}, "neurasphere")
         else:
@@ -135,18 +319,40 @@ class Neurasphere:
             )
         return approved, violations
 
+    async def validate_tasks(self, tasks: List[Task]) -> List[Tuple[bool, List[TaskViolation]]]:
+        """Validate a batch of tasks, returning one ``(approved, violations)`` per task."""
+
+        results = [self._check_rules(task) for task in tasks]
+        for task, (approved, violations) in zip(tasks, results):
+            if approved:
+                await self.event_bus.publish("task_validated", {"task_id": task.id}, "neurasphere")
+            else:
+                await self.event_bus.publish(
+                    "task_rejected",
+                    {"task_id": task.id, "violations": [v.message for v in violations]},
+                    "neurasphere",
+                )
+        return results
+
+    def _check_rules(self, task: Task) -> Tuple[bool, List[TaskViolation]]:
+        violations: List[TaskViolation] = []
+        for rule in self._safety_rules:
+            passed, message = rule.check(task)
+            if not passed and message:
+                violations.append(TaskViolation(rule=rule.__class__.__name__, message=message))
+        return len(violations) == 0, violations
+
     async def request_consensus(self, decision: Dict[str, Any], participants: List[str]) -> Tuple[bool, Dict[str, Any]]:
         vote = self.consensus.start_vote(decision, participants)
         result = await vote.future
         return result
 
-    def get_audit_trail(self, event_type: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
-        entries = self.audit_log.list_events(limit=limit)
-        if event_type:
-            entries = [entry for entry in entries if entry.event_type == event_type]
+    @staticmethod
+    def _audit_view(entries: List[AuditEntry]) -> List[Dict[str, Any]]:
         return [
             {
                 "id": entry.id,
+                "seq": entry.seq,
                 "timestamp": entry.timestamp.isoformat(),
                 "event_type": entry.event_type,
                 "actor": entry.actor,
@@ -155,17 +361,60 @@ class Neurasphere:
             for entry in entries
         ]
 
+    def get_audit_trail(self, event_type: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        return self._audit_view(self.audit_log.list_events(limit=limit, event_type=event_type))
+
+    async def aget_audit_trail(self, event_type: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        return self._audit_view(await self.audit_log.alist_events(limit=limit, event_type=event_type))
+
+    @property
+    def _actor(self) -> str:
+        return self.identity.id if self.identity else "system"
+
     def create_checkpoint(self, state: Dict[str, Any]) -> str:
         checkpoint_id = self.state_manager.create_checkpoint(state)
-        self.audit_log.log_event("checkpoint", self.identity.id if self.identity else "system", {"id": checkpoint_id})
+        self.audit_log.log_event("checkpoint", self._actor, {"id": checkpoint_id})
+        return checkpoint_id
+
+    async def acreate_checkpoint(self, state: Dict[str, Any]) -> str:
+        checkpoint_id = await self.state_manager.acreate_checkpoint(state)
+        await self.audit_log.alog_event("checkpoint", self._actor, {"id": checkpoint_id})
         return checkpoint_id
 
-    async def rollback_to_checkpoint(self, checkpoint_id: str) -> Dict[str, Any]:
-        payload = await self.state_manager.load_checkpoint(checkpoint_id)
-        if not payload:
+    async def acreate_task_checkpoint(self, kernel: "ColonyKernel", state: Optional[Dict[str, Any]] = None) -> str:
+        """Checkpoint the kernel's tasks, writing only those changed since the last one when possible."""
+
+        async with self._checkpoint_lock:
+            # Only the snapshot holds the kernel lock; serialisation and encoding
+            # run on the memory I/O threads while dispatch carries on.
+            snapshot = kernel.snapshot_checkpoint(full=self.state_manager.needs_base())
+            full = snapshot.full
+            try:
+                tasks = await self.memory.io.run(kernel.serialise_checkpoint, snapshot)
+                checkpoint_id = await self.state_manager.acreate_task_checkpoint(tasks, full, state)
+            except Exception:
+                kernel.mark_dirty(task.id for task in snapshot.changed)
+                if full:
+                    kernel.require_full_checkpoint()
+                raise
+        kind = "base" if full else "delta"
+        await self.audit_log.alog_event("checkpoint", self._actor, {"id": checkpoint_id, "kind": kind})
+        return checkpoint_id
+
+    async def rollback_to_checkpoint(
+        self, checkpoint_id: str, kernel: Optional["ColonyKernel"] = None
+    ) -> Dict[str, Any]:
+        """Load the state at ``checkpoint_id`` and, given a kernel, restore its tasks into it."""
+
+        state = await self.state_manager.aload_state(checkpoint_id)
+        if state is None:
             raise ValueError(f"Checkpoint {checkpoint_id} not found")
-        self.audit_log.log_event("rollback", self.identity.id if self.identity else "system", {"id": checkpoint_id})
-        return payload["state"]
+        details: Dict[str, Any] = {"id": checkpoint_id}
+        if kernel is not None and "tasks" in state:
+            async with self._checkpoint_lock:
+                details["restored"] = await kernel.restore_tasks(state["tasks"], checkpoint_id)
+        await self.audit_log.alog_event("rollback", self._actor, details)
+        return state
 
 
 class ConsensusCoordinator:
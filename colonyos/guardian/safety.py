@@ -2,16 +2,22 @@
 
 from __future__ import annotations
 
+import asyncio
 import hashlib
 import json
 import re
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
 from uuid import uuid4
 
-from colonyos.core.types import SafetyLevel, Task
+from colonyos.core.types import Identity, SafetyLevel, Task
 from colonyos.core.memory import BaseMemory
+from colonyos.guardian.audit_store import AuditRecord, AuditStore, create_audit_store
+from colonyos.guardian.merkle import InclusionProof, merkle_path, merkle_root
 
 
 @dataclass
@@ -88,77 +94,333 @@ class AuditEntry:
     actor: str
     details: Dict[str, Any]
     hash: str
+    seq: int = 0
 
 
 class AuditLog:
-    """Immutable audit log stored in memory backend."""
-
-    def __init__(self, memory: BaseMemory, scope: str = "audit") -> None:
+    """Immutable, hash-chained audit log kept in an append-only :class:`AuditStore`."""
+
+    def __init__(
+        self,
+        memory: BaseMemory,
+        scope: str = "audit",
+        store: Optional[AuditStore] = None,
+        segment_size: int = 1024,
+        max_batch: int = 512,
+    ) -> None:
         self.memory = memory
         self.scope = scope
-        self._last_hash = ""
-
-    def log_event(self, event_type: str, actor: str, details: Dict[str, Any]) -> AuditEntry:
-        entry_id = str(uuid4())
-        timestamp = datetime.now(timezone.utc)
-        payload = {
-            "id": entry_id,
-            "timestamp": timestamp.isoformat(),
+        self.store = store if store is not None else create_audit_store(memory, scope)
+        self.segment_size = segment_size
+        self._signer: Optional[Identity] = None
+        self._sign: Optional[Callable[[bytes], bytes]] = None
+        self._resolve: Optional[Callable[[str], Optional[Identity]]] = None
+        # (seq, hash) of the newest entry this instance has verified.
+        self._verified: Tuple[int, str] = (0, "")
+        self.max_batch = max_batch
+        self._last_ns = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: List[_QueuedEvent] = []
+        self._flusher: Optional["asyncio.Task[None]"] = None
+
+    def _new_id(self) -> str:
+        self._last_ns = max(time.time_ns(), self._last_ns + 1)
+        return f"{self._last_ns:020d}-{uuid4().hex[:12]}"
+
+    def _next_payload(self, event_type: str, actor: str, details: Dict[str, Any]) -> Dict[str, Any]:
+        """An unlinked payload; the store chains it with :func:`_link` when appending."""
+
+        return {
+            "id": self._new_id(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
             "event_type": event_type,
             "actor": actor,
             "details": details,
-            "prev_hash": self._last_hash,
         }
-        entry_hash = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
-        payload["hash"] = entry_hash
-        self.memory.store(entry_id, payload, scope=self.scope)
-        self._last_hash = entry_hash
+
+    def log_event(self, event_type: str, actor: str, details: Dict[str, Any]) -> AuditEntry:
+        return self.log_events([(event_type, actor, details)])[0]
+
+    def log_events(self, events: List[Tuple[str, str, Dict[str, Any]]]) -> List[AuditEntry]:
+        """Chain ``(event_type, actor, details)`` events and commit them in one append.
+
+        The store links each payload to the head it reads while allocating the
+        sequence, so other writers on the same store, in this process or
+        another, never fork the chain.
+        """
+
+        payloads = [self._next_payload(event_type, actor, details) for event_type, actor, details in events]
+        seqs = self.store.append(payloads, link=_link)
+        return [self._to_entry(seq, payload) for seq, payload in zip(seqs, payloads)]
+
+    async def alog_event(self, event_type: str, actor: str, details: Dict[str, Any]) -> AuditEntry:
+        """Async :meth:`log_event`.
+
+        Events logged while a batch is being written are queued and committed
+        together in the next :meth:`log_events` call (group commit).
+        """
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._queue, self._flusher = loop, [], None
+        future: "asyncio.Future[AuditEntry]" = loop.create_future()
+        self._queue.append((event_type, actor, details, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = loop.create_task(self._drain())
+        return await future
+
+    async def _drain(self) -> None:
+        while self._queue:
+            batch, self._queue = self._queue[: self.max_batch], self._queue[self.max_batch :]
+            try:
+                entries = await self.memory.io.run(self.log_events, [event[:3] for event in batch])
+            except Exception as exc:
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            for (*_, future), entry in zip(batch, entries):
+                if not future.done():
+                    future.set_result(entry)
+
+    @staticmethod
+    def _to_entry(seq: int, data: Dict[str, Any]) -> AuditEntry:
         return AuditEntry(
-            id=entry_id,
-            timestamp=timestamp,
-            event_type=event_type,
-            actor=actor,
-            details=details,
-            hash=entry_hash,
+            id=data["id"],
+            timestamp=datetime.fromisoformat(data["timestamp"]),
+            event_type=data["event_type"],
+            actor=data["actor"],
+            details=data["details"],
+            hash=data["hash"],
+            seq=seq,
         )
 
-    def list_events(self, limit: int = 100) -> List[AuditEntry]:
-        keys = self.memory.list_keys(scope=self.scope)
-        entries: List[AuditEntry] = []
-        for key in keys[-limit:]:
-            data = self.memory.retrieve(key, scope=self.scope)
-            if not data:
-                continue
-            entries.append(
-                AuditEntry(
-                    id=data["id"],
-                    timestamp=datetime.fromisoformat(data["timestamp"]),
-                    event_type=data["event_type"],
-                    actor=data["actor"],
-                    details=data["details"],
-                    hash=data["hash"],
-                )
-            )
-        return entries
-
-    def verify_integrity(self) -> Tuple[bool, List[str]]:
-        keys = self.memory.list_keys(scope=self.scope)
-        entries = []
-        for key in keys:
-            data = self.memory.retrieve(key, scope=self.scope)
-            if data:
-                entries.append(data)
-        entries.sort(key=lambda entry: entry.get("timestamp", ""))
+    def list_events(
+        self,
+        limit: int = 100,
+        event_type: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> List[AuditEntry]:
+        """Return the latest ``limit`` matching entries, oldest first."""
+
+        records = list(self.store.query(event_type=event_type, since=since, until=until, limit=limit, reverse=True))
+        return [self._to_entry(seq, data) for seq, data in reversed(records)]
+
+    async def alist_events(
+        self,
+        limit: int = 100,
+        event_type: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> List[AuditEntry]:
+        return await self.memory.io.run(self.list_events, limit, event_type, since, until)
+
+    def set_signer(
+        self,
+        identity: Identity,
+        sign: Callable[[bytes], bytes],
+        resolve: Optional[Callable[[str], Optional[Identity]]] = None,
+    ) -> None:
+        """Sign verification checkpoints as ``identity``.
+
+        ``resolve`` looks up the identity behind a stored checkpoint; checkpoints
+        whose signer cannot be resolved are not trusted and get re-verified.
+        """
+
+        self._signer = identity
+        self._sign = sign
+        self._resolve = resolve or (lambda signer_id: identity if signer_id == identity.id else None)
+
+    def _seal_message(self, seal: Dict[str, Any]) -> bytes:
+        return json.dumps({name: seal[name] for name in _SEAL_FIELDS}, sort_keys=True).encode("utf-8")
+
+    def _seal_state(self, seal: Dict[str, Any]) -> Optional[bool]:
+        """``True`` if the signature checks out, ``False`` if it is wrong, ``None`` if unverifiable."""
+
+        if not seal.get("signature") or not seal.get("signer") or self._resolve is None:
+            return None
+        identity = self._resolve(seal["signer"])
+        if identity is None:
+            return None
+        return identity.verify_signature(self._seal_message(seal), bytes.fromhex(seal["signature"]))
+
+    def _trusted_seals(self, seals: List[Dict[str, Any]], errors: List[str]) -> List[Dict[str, Any]]:
+        trusted: List[Dict[str, Any]] = []
+        for expected, seal in enumerate(seals):
+            if seal["segment"] != expected:
+                break
+            state = self._seal_state(seal)
+            if state is False:
+                errors.append(f"Invalid signature on checkpoint for segment {expected}")
+            if not state:
+                break
+            trusted.append(seal)
+        return trusted
+
+    def _segments(self, after_seq: int, prev_hash: str) -> Iterator[Tuple[int, int, str, List[AuditRecord]]]:
+        """Yield ``(segment, first_seq, prev_hash, records)`` for every segment past ``after_seq``."""
+
+        size = self.segment_size
+        seq = after_seq + 1
+        while True:
+            segment = (seq - 1) // size
+            end = (segment + 1) * size + 1
+            records = list(self.store.query(start_seq=seq, end_seq=end))
+            if not records:
+                return
+            yield segment, seq, prev_hash, records
+            prev_hash = records[-1][1].get("hash", "")
+            if records[-1][0] < end - 1:
+                return
+            seq = end
+
+    def verify_integrity(self, full: bool = False, workers: Optional[int] = None) -> Tuple[bool, List[str]]:
+        """Check hashes, chain links and sequence continuity.
+
+        Verification resumes after the last trusted point: the newest run of
+        correctly signed checkpoints, or what this instance already verified.
+        ``full`` re-verifies from genesis and compares each segment's Merkle
+        root with its checkpoint. Segments are checked in a process pool of
+        ``workers`` processes when given. Complete segments verified cleanly
+        are sealed with a new checkpoint.
+        """
 
         errors: List[str] = []
-        previous_hash = ""
-        for entry in entries:
-            payload = dict(entry)
-            entry_hash = payload.pop("hash")
-            expected = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
-            if entry_hash != expected:
-                errors.append(f"Hash mismatch for entry {entry['id']}")
-            if payload.get("prev_hash") != previous_hash:
-                errors.append(f"Broken hash chain at entry {entry['id']}")
-            previous_hash = entry_hash
+        seals = self.store.seals()
+        by_segment = {seal["segment"]: seal for seal in seals}
+        trusted = self._trusted_seals(seals, errors)
+        after_seq, prev_hash = 0, ""
+        if not full:
+            if trusted:
+                after_seq, prev_hash = trusted[-1]["last_seq"], trusted[-1]["head"]
+            if self._verified[0] > after_seq:
+                after_seq, prev_hash = self._verified
+        trusted_segments = {seal["segment"] for seal in trusted}
+
+        verified: Tuple[int, str] = (after_seq, prev_hash)
+        to_seal: List[Dict[str, Any]] = []
+        for segment, first_seq, segment_errors, root, head, last_seq in self._check_segments(after_seq, prev_hash, workers):
+            errors.extend(segment_errors)
+            seal = by_segment.get(segment)
+            complete = last_seq == (segment + 1) * self.segment_size
+            if full and seal is not None and seal["root"] != root:
+                errors.append(f"Merkle root mismatch for segment {segment}")
+            if errors:
+                continue
+            verified = (last_seq, head)
+            if complete and (seal is None or (self._sign is not None and segment not in trusted_segments)):
+                to_seal.append({"segment": segment, "first_seq": first_seq, "last_seq": last_seq, "root": root, "head": head})
+
+        if not errors:
+            self._verified = verified
+            for seal in to_seal:
+                self._seal(seal)
         return len(errors) == 0, errors
+
+    def _check_segments(
+        self, after_seq: int, prev_hash: str, workers: Optional[int]
+    ) -> Iterator[Tuple[int, int, List[str], str, str, int]]:
+        segments = self._segments(after_seq, prev_hash)
+        if not workers or workers < 2:
+            for segment, first_seq, previous, records in segments:
+                yield (segment, first_seq, *_check_segment(first_seq, previous, records), records[-1][0])
+            return
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            window: Deque[Tuple[int, int, int, "Future[Tuple[List[str], str, str]]"]] = deque()
+            for segment, first_seq, previous, records in segments:
+                window.append((segment, first_seq, records[-1][0], pool.submit(_check_segment, first_seq, previous, records)))
+                # Bound how many segments are held in memory at once.
+                while len(window) >= workers * 2:
+                    done_segment, done_first, done_last, future = window.popleft()
+                    yield (done_segment, done_first, *future.result(), done_last)
+            while window:
+                done_segment, done_first, done_last, future = window.popleft()
+                yield (done_segment, done_first, *future.result(), done_last)
+
+    def _seal(self, seal: Dict[str, Any]) -> None:
+        seal["signer"] = self._signer.id if self._signer is not None else None
+        seal["signature"] = self._sign(self._seal_message(seal)).hex() if self._sign is not None else None
+        self.store.put_seal(seal)
+
+    def _sealed_roots(self) -> List[bytes]:
+        roots: List[bytes] = []
+        for expected, seal in enumerate(self.store.seals()):
+            if seal["segment"] != expected:
+                break
+            roots.append(bytes.fromhex(seal["root"]))
+        return roots
+
+    def root(self) -> str:
+        """Merkle root over the sealed segments (hex)."""
+
+        return merkle_root(self._sealed_roots()).hex()
+
+    def prove(self, seq: int) -> InclusionProof:
+        """Inclusion proof for entry ``seq``; reads one segment plus the checkpoint list."""
+
+        size = self.segment_size
+        segment = (seq - 1) // size
+        records = list(self.store.query(start_seq=segment * size + 1, end_seq=(segment + 1) * size + 1))
+        seqs = [record_seq for record_seq, _ in records]
+        if seq not in seqs:
+            raise KeyError(f"Audit entry {seq} not found")
+        index = seqs.index(seq)
+        leaves = [bytes.fromhex(payload["hash"]) for _, payload in records]
+        segment_root = merkle_root(leaves).hex()
+        roots = self._sealed_roots()
+        root, root_path = segment_root, []
+        if segment < len(roots):
+            root, root_path = merkle_root(roots).hex(), merkle_path(roots, segment)
+        return InclusionProof(
+            seq=seq,
+            entry_hash=records[index][1]["hash"],
+            segment=segment,
+            segment_root=segment_root,
+            root=root,
+            segment_path=merkle_path(leaves, index),
+            root_path=root_path,
+        )
+
+
+_QueuedEvent = Tuple[str, str, Dict[str, Any], "asyncio.Future[AuditEntry]"]
+_SEAL_FIELDS = ("segment", "first_seq", "last_seq", "root", "head", "signer")
+
+
+def _entry_hash(payload: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _link(payload: Dict[str, Any], prev_hash: str) -> None:
+    """Chain ``payload`` after ``prev_hash`` and (re)compute its own hash."""
+
+    payload.pop("hash", None)
+    payload["prev_hash"] = prev_hash
+    payload["hash"] = _entry_hash(payload)
+
+
+def _check_segment(first_seq: int, prev_hash: str, records: List[AuditRecord]) -> Tuple[List[str], str, str]:
+    """Verify one segment; returns ``(errors, merkle root, last stored hash)``.
+
+    Module-level so it can run in a worker process.
+    """
+
+    errors: List[str] = []
+    leaves: List[bytes] = []
+    expected_seq = first_seq
+    for seq, entry in records:
+        if seq != expected_seq:
+            errors.append(f"Missing audit entries {expected_seq}-{seq - 1}")
+        expected_seq = seq + 1
+        payload = dict(entry)
+        entry_hash = payload.pop("hash")
+        if entry_hash != _entry_hash(payload):
+            errors.append(f"Hash mismatch for entry {entry['id']}")
+        if payload.get("prev_hash") != prev_hash:
+            errors.append(f"Broken hash chain at entry {entry['id']}")
+        prev_hash = entry_hash
+        try:
+            leaves.append(bytes.fromhex(entry_hash))
+        except ValueError:
+            leaves.append(entry_hash.encode("utf-8"))
+    return errors, merkle_root(leaves).hex(), prev_hash
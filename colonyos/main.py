@@ -11,9 +11,12 @@ from typing import List
 
 from colonyos.api.rest import run_api_server
 from colonyos.body import ColonyKernel
-from colonyos.core.event_bus import EventBus, InMemoryEventBus, RedisEventBus
-from colonyos.core.memory import HybridMemory, RedisMemory, SQLiteMemory, VectorMemory
+from colonyos.core.cache import MemoryCache
+from colonyos.core.event_bus import DurableEventBus, EventBus, InMemoryEventBus, RedisEventBus
+from colonyos.core.event_log import SegmentedEventLog
+from colonyos.core.memory import HybridMemory, RedisMemory, ShardedSQLiteMemory, SQLiteMemory
 from colonyos.core.types import ColonyConfig, Identity, IdentityManager, Worker, WorkerCapability, WorkerStatus
+from colonyos.core.vector import create_vector_memory
 from colonyos.guardian.neurasphere import Neurasphere
 from colonyos.mind.neurosphere import Neurosphere
 
@@ -32,16 +35,55 @@ class ColonyOS:
 
         if config.event_bus_type == "redis" and config.message_queue_url:
             backend = RedisEventBus(config.message_queue_url)
+        elif config.event_bus_type == "log" and config.event_log_path:
+            backend = DurableEventBus(
+                SegmentedEventLog(
+                    config.event_log_path,
+                    segment_bytes=config.event_log_segment_bytes,
+                    retention_bytes=config.event_log_retention_bytes,
+                    retention_seconds=config.event_log_retention_seconds,
+                    fsync=config.event_log_fsync,
+                )
+            )
         else:
             backend = InMemoryEventBus()
         self.event_bus = EventBus(backend)
 
         if config.memory_backend == "redis" and config.message_queue_url:
-            relational = RedisMemory(config.message_queue_url)
+            relational = RedisMemory(
+                config.message_queue_url,
+                key_prefix=config.memory_key_prefix,
+                codec=config.memory_codec,
+                scope_codecs=config.memory_scope_codecs,
+            )
+        elif config.memory_backend == "sqlite-sharded":
+            relational = ShardedSQLiteMemory(
+                config.memory_connection_string,
+                shards=config.memory_shards,
+                scope_shards=config.memory_scope_shards,
+                codec=config.memory_codec,
+                scope_codecs=config.memory_scope_codecs,
+            )
         else:
-            relational = SQLiteMemory(config.memory_connection_string)
-        vector = VectorMemory() if config.vector_db_backend == "chromadb" else None
-        self.memory = HybridMemory(relational, vector)
+            relational = SQLiteMemory(
+                config.memory_connection_string,
+                codec=config.memory_codec,
+                scope_codecs=config.memory_scope_codecs,
+            )
+        vector = None
+        if config.vector_db_backend:
+            params = dict(config.vector_index_params)
+            if config.vector_db_path:
+                params.setdefault("path", config.vector_db_path)
+            vector = create_vector_memory(config.vector_db_backend, metric=config.vector_metric, **params)
+        cache = None
+        if config.memory_cache_entries:
+            cache = MemoryCache(
+                max_entries=config.memory_cache_entries,
+                max_bytes=config.memory_cache_bytes,
+                negative_ttl=config.memory_cache_negative_ttl,
+            )
+        self.memory = HybridMemory(relational, vector, cache=cache)
 
         self.mind = Neurosphere(config, self.memory, self.event_bus)
         self.mind.set_identity(self.system_identity)
@@ -54,13 +96,16 @@ class ColonyOS:
         await self.event_bus.start()
         await self.body.start()
         initial_state = {"initialized": True, "timestamp": time.time()}
-        self.guardian.create_checkpoint(initial_state)
+        await self.guardian.acreate_checkpoint(initial_state)
         logger.info("ColonyOS started")
 
     async def stop(self) -> None:
         logger.info("Stopping ColonyOS")
         await self.body.stop()
         await self.event_bus.stop()
+        await self.memory.aflush()
+        if self.memory.vector is not None:
+            self.memory.vector.flush()
         logger.info("ColonyOS stopped")
 
     def create_worker(self, worker_id: str, identity: Identity, capabilities: List[WorkerCapability]) -> Worker:
@@ -48,6 +48,26 @@ class Neurosphere:
             raise RuntimeError("No workers registered")
         return TaskRouting(worker_id=worker_ids[0])
 
+    def route_tasks(self, tasks: List[Task]) -> List[TaskRouting]:
+        """Route a batch of tasks, scanning the worker registry once."""
+
+        if not self._workers:
+            raise RuntimeError("No workers registered")
+        first_registered = next(iter(self._workers))
+        available = [registered.worker for registered in self._workers.values() if registered.worker.is_available()]
+        any_available = available[0].id if available else first_registered
+        by_category: Dict[str, str] = {}
+        for worker in reversed(available):
+            for capability in worker.capabilities:
+                by_category[capability.category] = worker.id
+
+        routings: List[TaskRouting] = []
+        for task in tasks:
+            category = task.requirements.get("category")
+            worker_id = by_category.get(category, first_registered) if category else any_available
+            routings.append(TaskRouting(worker_id=worker_id))
+        return routings
+
     def plan_goal(self, goal: str, context: Optional[Dict[str, str]] = None) -> WorkflowPlan:
         created_by = self.identity.id if self.identity else "system"
         task = Task.create(description=goal, created_by=created_by, requirements={"category": "planning"})
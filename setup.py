@@ -13,5 +13,9 @@ setup(
         "streamlit",
         "pandas",
         "plotly",
+        "numpy",
     ],
+    extras_require={
+        "fast": ["msgpack", "lz4"],
+    },
 )
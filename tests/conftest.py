@@ -0,0 +1,13 @@
+"""Shared fixtures for the ColonyOS test suite."""
+
+from __future__ import annotations
+
+import pytest
+
+from colonyos.core.resp import LocalRespServer
+
+
+@pytest.fixture
+def resp_server():
+    with LocalRespServer() as server:
+        yield server
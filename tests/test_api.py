@@ -0,0 +1,228 @@
+"""REST and WebSocket API tests for ColonyOS."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from colonyos.api.fanout import EventFilter
+from colonyos.api.rest import ColonyAPI, auth_manager
+from colonyos.core.types import ColonyConfig, Worker, WorkerCapability, WorkerStatus
+from colonyos.main import ColonyOS
+
+
+@pytest.fixture
+def colony_client():
+    colony = ColonyOS(ColonyConfig(max_concurrent_tasks=1))
+    api = ColonyAPI(colony)
+    with TestClient(api.app) as client:
+        client.portal.call(colony.event_bus.start)
+        token = auth_manager.create_token(colony.system_identity)
+        client.headers["Authorization"] = f"Bearer {token}"
+        yield colony, client
+        client.portal.call(colony.event_bus.stop)
+
+
+def publish(client: TestClient, colony: ColonyOS, event_type: str, data: dict) -> None:
+    client.portal.call(colony.event_bus.publish, event_type, data, "tests")
+
+
+def wait_registered(websocket) -> None:
+    websocket.send_text("ping")
+    assert websocket.receive_text() == "pong"
+
+
+class TestEventReplay:
+    def test_history_since_cursor(self, colony_client) -> None:
+        colony, client = colony_client
+        for idx in range(3):
+            publish(client, colony, "demo", {"idx": idx})
+        body = client.get("/events", params={"since": 1}).json()
+        assert not body["gap"]
+        assert [event["sequence"] for event in body["events"]] == [2, 3]
+        assert body["next"] == 3
+
+    def test_websocket_resumes_from_cursor(self, colony_client) -> None:
+        colony, client = colony_client
+        for idx in range(3):
+            publish(client, colony, "demo", {"idx": idx})
+        with client.websocket_connect("/ws/events?since=1") as websocket:
+            assert websocket.receive_json()["sequence"] == 2
+            assert websocket.receive_json()["sequence"] == 3
+            publish(client, colony, "demo", {"idx": 3})
+            live = websocket.receive_json()
+            assert live["sequence"] == 4
+            assert live["data"] == {"idx": 3}
+
+    def test_websocket_signals_gap(self, colony_client) -> None:
+        colony, client = colony_client
+        publish(client, colony, "demo", {"idx": 0})
+        with client.websocket_connect("/ws/events?since=50") as websocket:
+            message = websocket.receive_json()
+            assert message["type"] == "resync"
+            assert message["data"]["reason"] == "gap"
+
+
+class TestFanout:
+    def test_filters_negotiated_at_connect(self, colony_client) -> None:
+        colony, client = colony_client
+        with client.websocket_connect("/ws/events?event_types=task_completed&task_id=t-2") as websocket:
+            wait_registered(websocket)
+            publish(client, colony, "task_started", {"task_id": "t-2"})
+            publish(client, colony, "task_completed", {"task_id": "t-1"})
+            publish(client, colony, "task_completed", {"task_id": "t-2"})
+            message = websocket.receive_json()
+            assert message["type"] == "task_completed"
+            assert message["data"] == {"task_id": "t-2"}
+
+    def test_single_subscription_encodes_once(self, colony_client, monkeypatch) -> None:
+        colony, client = colony_client
+        from colonyos.api import fanout
+
+        calls = []
+        original = fanout.encode_event
+
+        def counting_encode(event):
+            calls.append(event.sequence)
+            return original(event)
+
+        monkeypatch.setattr(fanout, "encode_event", counting_encode)
+        with client.websocket_connect("/ws/events") as first, client.websocket_connect("/ws/events") as second:
+            wait_registered(first)
+            wait_registered(second)
+            subscriptions = client.portal.call(lambda: _subscription_count(colony))
+            assert subscriptions == 1
+            publish(client, colony, "demo", {"idx": 1})
+            assert first.receive_json()["data"] == {"idx": 1}
+            assert second.receive_json()["data"] == {"idx": 1}
+        assert len(calls) == 1
+
+
+async def _subscription_count(colony: ColonyOS) -> int:
+    return len(colony.event_bus.backend._subscriptions)
+
+
+class TestLongPollAndSSE:
+    def test_wait_returns_on_completion(self, colony_client) -> None:
+        colony, client = colony_client
+        worker = Worker(
+            id="wait-worker",
+            identity=None,
+            capabilities=[WorkerCapability(name="test", category="testing")],
+            status=WorkerStatus.IDLE,
+        )
+        colony.body.register_worker(worker)
+        colony.mind.register_worker(worker)
+        client.portal.call(colony.body.start)
+        try:
+            created = client.post("/tasks", json={"description": "wait for me"}).json()
+            finished = client.get(f"/tasks/{created['id']}/wait", params={"timeout": 5}).json()
+            assert finished["status"] == "completed"
+        finally:
+            client.portal.call(colony.body.stop)
+
+    def test_wait_times_out_and_unknown_task(self, colony_client) -> None:
+        colony, client = colony_client
+        colony.mind.register_worker(Worker(id="idle", identity=None, capabilities=[]))
+        created = client.post("/tasks", json={"description": "never scheduled"}).json()
+        for _ in range(3):
+            pending = client.get(f"/tasks/{created['id']}/wait", params={"timeout": 0.05}).json()
+            assert pending["status"] == "queued"
+        # Repeated long-polls leave no waiter behind and register a single callback.
+        assert created["id"] not in colony.body._waiters
+        assert len(colony.body.executor.execution_callbacks[created["id"]]) == 1
+        assert client.get("/tasks/missing/wait", params={"timeout": 0}).status_code == 404
+
+    def test_sse_frames(self) -> None:
+        async def run():
+            colony = ColonyOS(ColonyConfig(max_concurrent_tasks=1))
+            api = ColonyAPI(colony)
+            api.sse_keepalive_seconds = 0.05
+            await colony.event_bus.start()
+            await colony.event_bus.publish("task_completed", {"task_id": "a"}, "tests")
+            client = await api.hub.register(EventFilter.from_params(task_id="a"))
+            frames = api._sse_frames(client, since=0)
+            replayed = await frames.__anext__()
+            assert replayed.startswith("id: 1\nevent: task_completed\ndata: ")
+            assert await frames.__anext__() == ": keep-alive\n\n"
+            await colony.event_bus.publish("task_completed", {"task_id": "b"}, "tests")
+            await colony.event_bus.publish("task_started", {"task_id": "a"}, "tests")
+            live = await frames.__anext__()
+            while live.startswith(":"):
+                live = await frames.__anext__()
+            assert live.startswith("id: 3\nevent: task_started")
+            await frames.aclose()
+            assert api.hub.client_count == 0
+            await colony.event_bus.stop()
+
+        asyncio.run(run())
+
+
+class TestBatchSubmission:
+    def test_json_array_batch(self, colony_client) -> None:
+        colony, client = colony_client
+        colony.mind.register_worker(Worker(id="batch-worker", identity=None, capabilities=[]))
+        items = [
+            {"description": "first"},
+            {"description": "rm -rf /"},
+            {"description": ""},
+            {"description": "fourth", "priority": 9},
+        ]
+        response = client.post("/tasks:batch", json=items)
+        results = [json.loads(line) for line in response.text.splitlines()]
+        assert [result["index"] for result in results] == [0, 1, 2, 3]
+        assert results[0]["status"] == "queued"
+        assert results[1]["violations"]
+        assert "description" in results[2]["error"]
+        assert colony.body.get_task(results[3]["id"]).priority == 9
+
+    def test_ndjson_batch(self, colony_client) -> None:
+        colony, client = colony_client
+        colony.mind.register_worker(Worker(id="batch-worker", identity=None, capabilities=[]))
+        colony.body.task_queue.max_size = 1000
+        body = "".join(json.dumps({"description": f"task-{idx}"}) + "\n" for idx in range(600)) + "{broken\n"
+        response = client.post("/tasks:batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+        results = [json.loads(line) for line in response.text.splitlines()]
+        assert len(results) == 601
+        assert sum(1 for result in results if result.get("status") == "queued") == 600
+        assert results[-1]["error"].startswith("Invalid JSON")
+        assert colony.body.task_queue.size() == 600
+
+    def test_cli_batch_reports_failed_chunks_and_source_lines(self, tmp_path, monkeypatch) -> None:
+        import requests
+        from click.testing import CliRunner
+
+        from colonyos.cli.main import ColonyClient, cli
+
+        def submit_batch(self, items):
+            if any(item["description"] == "down" for item in items):
+                raise requests.HTTPError("503 Server Error")
+            return [
+                {"index": index, "error": "rejected"} if item["description"] == "bad" else {"index": index, "id": "t"}
+                for index, item in enumerate(items)
+            ]
+
+        monkeypatch.setattr(ColonyClient, "submit_batch", submit_batch)
+        descriptions = ["a", "", "bad", "b", "", "down", "c", "d"]
+        path = tmp_path / "tasks.ndjson"
+        path.write_text("".join((json.dumps({"description": text}) if text else "") + "\n" for text in descriptions))
+        result = CliRunner().invoke(cli, ["submit-batch", str(path), "--chunk-size", "2", "--concurrency", "1"])
+        assert result.exit_code == 0, result.output
+        # Chunks: (a, bad), (b, down), (c, d); only the middle request fails.
+        assert "Submitted 3 tasks" in result.output
+        assert "3 tasks failed" in result.output
+        failures = [line.split("│")[1].strip() for line in result.output.splitlines() if "rejected" in line or "Request failed" in line]
+        assert failures == ["3", "4", "6"]
+
+    def test_queue_batch_respects_capacity(self) -> None:
+        from colonyos.body.queue import PriorityTaskQueue
+        from colonyos.core.types import Task
+
+        queue = PriorityTaskQueue(max_size=3)
+        tasks = [Task.create(description=f"t{idx}", created_by="tests", priority=idx) for idx in range(5)]
+        accepted = queue.enqueue_many([(task, task.priority, None) for task in tasks])
+        assert accepted == [True, True, True, False, False]
+        assert queue.dequeue().description == "t2"
@@ -3,14 +3,23 @@
 from __future__ import annotations
 
 import asyncio
+import os
+import sqlite3
+import threading
 import time
 from datetime import datetime, timezone
 
+import numpy as np
 import pytest
 
-from colonyos.core.event_bus import EventBus, InMemoryEventBus
-from colonyos.core.memory import SQLiteMemory
+from colonyos.core.cache import MISSING, MemoryCache
+from colonyos.core.codecs import get_codec
+from colonyos.core.event_bus import DurableEventBus, EventBus, InMemoryEventBus
+from colonyos.core.event_log import SegmentedEventLog
+from colonyos.core.memory import HybridMemory, RedisMemory, ShardedSQLiteMemory, SQLiteMemory
+from colonyos.core.resp import LocalRespServer
 from colonyos.core.types import (
+    Event,
     Identity,
     IdentityManager,
     Message,
@@ -18,6 +27,7 @@ from colonyos.core.types import (
     Task,
     TaskStatus,
 )
+from colonyos.core.vector import IVFVectorMemory, VectorMemory, _kmeans, create_vector_memory
 
 
 @pytest.fixture
@@ -80,6 +90,14 @@ class TestTask:
         assert restored.id == task.id
         assert restored.description == task.description
 
+    def test_task_snapshot_is_isolated(self, test_identity: Identity) -> None:
+        task = Task.create(description="demo", created_by=test_identity.id, tags=["a"])
+        snapshot = task.snapshot()
+        task.status = TaskStatus.EXECUTING
+        task.metadata["progress"] = 0.5
+        assert snapshot.status == TaskStatus.PENDING and "progress" not in snapshot.metadata
+        assert snapshot.to_wire_format()["metadata"] == {"tags": ["a"]}
+
     def test_task_retry_logic(self, test_identity: Identity) -> None:
         task = Task.create(description="retry", created_by=test_identity.id, max_retries=2)
         assert task.can_retry()
@@ -121,6 +139,119 @@ class TestEventBus:
 
         asyncio.run(run())
 
+    def test_sequence_and_replay(self) -> None:
+        async def run():
+            bus = EventBus(InMemoryEventBus(history_size=3))
+            await bus.start()
+            for idx in range(5):
+                await bus.publish("demo", {"value": idx}, "tests")
+            replay = await bus.replay(since=2)
+            assert [event.sequence for event in replay.events] == [3, 4, 5]
+            assert not replay.gap
+            evicted = await bus.replay(since=0)
+            assert evicted.gap
+            assert evicted.first_sequence == 3
+            await bus.stop()
+
+        asyncio.run(run())
+
+
+class TestEventLog:
+    def test_append_and_replay_after_reopen(self, tmp_path) -> None:
+        log = SegmentedEventLog(str(tmp_path))
+        for idx in range(10):
+            log.append(Event(event_type="demo", data={"value": idx}, source="tests"))
+        log.close()
+
+        reopened = SegmentedEventLog(str(tmp_path))
+        replayed = list(reopened.replay(since=7))
+        assert [seq for seq, _ in replayed] == [8, 9, 10]
+        assert replayed[-1][1].data == {"value": 9}
+        assert reopened.append(Event(event_type="demo", data={}, source="tests")) == 11
+
+    def test_segment_roll_and_retention(self, tmp_path) -> None:
+        log = SegmentedEventLog(str(tmp_path), segment_bytes=512, retention_bytes=2048)
+        for idx in range(200):
+            log.append(Event(event_type="even" if idx % 2 == 0 else "odd", data={"value": idx}, source="tests"))
+        stats = log.stats()
+        assert stats["bytes"] <= 2048 + 512
+        assert stats["first_sequence"] > 1
+        last = log.read_last(3, event_type="odd")
+        assert [event.data["value"] for _, event in last] == [195, 197, 199]
+        # Unfiltered reads start from the index tail and may span segments.
+        assert [event.data["value"] for _, event in log.read_last(20)] == list(range(180, 200))
+        assert [seq for seq, _ in log.read_last(1)] == [200]
+
+    def test_age_retention_without_rolling(self, tmp_path) -> None:
+        log = SegmentedEventLog(str(tmp_path), segment_bytes=256)
+        for idx in range(20):
+            log.append(Event(event_type="demo", data={"value": idx}, source="tests"))
+        log.close()
+        segments = log.stats()["segments"]
+        oldest = sorted(tmp_path.glob("*.log"))[0]
+        os.utime(oldest, (time.time() - 120, time.time() - 120))
+
+        reopened = SegmentedEventLog(str(tmp_path), segment_bytes=256, retention_seconds=60)
+        assert reopened.stats()["segments"] == segments - 1
+        assert not oldest.exists()
+
+        # A quiet log that never rolls again still drops segments as they age.
+        quiet = SegmentedEventLog(str(tmp_path / "quiet"), segment_bytes=256, retention_seconds=1)
+        for idx in range(20):
+            quiet.append(Event(event_type="demo", data={"value": idx}, source="tests"))
+        assert quiet.stats()["segments"] > 1
+        quiet.segment_bytes = 1 << 20
+        time.sleep(1.1)
+        quiet.append(Event(event_type="demo", data={}, source="tests"))
+        assert quiet.stats()["segments"] == 1
+
+    def test_torn_tail_is_truncated(self, tmp_path) -> None:
+        log = SegmentedEventLog(str(tmp_path))
+        for idx in range(3):
+            log.append(Event(event_type="demo", data={"value": idx}, source="tests"))
+        log.close()
+        segment = next(tmp_path.glob("*.log"))
+        with open(segment, "ab") as handle:
+            handle.write(b"\x01\x02\x03")
+
+        reopened = SegmentedEventLog(str(tmp_path))
+        assert [seq for seq, _ in reopened.replay()] == [1, 2, 3]
+        assert reopened.next_sequence == 4
+
+    def test_durable_bus_history(self, tmp_path) -> None:
+        async def run():
+            bus = EventBus(DurableEventBus(SegmentedEventLog(str(tmp_path))))
+            await bus.start()
+            for idx in range(5):
+                await bus.publish("demo", {"value": idx}, "tests")
+            await bus.stop()
+
+            restarted = EventBus(DurableEventBus(SegmentedEventLog(str(tmp_path))))
+            await restarted.start()
+            history = await restarted.get_history("demo", limit=2)
+            assert [event.data["value"] for event in history] == [3, 4]
+            replay = await restarted.replay(since=3)
+            assert not replay.gap
+            assert [event.sequence for event in replay.events] == [4, 5]
+            await restarted.stop()
+
+        asyncio.run(run())
+
+    def test_durable_bus_batches_appends(self, tmp_path) -> None:
+        async def run():
+            backend = DurableEventBus(SegmentedEventLog(str(tmp_path), segment_bytes=2048))
+            bus = EventBus(backend)
+            await bus.start()
+            await asyncio.gather(*(bus.publish("demo", {"value": idx}, "tests") for idx in range(200)))
+            assert backend.batches < 200
+            replay = await bus.replay(since=0, limit=500)
+            assert [event.data["value"] for event in replay.events] == list(range(200))
+            assert [event.sequence for event in replay.events] == list(range(1, 201))
+            assert backend.log.stats()["segments"] > 1
+            await bus.stop()
+
+        asyncio.run(run())
+
 
 class TestMemory:
     def test_sqlite_memory(self, tmp_path) -> None:
@@ -132,6 +263,250 @@ class TestMemory:
         assert memory.delete("key", scope="tests")
         assert memory.retrieve("key", scope="tests") is None
 
+    def test_in_memory_database_is_shared(self) -> None:
+        memory = SQLiteMemory(":memory:")
+        memory.store("key", [1, 2, 3], scope="tests")
+        assert memory.retrieve("key", scope="tests") == [1, 2, 3]
+        assert memory.list_keys(scope="tests") == ["key"]
+        other = SQLiteMemory(":memory:")
+        assert other.retrieve("key", scope="tests") is None
+        memory.close()
+        other.close()
+
+    def test_file_database_uses_wal_and_replaces_keys(self, tmp_path) -> None:
+        memory = SQLiteMemory(str(tmp_path / "memory.db"))
+        memory.store("key", 1, scope="tests")
+        memory.store("key", 2, scope="tests")
+        assert memory.list_keys(scope="tests") == ["key"]
+        assert memory.retrieve("key", scope="tests") == 2
+        with memory.reader() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        memory.close()
+
+    @pytest.mark.parametrize("in_memory", [True, False])
+    def test_reads_never_see_rolled_back_writes(self, tmp_path, in_memory) -> None:
+        memory = SQLiteMemory(":memory:" if in_memory else str(tmp_path / "memory.db"), sweep_interval=None)
+        memory.store("key", 1, scope="tests")
+        deleted, done = threading.Event(), threading.Event()
+
+        def rolled_back() -> None:
+            try:
+                with memory.transaction() as conn:
+                    conn.execute("DELETE FROM kv_store WHERE scope = ? AND key = ?", ("tests", "key"))
+                    deleted.set()
+                    done.wait(0.2)
+                    raise RuntimeError("abort")
+            except RuntimeError:
+                pass
+
+        writer = threading.Thread(target=rolled_back)
+        writer.start()
+        assert deleted.wait(5)
+        assert memory.retrieve("key", scope="tests") == 1
+        done.set()
+        writer.join()
+        assert memory.retrieve("key", scope="tests") == 1
+        memory.close()
+
+    def test_concurrent_access(self, tmp_path) -> None:
+        memory = SQLiteMemory(str(tmp_path / "memory.db"))
+        errors = []
+
+        def work(worker: int) -> None:
+            try:
+                for idx in range(100):
+                    memory.store(f"{worker}-{idx}", idx, scope="tests")
+                    assert memory.retrieve(f"{worker}-{idx}", scope="tests") == idx
+            except Exception as exc:  # pragma: no cover - surfaced by assertion below
+                errors.append(exc)
+
+        threads = [threading.Thread(target=work, args=(worker,)) for worker in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+        assert len(memory.list_keys(scope="tests")) == 600
+
+    def test_batch_operations(self, tmp_path) -> None:
+        memory = SQLiteMemory(str(tmp_path / "memory.db"))
+        items = {f"key-{idx}": {"idx": idx} for idx in range(1200)}
+        memory.store_many(items, scope="tests")
+        found = memory.retrieve_many(["key-5", "missing", "key-1100", "key-2"], scope="tests")
+        assert list(found) == ["key-5", "key-1100", "key-2"]
+        assert found["key-1100"] == {"idx": 1100}
+        assert len(memory.retrieve_many(items, scope="tests")) == 1200
+        assert memory.delete_many(["key-5", "key-6", "missing"], scope="tests") == 2
+        assert memory.retrieve("key-5", scope="tests") is None
+
+    def test_batch_operations_redis(self, resp_server) -> None:
+        memory = RedisMemory(resp_server.url)
+        memory.store_many({"a": 1, "b": 2}, scope="tests")
+        assert memory.retrieve_many(["b", "a", "c"], scope="tests") == {"b": 2, "a": 1}
+        assert memory.delete_many(["a", "c"], scope="tests") == 1
+        memory.close()
+
+    def test_redis_memory_shared_ttl_and_scan(self, resp_server) -> None:
+        pod_a = RedisMemory(resp_server.url, scan_count=7, scope_codecs={"checkpoints": "json+zlib"})
+        pod_b = RedisMemory(resp_server.url, max_connections=2)
+        pod_a.store_many({f"k{i}": {"n": i} for i in range(50)}, scope="tasks")
+        pod_a.store("x", "other", scope="tasks*")  # glob characters in a scope stay literal
+        pod_a.store("cp", {"tasks": list(range(300))}, scope="checkpoints")
+        assert sorted(pod_b.list_keys("tasks")) == sorted(f"k{i}" for i in range(50))
+        assert pod_b.list_keys("tasks*") == ["x"]
+        assert pod_b.retrieve("cp", scope="checkpoints") == {"tasks": list(range(300))}
+        pages = list(pod_a.iter_keys("tasks", page_size=5))
+        assert len(pages) == 50
+        some = list(pod_a.scan("tasks", limit=3, order="any"))
+        assert len(some) == 3 and set(some) <= {f"k{i}" for i in range(50)}
+        with pytest.raises(ValueError):
+            list(pod_a.scan("tasks", start_after="k1", order="any"))
+
+        pod_a.store("short", 1, scope="tasks", ttl=1)
+        value, expires_at = pod_b.retrieve_with_expiry("short", scope="tasks")
+        assert value == 1 and expires_at is not None and expires_at <= time.time() + 1
+        assert pod_b.client.execute("PTTL", "colonyos:tasks:short") > 0
+        time.sleep(1.1)
+        assert pod_b.retrieve("short", scope="tasks") is None
+        assert "short" not in pod_b.list_keys("tasks")
+
+        errors = []
+
+        def worker(offset: int) -> None:
+            try:
+                for i in range(20):
+                    pod_b.store(f"t{offset}-{i}", i, scope="threads")
+                    assert pod_b.retrieve(f"t{offset}-{i}", scope="threads") == i
+            except Exception as exc:  # pragma: no cover - surfaced below
+                errors.append(exc)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+        assert len(pod_a.list_keys("threads")) == 120
+        assert pod_b.client.pool._created <= 2
+        pod_a.close()
+        pod_b.close()
+
+    def test_resp_pool_discards_connections_after_any_error(self, resp_server) -> None:
+        memory = RedisMemory(resp_server.url)
+        pool = memory.client.pool
+        with pytest.raises(KeyboardInterrupt):
+            with pool.connection() as conn:
+                conn.execute_many([("SET", "k", "v")])
+                raise KeyboardInterrupt
+        assert pool._created == 0 and pool._idle.empty()
+        assert memory.client.execute("GET", "k") == b"v"
+        assert pool._created == 1
+        memory.close()
+
+    def test_redis_scan_skips_duplicate_keys(self) -> None:
+        with LocalRespServer(scan_duplicates=True) as server:
+            memory = RedisMemory(server.url, scan_count=4)
+            memory.store_many({f"k{i:02d}": i for i in range(25)}, scope="tasks")
+            assert len(list(memory.client.scan_iter(count=4))) > 25  # the stand-in repeats keys
+            assert sorted(memory.iter_keys("tasks")) == [f"k{i:02d}" for i in range(25)]
+            assert len(memory.list_keys("tasks")) == 25
+            assert list(memory.scan("tasks", limit=3, start_after="k10")) == ["k11", "k12", "k13"]
+            assert len(set(memory.scan("tasks", limit=25, order="any"))) == 25
+            memory.close()
+
+    @pytest.mark.parametrize("backend", ["sqlite", "redis"])
+    def test_scan_key_order_prefix_and_cursor(self, backend, resp_server) -> None:
+        memory = SQLiteMemory(":memory:", sweep_interval=None) if backend == "sqlite" else RedisMemory(resp_server.url)
+        keys = [f"user:{i:04d}" for i in range(2500)] + ["task:1", "user", "userz"]
+        memory.store_many({key: 1 for key in reversed(keys)}, scope="tests")
+        memory.store("user:9999", 1, scope="tests", ttl=1)
+        memory.store("user:0001", 1, scope="other")
+        time.sleep(1.1)
+
+        users = [f"user:{i:04d}" for i in range(2500)]
+        assert list(memory.scan("tests", prefix="user:")) == users
+        assert list(memory.scan("tests", prefix="user:", reverse=True, limit=3)) == users[::-1][:3]
+        assert list(memory.scan("tests")) == sorted(keys)
+
+        pages, cursor = [], None
+        while True:
+            page = list(memory.scan("tests", prefix="user:", start_after=cursor, limit=1000))
+            if not page:
+                break
+            pages.append(page)
+            cursor = page[-1]
+        assert [len(page) for page in pages] == [1000, 1000, 500]
+        assert sum(pages, []) == users
+        assert list(memory.scan("tests", prefix="user:", start_after="user:0100", reverse=True, limit=2)) == [
+            "user:0099",
+            "user:0098",
+        ]
+        if backend == "redis":
+            with pytest.raises(ValueError):
+                memory.scan("tests", order="insertion")
+        memory.close()
+
+    def test_sqlite_scan_insertion_order_uses_indexes(self) -> None:
+        memory = SQLiteMemory(":memory:", sweep_interval=None)
+        for key in ["b", "c", "a", "d"]:
+            memory.store(key, 1, scope="tests")
+        assert list(memory.scan("tests", order="insertion")) == ["b", "c", "a", "d"]
+        assert list(memory.scan("tests", order="insertion", start_after="c", limit=1)) == ["a"]
+        assert list(memory.scan("tests", order="insertion", reverse=True, limit=2)) == ["d", "a"]
+        with pytest.raises(KeyError):
+            list(memory.scan("tests", order="insertion", start_after="missing"))
+
+        with memory.reader() as conn:
+            for column in ("key", "rowid"):
+                plan = conn.execute(
+                    f"EXPLAIN QUERY PLAN SELECT rowid, key FROM kv_store WHERE scope = ? "
+                    f"AND (expires_at IS NULL OR expires_at >= ?) ORDER BY {column} DESC LIMIT 10",
+                    ("tests", 0),
+                ).fetchall()
+                assert not any("TEMP B-TREE" in row[-1] for row in plan)
+        memory.close()
+
+    def test_sharded_memory_routes_scopes_to_files(self, tmp_path) -> None:
+        memory = ShardedSQLiteMemory(
+            str(tmp_path / "shards"),
+            shards=2,
+            scope_shards={"audit": "audit", "checkpoints": "checkpoints"},
+            spread_scopes=["tasks"],
+            sweep_interval=None,
+        )
+        assert sorted(path.name for path in (tmp_path / "shards").glob("*.db")) == [
+            "audit.db",
+            "checkpoints.db",
+            "shard-00.db",
+            "shard-01.db",
+        ]
+        memory.store("a", 1, scope="audit")
+        memory.store("c", {"big": "x" * 1000}, scope="checkpoints")
+        memory.store_many({f"t{i:03d}": i for i in range(100)}, scope="tasks")
+        assert memory.shards["audit"].retrieve("a", scope="audit") == 1
+        assert memory.shards["checkpoints"].list_keys("audit") == []
+        per_shard = [len(memory.shards[name].list_keys("tasks")) for name in ("shard-00", "shard-01")]
+        assert sum(per_shard) == 100 and min(per_shard) > 0
+
+        assert memory.retrieve_many(["t005", "t099", "nope"], scope="tasks") == {"t005": 5, "t099": 99}
+        assert list(memory.scan("tasks", start_after="t010", limit=3)) == ["t011", "t012", "t013"]
+        assert list(memory.scan("tasks", reverse=True, limit=2)) == ["t099", "t098"]
+        with pytest.raises(ValueError):
+            memory.scan("tasks", order="insertion")
+        assert memory.delete_many([f"t{i:03d}" for i in range(50)], scope="tasks") == 50
+        assert len(memory.list_keys("tasks")) == 50
+
+        # A held writer lock on one shard does not block writes to another.
+        with memory.shards["checkpoints"]._lock:
+            writer = threading.Thread(target=memory.store, args=("b", 2), kwargs={"scope": "audit"})
+            writer.start()
+            writer.join(timeout=2)
+            assert not writer.is_alive()
+        memory.delete("c", scope="checkpoints")
+        memory.vacuum("checkpoints")
+        assert memory.retrieve("b", scope="audit") == 2
+        memory.close()
+
     def test_memory_ttl(self, tmp_path) -> None:
         db_path = tmp_path / "memory.db"
         memory = SQLiteMemory(str(db_path))
@@ -139,3 +514,343 @@ class TestMemory:
         assert memory.retrieve("key", scope="tests") == "value"
         time.sleep(1.2)
         assert memory.retrieve("key", scope="tests") is None
+
+    def test_expired_rows_filtered_and_purged(self, tmp_path) -> None:
+        memory = SQLiteMemory(str(tmp_path / "memory.db"), sweep_interval=None, sweep_batch_size=2)
+        memory.store_many({f"k{i}": i for i in range(5)}, scope="tests", ttl=1)
+        memory.store("keep", "value", scope="tests")
+        time.sleep(1.2)
+        assert memory.retrieve("k0", scope="tests") is None
+        assert memory.list_keys("tests") == ["keep"]
+        assert memory.retrieve_many(["k1", "keep"], scope="tests") == {"keep": "value"}
+
+        def row_count() -> int:
+            with memory.reader() as conn:
+                return conn.execute("SELECT COUNT(*) FROM kv_store").fetchone()[0]
+
+        assert row_count() == 6  # reads never write
+        assert memory.purge_expired() == 5
+        assert row_count() == 1
+        with memory.reader() as conn:
+            indexes = {row[1] for row in conn.execute("PRAGMA index_list(kv_store)")}
+        assert "idx_kv_expires_at" in indexes
+        memory.close()
+
+    def test_background_sweeper(self, tmp_path) -> None:
+        memory = SQLiteMemory(str(tmp_path / "memory.db"), sweep_interval=0.2)
+        memory.store("key", "value", scope="tests", ttl=1)
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            with memory.reader() as conn:
+                if conn.execute("SELECT COUNT(*) FROM kv_store").fetchone()[0] == 0:
+                    break
+            time.sleep(0.05)
+        else:
+            pytest.fail("sweeper did not purge expired row")
+        memory.close()
+        memory._sweeper.join(timeout=1)
+        assert not memory._sweeper.is_alive()
+
+    @pytest.mark.parametrize("spec", ["json", "json+zlib", "msgpack", "msgpack+lz4", "auto+auto"])
+    def test_codecs_round_trip(self, spec) -> None:
+        if spec.startswith("msgpack"):
+            pytest.importorskip("msgpack")
+        if spec.endswith("lz4"):
+            pytest.importorskip("lz4")
+        codec = get_codec(spec)
+        document = {"tasks": {f"t{i}": {"id": i, "status": "pending", "tags": ["a", "b"]} for i in range(200)}}
+        encoded = codec.encode(document)
+        assert isinstance(encoded, bytes)
+        assert codec.decode(encoded) == document
+        assert codec.decode(codec.encode({"small": True})) == {"small": True}
+        if "+" in spec:
+            assert len(encoded) < len(get_codec("json").encode(document)) / 4
+
+    def test_codec_tag_stored_per_row(self) -> None:
+        memory = SQLiteMemory(":memory:", sweep_interval=None, scope_codecs={"checkpoints": "json+zlib"})
+        memory.store("plain", {"value": 1}, scope="tests")
+        memory.store("cp", {"tasks": list(range(500))}, scope="checkpoints")
+        memory.set_codec("json+zlib")
+        memory.store("packed", {"value": 2}, scope="tests")
+        assert memory.retrieve_many(["plain", "packed"], scope="tests") == {"plain": {"value": 1}, "packed": {"value": 2}}
+        assert memory.retrieve("cp", scope="checkpoints") == {"tasks": list(range(500))}
+        with memory.reader() as conn:
+            rows = dict(conn.execute("SELECT key, codec FROM kv_store").fetchall())
+            kinds = {row[0] for row in conn.execute("SELECT typeof(value) FROM kv_store")}
+        assert rows == {"plain": "json", "cp": "json+zlib", "packed": "json+zlib"}
+        assert kinds == {"blob"}
+        memory.close()
+
+    def test_legacy_text_rows_migrated(self, tmp_path) -> None:
+        db_path = tmp_path / "legacy.db"
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE kv_store (scope TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL)")
+        conn.execute("INSERT INTO kv_store VALUES ('tests', 'old', '{\"a\": 1}', NULL)")
+        conn.commit()
+        conn.close()
+        memory = SQLiteMemory(str(db_path), sweep_interval=None, codec="json+zlib")
+        assert memory.retrieve("old", scope="tests") == {"a": 1}
+        memory.store("new", {"b": 2}, scope="tests")
+        assert memory.retrieve_many(["old", "new"], scope="tests") == {"old": {"a": 1}, "new": {"b": 2}}
+        memory.close()
+
+    def test_hybrid_cache_read_through(self) -> None:
+        backend = SQLiteMemory(":memory:", sweep_interval=None)
+        memory = HybridMemory(backend, cache=MemoryCache(max_entries=2))
+        memory.store("a", {"v": 1}, scope="tests")
+        assert memory.retrieve("a", scope="tests") == {"v": 1}
+        backend.store("a", {"v": 2}, scope="tests")  # bypasses the cache
+        assert memory.retrieve("a", scope="tests") == {"v": 1}
+        memory.store("a", {"v": 3}, scope="tests")
+        assert memory.retrieve("a", scope="tests") == {"v": 3}
+
+        assert memory.retrieve("missing", scope="tests") is None
+        backend.store("missing", 1, scope="tests")
+        assert memory.retrieve("missing", scope="tests") is None  # negative entry
+        memory.delete("missing", scope="tests")
+
+        memory.store_many({"b": 2, "c": 3}, scope="tests")
+        assert memory.retrieve_many(["a", "b", "c", "x"], scope="tests") == {"a": {"v": 3}, "b": 2, "c": 3}
+        stats = memory.cache.stats()
+        assert stats["entries"] == 2
+        assert stats["evictions"] >= 2
+        assert stats["hits"] == 2 and stats["negative_hits"] == 1
+        backend.close()
+
+    def test_async_writes_coalesce_and_read_back(self, tmp_path) -> None:
+        memory = SQLiteMemory(str(tmp_path / "async.db"), sweep_interval=None)
+
+        async def run():
+            await asyncio.gather(*(memory.astore(f"k{i}", {"i": i}, scope="tests") for i in range(200)))
+            assert memory.io.writes == 200
+            assert memory.io.batches < 200
+            assert await memory.aretrieve("k7", scope="tests") == {"i": 7}
+
+            # Reads and deletes wait for earlier writes without an explicit flush.
+            store = asyncio.ensure_future(memory.astore("late", 1, scope="tests"))
+            await asyncio.sleep(0)  # let the write be submitted
+            assert await memory.aretrieve("late", scope="tests") == 1
+            await store
+            assert await memory.adelete("late", scope="tests")
+            assert await memory.aretrieve_many(["k1", "late"], scope="tests") == {"k1": {"i": 1}}
+            assert len(await memory.alist_keys(scope="tests")) == 200
+
+        asyncio.run(run())
+        memory.close()
+
+    def test_async_writes_keep_event_loop_responsive(self, tmp_path) -> None:
+        memory = SQLiteMemory(str(tmp_path / "async.db"), sweep_interval=None)
+        payload = {"tasks": [{"id": i, "description": "x" * 64} for i in range(20000)]}
+
+        async def run():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.001)
+
+            task = asyncio.ensure_future(ticker())
+            await memory.astore("checkpoint", payload, scope="tests")
+            task.cancel()
+            assert ticks > 1
+            assert (await memory.aretrieve("checkpoint", scope="tests"))["tasks"][-1]["id"] == 19999
+
+        asyncio.run(run())
+        memory.close()
+
+    def test_hybrid_cache_respects_backend_ttl_and_bytes(self) -> None:
+        backend = SQLiteMemory(":memory:", sweep_interval=None)
+        cache = MemoryCache(max_bytes=1024)
+        memory = HybridMemory(backend, cache=cache)
+        memory.store("short", "value", scope="tests", ttl=1)
+        assert memory.retrieve("short", scope="tests") == "value"
+        time.sleep(1.1)
+        assert memory.retrieve("short", scope="tests") is None
+
+        memory.store("big", "x" * 4096, scope="tests")
+        assert memory.retrieve("big", scope="tests") == "x" * 4096
+        assert cache.get("tests", "big") is MISSING
+        assert cache.stats()["bytes"] <= 1024
+        backend.close()
+
+
+class TestVectorMemory:
+    @pytest.mark.parametrize("metric", ["cosine", "dot", "l2"])
+    def test_query_matches_brute_force(self, metric) -> None:
+        rng = np.random.default_rng(7)
+        data = rng.normal(size=(300, 16)).astype(np.float32)
+        query = rng.normal(size=16).astype(np.float32)
+        memory = VectorMemory(metric=metric, initial_capacity=8)
+        memory.upsert_many([f"v{i}" for i in range(len(data))], data)
+
+        if metric == "cosine":
+            expected = (data / np.linalg.norm(data, axis=1, keepdims=True)) @ (query / np.linalg.norm(query))
+            order = np.argsort(-expected)
+        elif metric == "dot":
+            expected = data @ query
+            order = np.argsort(-expected)
+        else:
+            expected = ((data - query) ** 2).sum(axis=1)
+            order = np.argsort(expected)
+        hits = memory.query_with_scores(query, top_k=10)
+        assert [key for key, _ in hits] == [f"v{i}" for i in order[:10]]
+        assert np.allclose([score for _, score in hits], expected[order[:10]], rtol=1e-4, atol=1e-4)
+        assert memory.query_batch([query, data[3]], top_k=10)[0] == [key for key, _ in hits]
+
+    def test_upsert_replace_and_swap_remove(self) -> None:
+        memory = VectorMemory(metric="dot")
+        memory.upsert("a", [1.0, 0.0])
+        memory.upsert("b", [0.0, 1.0])
+        memory.upsert("c", [0.5, 0.5])
+        memory.upsert("a", [0.0, 2.0])
+        assert memory.query([0.0, 1.0], top_k=1) == ["a"]
+        assert memory.delete("a") and not memory.delete("a")
+        assert len(memory) == 2 and "a" not in memory
+        assert memory.query([0.0, 1.0], top_k=5) == ["b", "c"]
+        assert memory.get("c").tolist() == [0.5, 0.5]
+        with pytest.raises(ValueError):
+            memory.upsert("d", [1.0, 2.0, 3.0])
+
+    @pytest.mark.parametrize("metric", ["cosine", "l2"])
+    def test_ivf_incremental_insert_and_delete(self, metric) -> None:
+        rng = np.random.default_rng(3)
+        centers = rng.normal(scale=10, size=(8, 8))
+        data = (centers[rng.integers(0, 8, 2000)] + rng.normal(size=(2000, 8))).astype(np.float32)
+        memory = IVFVectorMemory(metric=metric, nlist=8, nprobe=8, train_size=1000)
+        memory.upsert_many([f"v{i}" for i in range(1000)], data[:1000])
+        assert memory.trained
+        memory.upsert_many([f"v{i}" for i in range(1000, 2000)], data[1000:])
+        exact = VectorMemory(metric=metric)
+        exact.upsert_many([f"v{i}" for i in range(2000)], data)
+        # Probing every cell is exhaustive, so results must match exactly.
+        assert memory.query(data[5], top_k=10) == exact.query(data[5], top_k=10)
+        for key in ("v5", "v1999", "v0"):
+            memory.delete(key)
+            exact.delete(key)
+        assert memory.query(data[5], top_k=10) == exact.query(data[5], top_k=10)
+        assert sum(len(cell) for cell in memory._lists) == len(memory) == 1997
+        assert len(memory.query(data[5], top_k=10, nprobe=1)) == 10
+
+    def test_ivf_reopen_reuses_saved_cells(self, tmp_path, monkeypatch) -> None:
+        rng = np.random.default_rng(9)
+        data = rng.normal(size=(1200, 8)).astype(np.float32)
+        path = str(tmp_path / "ivf")
+        memory = IVFVectorMemory(nlist=8, nprobe=2, train_size=1000, path=path)
+        memory.upsert_many([f"v{i}" for i in range(1200)], data)
+        expected = memory.query(data[3], top_k=5)
+        memory.flush()
+
+        trainings = []
+        monkeypatch.setattr("colonyos.core.vector._kmeans", lambda *args: trainings.append(1) or _kmeans(*args))
+        reopened = IVFVectorMemory(nlist=8, nprobe=2, train_size=1000, path=path)
+        assert reopened.trained and not trainings
+        assert np.array_equal(reopened._centroids, memory._centroids)
+        assert reopened.query(data[3], top_k=5) == expected
+
+        # index.json rewritten without the cells (here by a flat index): retrain.
+        flat = VectorMemory(path=path)
+        flat.delete("v0")
+        flat.flush()
+        stale = IVFVectorMemory(nlist=8, nprobe=2, train_size=1000, path=path)
+        assert stale.trained and trainings == [1]
+        assert sum(len(cell) for cell in stale._lists) == 1199
+
+    def test_vector_backend_selection(self) -> None:
+        assert type(create_vector_memory("flat")) is VectorMemory
+        assert type(create_vector_memory("chromadb")) is VectorMemory
+        assert isinstance(create_vector_memory("ivf", nlist=4), IVFVectorMemory)
+        with pytest.raises(ValueError):
+            create_vector_memory("faiss")
+
+    @pytest.mark.parametrize("dtype", ["float32", "float16"])
+    def test_memory_mapped_persistence(self, tmp_path, dtype) -> None:
+        rng = np.random.default_rng(11)
+        data = rng.normal(size=(3000, 16)).astype(np.float32)
+        memory = VectorMemory(metric="l2", path=str(tmp_path / "vectors"), dtype=dtype, initial_capacity=64)
+        memory.upsert_many([f"v{i}" for i in range(3000)], data)
+        memory.delete("v7")
+        expected = memory.query_with_scores(data[42], top_k=5)
+        memory.flush()
+
+        reopened = VectorMemory(metric="l2", path=str(tmp_path / "vectors"), dtype=dtype)
+        assert len(reopened) == 2999 and "v7" not in reopened
+        assert reopened.query_with_scores(data[42], top_k=5) == expected
+        assert reopened.query(data[42], top_k=1) == ["v42"]
+        assert isinstance(reopened._matrix, np.memmap)
+        assert reopened._matrix.dtype == np.dtype(dtype)
+        with pytest.raises(ValueError):
+            VectorMemory(metric="cosine", path=str(tmp_path / "vectors"), dtype=dtype)
+
+    def test_int8_coarse_search_reranks_exactly(self, tmp_path) -> None:
+        rng = np.random.default_rng(5)
+        data = rng.normal(size=(5000, 32)).astype(np.float32)
+        keys = [f"v{i}" for i in range(5000)]
+        exact = VectorMemory()
+        exact.upsert_many(keys, data)
+        quantized = VectorMemory(quantization="int8", rerank_factor=8, path=str(tmp_path / "q"))
+        quantized.upsert_many(keys, data)
+        assert quantized._codes.data.nbytes * 4 == quantized._matrix.nbytes
+
+        queries = data[:20] + rng.normal(scale=0.05, size=(20, 32))
+        truth = exact.query_batch_with_scores(queries, top_k=10)
+        found = quantized.query_batch_with_scores(queries, top_k=10)
+        recall = sum(len({k for k, _ in a} & {k for k, _ in b}) for a, b in zip(truth, found)) / 200
+        assert recall >= 0.95
+        # Re-ranked scores are exact, not approximations.
+        assert found[0][0][0] == truth[0][0][0]
+        assert found[0][0][1] == pytest.approx(truth[0][0][1], rel=1e-5)
+
+        ivf = IVFVectorMemory(nlist=16, nprobe=16, quantization="int8", rerank_factor=8)
+        ivf.upsert_many(keys, data)
+        assert ivf.trained
+        assert ivf.query(queries[0], top_k=3) == [key for key, _ in truth[0][:3]]
+
+    def test_metadata_filtered_queries(self, tmp_path) -> None:
+        rng = np.random.default_rng(21)
+        data = rng.normal(size=(4000, 16)).astype(np.float32)
+        keys = [f"v{i}" for i in range(4000)]
+        metadata = [
+            {"scope": "tasks" if i % 4 else "datasets", "tags": ["gpu"] if i % 10 == 0 else ["cpu"], "created": float(i)}
+            for i in range(4000)
+        ]
+        metadata[1] = {"scope": "tasks"}
+        where = {"scope": "datasets", "tags": "gpu", "created": {"$gte": 1000}}
+        expected = [
+            i
+            for i, meta in enumerate(metadata)
+            if meta["scope"] == "datasets" and "gpu" in meta.get("tags", []) and meta["created"] >= 1000
+        ]
+        query = data[7]
+        normalized = data / np.linalg.norm(data, axis=1, keepdims=True)
+        scores = normalized[expected] @ (query / np.linalg.norm(query))
+        truth = [keys[expected[i]] for i in np.argsort(-scores)[:5]]
+
+        flat = VectorMemory(path=str(tmp_path / "flat"))
+        flat.upsert_many(keys, data, metadata)
+        ivf = IVFVectorMemory(nlist=32, nprobe=2, quantization="int8")
+        ivf.upsert_many(keys, data, metadata)
+        assert flat.query(query, top_k=5, where=where) == truth
+        assert ivf.query(query, top_k=5, where=where) == truth  # selective: exact fallback
+        broad = {"scope": "tasks"}
+        assert ivf.query(query, top_k=5, where=broad, nprobe=32) == flat.query(query, top_k=5, where=broad)
+        assert flat.query(query, top_k=3, where={"$or": [{"scope": {"$ne": "tasks"}}, {"tags": {"$exists": False}}]})
+        assert set(flat.query(query, top_k=50, where={"tags": {"$exists": False}})) == {"v1"}
+        assert flat.query(query, top_k=5, where={"owner": "nobody"}) == []
+
+        flat.delete("v0")
+        flat.upsert("v40", data[40], {"scope": "other"})
+        assert flat.get_metadata("v40") == {"scope": "other"}
+        flat.flush()
+        reopened = VectorMemory(path=str(tmp_path / "flat"))
+        assert reopened.get_metadata("v3999") == {"scope": "tasks", "tags": ["cpu"], "created": 3999.0}
+        remaining = [key for key in truth if key not in ("v0", "v40")]
+        assert reopened.query(query, top_k=5, where=where)[: len(remaining)] == remaining
+        with pytest.raises(ValueError):
+            reopened.upsert("bad", data[0], {"created": "yesterday"})
+        assert "bad" not in reopened
+
+        hybrid = HybridMemory(SQLiteMemory(":memory:", sweep_interval=None), reopened)
+        hybrid.upsert_vector("fresh", data[7].tolist(), {"scope": "fresh"})
+        assert hybrid.query_vector(data[7].tolist(), top_k=5, where={"scope": "fresh"}) == ["fresh"]
@@ -72,3 +72,141 @@ class TestCheckpoint:
         assert checkpoint_id
         restored = await colony_system.guardian.rollback_to_checkpoint(checkpoint_id)
         assert restored["state"] == "baseline"
+
+    async def test_async_checkpoint_and_audit(self, colony_system: ColonyOS) -> None:
+        checkpoint_id = await colony_system.guardian.acreate_checkpoint({"state": "async"})
+        checkpoints = await colony_system.guardian.state_manager.alist_checkpoints()
+        assert checkpoint_id in [cp["id"] for cp in checkpoints]
+        trail = await colony_system.guardian.aget_audit_trail(event_type="checkpoint")
+        assert checkpoint_id in [entry["details"]["id"] for entry in trail]
+        valid, errors = colony_system.guardian.audit_log.verify_integrity()
+        assert valid, errors
+
+    async def test_delta_checkpoints_replay_onto_base(self, colony_system: ColonyOS) -> None:
+        guardian, kernel = colony_system.guardian, colony_system.body
+        guardian.state_manager.full_every = 2
+        tasks = [Task.create(description=f"task-{idx}", created_by="tester") for idx in range(5)]
+        kernel.submit_tasks(tasks)
+        base_id = await guardian.acreate_task_checkpoint(kernel)
+
+        kernel.cancel_task(tasks[0].id)
+        extra = Task.create(description="extra", created_by="tester")
+        kernel.submit_task(extra)
+        delta_id = await guardian.acreate_task_checkpoint(kernel)
+        empty_id = await guardian.acreate_task_checkpoint(kernel)
+        rebase_id = await guardian.acreate_task_checkpoint(kernel)
+
+        memory, scope = guardian.state_manager.memory, guardian.state_manager.scope
+        base, delta, empty, rebase = (memory.retrieve(cid, scope=scope) for cid in (base_id, delta_id, empty_id, rebase_id))
+        assert base["kind"] == "base" and len(base["tasks"]) == 5
+        assert delta["kind"] == "delta" and sorted(delta["tasks"]) == sorted([tasks[0].id, extra.id])
+        assert empty["chain"] == [base_id, delta_id] and empty["tasks"] == {}
+        assert rebase["kind"] == "base" and len(rebase["tasks"]) == 6
+
+        state = await guardian.rollback_to_checkpoint(empty_id)
+        assert len(state["tasks"]) == 6
+        assert state["tasks"][tasks[0].id]["status"] == TaskStatus.CANCELLED.value
+        assert (await guardian.rollback_to_checkpoint(base_id))["tasks"][tasks[0].id]["status"] == TaskStatus.QUEUED.value
+
+        # Compaction keeps the newest checkpoints restorable on their own.
+        kernel.cancel_task(tasks[1].id)
+        latest_id = await guardian.acreate_task_checkpoint(kernel)
+        assert guardian.state_manager.compact(keep=1) >= 4
+        latest = memory.retrieve(latest_id, scope=scope)
+        assert latest["kind"] == "base" and latest["chain"] == []
+        assert len((await guardian.rollback_to_checkpoint(latest_id))["tasks"]) == 6
+
+    async def test_checkpoint_listing_reads_metadata_only(self, colony_system: ColonyOS) -> None:
+        manager = colony_system.guardian.state_manager
+        memory = manager.memory
+        legacy = manager._payload({"blob": "x" * 1000})
+        memory.store(legacy["id"], legacy, scope=manager.scope)
+        kernel = colony_system.body
+        kernel.submit_tasks([Task.create(description=f"task-{idx}", created_by="tester") for idx in range(3)])
+        task_id = await colony_system.guardian.acreate_task_checkpoint(kernel)
+
+        fetched = []
+        original = memory.retrieve_many
+
+        def tracking(keys, scope="default"):
+            fetched.append(scope)
+            return original(keys, scope=scope)
+
+        memory.retrieve_many = tracking
+        try:
+            listed = {cp["id"]: cp for cp in await manager.alist_checkpoints()}
+            manager._backfilled = True
+            fetched.clear()
+            manager.list_checkpoints()
+            assert fetched == [manager.meta_scope]
+        finally:
+            del memory.retrieve_many
+        assert listed[legacy["id"]]["kind"] == "state" and listed[legacy["id"]]["size"] > 1000
+        assert listed[task_id]["task_count"] >= 3 and "tasks" not in listed[task_id]
+        assert (await colony_system.guardian.rollback_to_checkpoint(legacy["id"])) == {"blob": "x" * 1000}
+
+    async def test_rollback_restores_kernel_tasks(self, colony_system: ColonyOS) -> None:
+        guardian, kernel = colony_system.guardian, colony_system.body
+        events = []
+        async def record(event):
+            events.append(event)
+
+        await colony_system.event_bus.subscribe("state_restored", record)
+        tasks = [Task.create(description=f"task-{idx}", created_by="tester", priority=idx) for idx in range(3)]
+        kernel.submit_tasks(tasks)
+        wire = kernel.collect_checkpoint(full=True)[0]
+        wire[tasks[0].id].update(status=TaskStatus.EXECUTING.value, assigned_worker="worker-1")
+        done = Task.create(description="done", created_by="tester")
+        done.status, done.assigned_worker = TaskStatus.COMPLETED, "worker-1"
+        wire[done.id] = done.to_wire_format()
+        checkpoint_id = guardian.state_manager.create_task_checkpoint(wire, full=True)
+
+        kernel.cancel_task(tasks[1].id)
+        kernel.submit_task(Task.create(description="later", created_by="tester"))
+        await guardian.rollback_to_checkpoint(checkpoint_id, kernel)
+
+        assert sorted(kernel.tasks) == sorted([*wire])
+        assert kernel.get_task_status(tasks[1].id) == TaskStatus.QUEUED
+        assert kernel.get_task_status(tasks[0].id) == TaskStatus.QUEUED and kernel.tasks[tasks[0].id].assigned_worker is None
+        assert kernel.get_task_status(done.id) == TaskStatus.COMPLETED
+        assert kernel.task_queue.size() == 3 and kernel.task_queue.peek().id == tasks[2].id
+        assert kernel.task_queue._worker_assignments == {"worker-1": 1}
+        assert [(event.data["tasks"], event.data["requeued"]) for event in events] == [(4, 1)]
+
+        tasks_wire, full = kernel.collect_checkpoint()
+        assert full and tasks_wire[tasks[0].id]["status"] == TaskStatus.QUEUED.value and len(tasks_wire) == 4
+        trail = await guardian.aget_audit_trail(event_type="rollback")
+        assert trail[-1]["details"]["restored"]["queued"] == 3
+
+    async def test_waits_follow_tasks_across_restore(self, colony_system: ColonyOS) -> None:
+        kernel = colony_system.body
+        task = Task.create(description="in flight", created_by="tester")
+        gone = Task.create(description="not in checkpoint", created_by="tester")
+        kernel.submit_task(task)
+        wire = kernel.collect_checkpoint(full=True)[0]
+        kernel.submit_task(gone)
+
+        def finish(run: Task) -> None:
+            run.status = TaskStatus.COMPLETED
+            for callback in kernel.executor.execution_callbacks.pop(run.id, []):
+                callback(run)
+
+        before = asyncio.ensure_future(kernel.wait_for_task(task.id, timeout=5))
+        vanished = asyncio.ensure_future(kernel.wait_for_task(gone.id, timeout=5))
+        await asyncio.sleep(0)
+        stale = kernel.tasks[task.id]
+        await kernel.restore_tasks(wire)
+        after = asyncio.ensure_future(kernel.wait_for_task(task.id, timeout=5))
+        await asyncio.sleep(0)
+        assert await vanished is None
+
+        # The run that was in flight during the restore finishes on the old object.
+        finish(stale)
+        await asyncio.sleep(0.01)
+        assert not before.done() and not after.done()
+        assert kernel.get_task_status(task.id) == TaskStatus.QUEUED
+
+        restored = kernel.tasks[task.id]
+        finish(restored)
+        assert await before is restored and await after is restored
+        assert task.id not in kernel._waiters
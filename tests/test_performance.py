@@ -5,9 +5,13 @@ from __future__ import annotations
 import asyncio
 import time
 
+import numpy as np
 import pytest
 
-from colonyos.core.types import ColonyConfig, Task, Worker, WorkerCapability, WorkerStatus
+from colonyos.core.memory import SQLiteMemory
+from colonyos.core.types import ColonyConfig, Task, TaskStatus, Worker, WorkerCapability, WorkerStatus
+from colonyos.core.vector import IVFVectorMemory, VectorMemory
+from colonyos.guardian.safety import AuditLog
 from colonyos.main import ColonyOS
 
 
@@ -79,3 +83,101 @@ async def test_concurrent_execution(colony_system: ColonyOS) -> None:
     await asyncio.sleep(2)
     completed = sum(1 for task in tasks if colony_system.body.get_task(task.id).is_terminal)
     assert completed >= 20
+
+
+def test_vector_query_latency() -> None:
+    rng = np.random.default_rng(0)
+    memory = VectorMemory(dimension=128)
+    memory.upsert_many([f"v{i}" for i in range(100_000)], rng.normal(size=(100_000, 128)).astype(np.float32))
+    query = rng.normal(size=128)
+    memory.query(query, top_k=10)
+    start = time.time()
+    for _ in range(20):
+        assert len(memory.query(query, top_k=10)) == 10
+    avg_latency = (time.time() - start) / 20 * 1000
+    assert avg_latency < 50
+
+
+def test_ivf_recall_and_latency() -> None:
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(256, 64))
+    data = (centers[rng.integers(0, 256, 50_000)] + rng.normal(scale=0.5, size=(50_000, 64))).astype(np.float32)
+    keys = [f"v{i}" for i in range(len(data))]
+    exact = VectorMemory(dimension=64)
+    exact.upsert_many(keys, data)
+    index = IVFVectorMemory(dimension=64, nlist=128, nprobe=8, kmeans_iterations=10)
+    index.upsert_many(keys, data)
+    assert index.trained
+
+    queries = data[rng.choice(len(data), 50, replace=False)] + rng.normal(scale=0.1, size=(50, 64))
+    start = time.time()
+    truth = exact.query_batch(queries, top_k=10)
+    exact_ms = (time.time() - start) * 1000
+    start = time.time()
+    found = [index.query(query, top_k=10) for query in queries]
+    ivf_ms = (time.time() - start) * 1000
+    recall = sum(len(set(a) & set(b)) for a, b in zip(truth, found)) / (10 * len(queries))
+    assert recall >= 0.9, f"recall={recall:.3f} ivf={ivf_ms:.1f}ms exact={exact_ms:.1f}ms"
+    assert ivf_ms / len(queries) < 20
+
+
+def test_incremental_audit_verification() -> None:
+    memory = SQLiteMemory(":memory:", sweep_interval=None)
+    audit = AuditLog(memory, segment_size=1024)
+    for idx in range(20000):
+        audit.log_event("perf", "tester", {"idx": idx})
+
+    start = time.perf_counter()
+    assert audit.verify_integrity()[0]
+    full = time.perf_counter() - start
+    for idx in range(100):
+        audit.log_event("perf", "tester", {"idx": idx})
+    start = time.perf_counter()
+    assert audit.verify_integrity()[0]
+    incremental = time.perf_counter() - start
+    assert incremental < full / 5
+    memory.close()
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_snapshot_pause(colony_system: ColonyOS) -> None:
+    kernel = colony_system.body
+    tasks = [Task.create(description=f"task-{idx}", created_by="tester", tags=["perf"]) for idx in range(20000)]
+    with kernel._lock:
+        kernel.tasks.update((task.id, task) for task in tasks)
+
+    start = time.perf_counter()
+    assert len(kernel.collect_checkpoint(full=True)[0]) == len(tasks)
+    serialise = time.perf_counter() - start
+
+    tasks[0].status = TaskStatus.CANCELLED
+    kernel.mark_dirty([tasks[0].id])
+    start = time.perf_counter()
+    snapshot = kernel.snapshot_checkpoint(full=True)
+    pause = time.perf_counter() - start
+    assert [task.id for task in snapshot.changed] == [tasks[0].id] and len(snapshot.clean) == len(tasks)
+    assert pause < serialise / 5, f"pause={pause * 1000:.1f}ms serialise={serialise * 1000:.1f}ms"
+    assert kernel.serialise_checkpoint(snapshot)[tasks[0].id]["status"] == "cancelled"
+
+    checkpoint_id = await colony_system.guardian.acreate_task_checkpoint(kernel)
+    state = await colony_system.guardian.rollback_to_checkpoint(checkpoint_id)
+    assert len(state["tasks"]) == len(tasks)
+
+
+@pytest.mark.asyncio
+async def test_bulk_restore_latency(colony_system: ColonyOS) -> None:
+    kernel = colony_system.body
+    kernel.task_queue.max_size = 200_000
+    statuses = [TaskStatus.QUEUED, TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.EXECUTING]
+    wire = {}
+    for idx in range(100_000):
+        task = Task.create(description=f"task-{idx}", created_by="tester", priority=idx % 7)
+        task.status = statuses[idx % 4]
+        wire[task.id] = task.to_wire_format()
+
+    start = time.perf_counter()
+    summary = await kernel.restore_tasks(wire)
+    elapsed = time.perf_counter() - start
+    assert summary["tasks"] == 100_000 and summary["queued"] == 50_000 and summary["requeued"] == 25_000
+    # Generous for shared single-core runners; typically well below a second.
+    assert elapsed < 1.5, f"restore took {elapsed * 1000:.0f}ms"
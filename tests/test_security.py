@@ -2,9 +2,20 @@
 
 from __future__ import annotations
 
-from colonyos.core.memory import SQLiteMemory
-from colonyos.core.types import SafetyLevel, Task
-from colonyos.guardian.safety import AuditLog, ProhibitedPatternRule, ResourceLimitRule, SafetyLevelRule
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from colonyos.core.codecs import get_codec
+from colonyos.core.memory import RedisMemory, ShardedSQLiteMemory, SQLiteMemory
+from colonyos.core.types import IdentityManager, SafetyLevel, Task
+from colonyos.guardian.audit_store import KVAuditStore, SQLiteAuditStore
+from colonyos.guardian.safety import AuditLog, ProhibitedPatternRule, ResourceLimitRule, SafetyLevelRule, _link
 
 
 def test_prohibited_patterns() -> None:
@@ -49,3 +60,202 @@ def test_audit_log(tmp_path) -> None:
     valid, errors = audit.verify_integrity()
     assert valid
     assert not errors
+
+
+def test_audit_log_lists_latest_events_in_order(resp_server) -> None:
+    for memory in (SQLiteMemory(":memory:", sweep_interval=None), RedisMemory(resp_server.url)):
+        audit = AuditLog(memory)
+        for idx in range(30):
+            audit.log_event("test", "actor", {"idx": idx})
+        assert [entry.details["idx"] for entry in audit.list_events(limit=5)] == [25, 26, 27, 28, 29]
+        memory.close()
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "redis"])
+def test_audit_store_filters_and_ranges(backend, resp_server) -> None:
+    memory = SQLiteMemory(":memory:", sweep_interval=None) if backend == "sqlite" else RedisMemory(resp_server.url)
+    audit = AuditLog(memory)
+    assert isinstance(audit.store, SQLiteAuditStore if backend == "sqlite" else KVAuditStore)
+    for idx in range(600):
+        audit.log_event("rare" if idx % 200 == 0 else "common", "actor", {"idx": idx})
+    cutoff = datetime.now(timezone.utc)
+    time.sleep(0.01)
+    audit.log_event("rare", "actor", {"idx": 600})
+
+    # The type filter is applied before the limit, not after it.
+    rare = audit.list_events(limit=3, event_type="rare")
+    assert [entry.details["idx"] for entry in rare] == [200, 400, 600]
+    assert [entry.seq for entry in rare] == [201, 401, 601]
+    assert [entry.details["idx"] for entry in audit.list_events(limit=2, since=cutoff)] == [600]
+    assert [seq for seq, _ in audit.store.query(start_seq=499, end_seq=502)] == [499, 500, 501]
+    assert [seq for seq, _ in audit.store.query(end_seq=10, limit=2, reverse=True)] == [9, 8]
+    assert audit.store.count() == 601
+    assert audit.verify_integrity() == (True, [])
+    memory.close()
+
+
+def test_kv_audit_stores_sharing_a_backend_never_overwrite(resp_server) -> None:
+    first, second = RedisMemory(resp_server.url), RedisMemory(resp_server.url)
+    stores = [KVAuditStore(first), KVAuditStore(second)]
+    seqs = []
+    for idx in range(6):
+        seqs += stores[idx % 2].append([{"id": f"e{idx}", "idx": idx}])
+    seqs += stores[1].append([{"id": "e6", "idx": 6}, {"id": "e7", "idx": 7}])
+    assert seqs == list(range(1, 9))
+    assert [payload["idx"] for _, payload in KVAuditStore(RedisMemory(resp_server.url)).query()] == list(range(8))
+    assert stores[0].count() == 8
+    first.close()
+    second.close()
+
+
+def test_audit_log_migrates_legacy_entries(tmp_path) -> None:
+    memory = SQLiteMemory(str(tmp_path / "audit.db"), sweep_interval=None)
+    legacy = AuditLog(memory)
+    head = ""
+    for idx in range(5):
+        payload = legacy._next_payload("legacy", "actor", {"idx": idx})
+        _link(payload, head)
+        memory.store(payload["id"], payload, scope="audit")  # the pre-store layout
+        head = payload["hash"]
+
+    audit = AuditLog(memory)
+    assert memory.list_keys("audit") == []
+    assert [entry.details["idx"] for entry in audit.list_events()] == [0, 1, 2, 3, 4]
+    audit.log_event("after", "actor", {})
+    assert audit.verify_integrity() == (True, [])
+    memory.close()
+
+
+def _signed_audit(memory, manager, identity, **options) -> AuditLog:
+    audit = AuditLog(memory, **options)
+    audit.set_signer(identity, lambda message: manager.sign_message(identity.id, message), manager.get_identity)
+    return audit
+
+
+def _tamper(memory, seq: int) -> None:
+    with memory.transaction() as conn:
+        (blob,) = conn.execute("SELECT payload FROM audit_audit WHERE seq = ?", (seq,)).fetchone()
+        payload = get_codec("json").decode(blob)
+        payload["details"] = {"tampered": True}
+        payload.pop("hash")
+        payload["hash"] = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+        conn.execute("UPDATE audit_audit SET payload = ? WHERE seq = ?", (get_codec("json").encode(payload), seq))
+
+
+def test_audit_checkpoints_make_verification_incremental(tmp_path) -> None:
+    memory = SQLiteMemory(str(tmp_path / "audit.db"), sweep_interval=None)
+    manager = IdentityManager()
+    identity, _ = manager.create_identity("guardian")
+    audit = _signed_audit(memory, manager, identity, segment_size=100)
+    for idx in range(250):
+        audit.log_event("test", "actor", {"idx": idx})
+    assert audit.verify_integrity() == (True, [])
+    seals = audit.store.seals()
+    assert [seal["segment"] for seal in seals] == [0, 1]
+    assert all(seal["signer"] == identity.id and seal["signature"] for seal in seals)
+
+    # A fresh instance trusts the signed checkpoints and only rechecks the tail.
+    _tamper(memory, 10)
+    reopened = _signed_audit(memory, manager, identity, segment_size=100)
+    assert reopened.verify_integrity() == (True, [])
+    valid, errors = reopened.verify_integrity(full=True, workers=2)
+    assert not valid
+    assert any("Broken hash chain" in error for error in errors)
+    assert "Merkle root mismatch for segment 0" in errors
+
+    _tamper(memory, 240)
+    assert not _signed_audit(memory, manager, identity, segment_size=100).verify_integrity()[0]
+
+    # Unverifiable checkpoints are ignored; forged ones are reported.
+    stranger = AuditLog(memory, segment_size=100)
+    assert not stranger.verify_integrity()[0]
+    forged = dict(seals[0], root="00" * 32)
+    audit.store.put_seal(forged)
+    valid, errors = _signed_audit(memory, manager, identity, segment_size=100).verify_integrity()
+    assert "Invalid signature on checkpoint for segment 0" in errors
+    memory.close()
+
+
+def test_audit_inclusion_proofs() -> None:
+    memory = SQLiteMemory(":memory:", sweep_interval=None)
+    audit = AuditLog(memory, segment_size=16)
+    entries = [audit.log_event("test", "actor", {"idx": idx}) for idx in range(70)]
+    assert audit.verify_integrity() == (True, [])
+    root = audit.root()
+
+    proof = audit.prove(37)
+    assert proof.entry_hash == entries[36].hash
+    assert proof.segment == 2 and proof.root == root
+    assert len(proof.segment_path) == 4
+    assert proof.verify(trusted_root=root)
+    assert not proof.verify(trusted_root="00" * 32)
+    proof.segment_path[0] = (proof.segment_path[0][0], "00" * 32)
+    assert not proof.verify()
+
+    tail = audit.prove(70)  # the open segment is not under the root yet
+    assert tail.root == tail.segment_root and tail.verify()
+    with pytest.raises(KeyError):
+        audit.prove(71)
+    memory.close()
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "sharded"])
+def test_audit_chain_head_survives_restart(backend, tmp_path) -> None:
+    def open_memory():
+        if backend == "sqlite":
+            return SQLiteMemory(str(tmp_path / "audit.db"), sweep_interval=None)
+        return ShardedSQLiteMemory(str(tmp_path / "shards"), sweep_interval=None)
+
+    for run in range(3):
+        memory = open_memory()
+        AuditLog(memory).log_event("boot", "system", {"run": run})
+        memory.close()
+    memory = open_memory()
+    audit = AuditLog(memory)
+    assert audit.store.count() == 3
+    assert audit.verify_integrity() == (True, [])
+    memory.close()
+
+
+def test_concurrent_audit_appends_are_chained_and_batched() -> None:
+    memory = SQLiteMemory(":memory:", sweep_interval=None)
+    audit = AuditLog(memory)
+    appends = []
+    append = audit.store.append
+    audit.store.append = lambda payloads, link=None: appends.append(len(payloads)) or append(payloads, link)
+
+    async def run():
+        return await asyncio.gather(*(audit.alog_event("async", "actor", {"idx": idx}) for idx in range(300)))
+
+    entries = asyncio.run(run())
+    assert sorted(entry.seq for entry in entries) == list(range(1, 301))
+    assert sum(appends) == 300 and len(appends) < 300
+
+    threads = [
+        threading.Thread(target=lambda: [audit.log_event("thread", "actor", {}) for _ in range(50)]) for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert audit.store.count() == 500
+    assert audit.verify_integrity() == (True, [])
+    memory.close()
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "redis"])
+def test_audit_logs_sharing_a_store_keep_one_chain(backend, tmp_path, resp_server) -> None:
+    def open_memory():
+        return SQLiteMemory(str(tmp_path / "audit.db"), sweep_interval=None) if backend == "sqlite" else RedisMemory(resp_server.url)
+
+    memories = [open_memory(), open_memory()]
+    logs = [AuditLog(memory) for memory in memories]
+    for idx in range(6):
+        logs[idx % 2].log_event("shared", f"writer-{idx % 2}", {"idx": idx})
+    logs[1].log_events([("shared", "writer-1", {"idx": 6}), ("shared", "writer-1", {"idx": 7})])
+
+    reader = AuditLog(open_memory())
+    assert [(entry.seq, entry.details["idx"]) for entry in reader.list_events()] == [(idx + 1, idx) for idx in range(8)]
+    assert reader.verify_integrity() == (True, [])
+    for memory in (*memories, reader.memory):
+        memory.close()